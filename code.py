@@ -7,27 +7,44 @@ make_call.py – Twilio ↔ Vosk ↔ Ollama ↔ CSM‑1B
 * Inbound 8 kHz media stream from Twilio.
 * Vosk transcribes; every 2 s we pass the last 20 words to an Ollama LLM
   (`OLLAMA_MODEL`, default *llama3:8b*).
-* If Ollama returns `{"speak": true, "response": "…"}` we synthesise with
-  CSM‑1B and stream the audio back.
+* If the decision model returns `{"speak": true}` the conversational model's
+  reply is streamed, cut into sentences and each one is synthesised with
+  CSM‑1B and sent while the next is still being generated.
 
-Synchronous, CPU‑only, with robust Twilio credential checks and correct
-indentation.
+Each call runs as a small pipeline (receive → ASR → decision/LLM → TTS/send)
+linked by bounded queues, so inbound audio is read while Lucy thinks or talks.
 """
 
 ###############################################################################
 #  ENV & IMPORTS                                                              #
 ###############################################################################
-import os, sys, json, base64, time, re
+import os, sys, json, base64, time, threading, asyncio
+STARTED = time.perf_counter()
 from collections import deque
-import numpy as np, audioop, vosk
-import torch  # Added for device check
+from typing import Iterable, Iterator
+import numpy as np
 from flask import Flask, request
 from flask_sock import Sock
 from twilio.twiml.voice_response import VoiceResponse, Start
 from twilio.rest import Client
 from dotenv import load_dotenv
-from generator import load_csm_1b
-from ollama import chat
+from ollama import chat, generate
+from src.services import metrics
+from src.services.audio import ulaw
+from src.services.audio.resample import resample
+from src.services.csm_api.phrase_cache import PhraseCache, load_phrases
+from src.services.csm_api.scheduler import BACKGROUND, FIRST_SENTENCE, FOLLOW_UP, TTSScheduler
+from src.services.database_api.memory import MemoryIndex
+from src.services.database_api.store import UserStore
+from src.services.twilio_api import decision
+from src.services.twilio_api.asr_pool import ASRPool
+from src.services.twilio_api.endpointing import Endpointer
+from src.services.twilio_api.media import MediaWriter
+from src.services.twilio_api.pipeline import CallPipeline, Reply
+from src.services.twilio_api.prompts import CONVERSATION_SYSTEM, DECISION_SYSTEM, decision_prompt, reply_prompt
+from src.services.twilio_api.sentences import iter_sentences
+from src.services.twilio_api.speculative import Rendered
+from src.services.warmup import Warmup
 
 # ── torch safety knobs ──────────────────────────────────────────────────────
 # Removed lines forcing CPU:
@@ -46,94 +63,165 @@ CALL_TO                  = os.getenv("PERSONAL_PHONE_NUMBER")
 NGROK_AUTH               = os.getenv("NGROK_AUTH")
 OLLAMA_DECISION_MODEL    = os.getenv("OLLAMA_DECISION_MODEL", "llama3.2:1b") # Changed default from 3.1
 OLLAMA_CONVERSATIONAL_MODEL = os.getenv("OLLAMA_CONVERSATIONAL_MODEL", "llama3:8b") # New: Model for response generation
-CHECK_EVERY              = 0.75   # seconds - Reduced for lower latency
+OLLAMA_KEEP_ALIVE        = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # keep both models (and their prompt cache) loaded
+END_SILENCE_MS           = 400    # pause after a Vosk final that ends the caller's turn
+FORCE_FINAL_MS           = 900    # pause after which Vosk is forced to finalise
+BARGE_IN_MS              = int(os.getenv("LUCY_BARGE_IN_MS", "200"))  # caller speech that interrupts Lucy, 0 = never
+SEND_LEAD_MS             = int(os.getenv("LUCY_SEND_LEAD_MS", "400"))  # reply audio kept queued at Twilio ahead of playback
+SPECULATION              = int(os.getenv("LUCY_SPECULATION", "1"))  # 0 off, 1 with decision, 2 eager + first chunk
+VOSK_MODEL_PATH          = "csm/vosk_model"  # 8 kHz model folder
+ASR_WORKERS              = int(os.getenv("LUCY_ASR_WORKERS", "0"))  # >0: recognise in that many pinned worker processes
 MAX_CALL_MIN             = 5
+SPEAKER                  = 0
+CSM_MODEL_VERSION        = os.getenv("CSM_MODEL_VERSION", "csm-1b")  # part of the phrase cache key
+PHRASE_CACHE_DIR         = os.getenv("LUCY_PHRASE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "phrase_cache"))
+PHRASE_CACHE_MB          = int(os.getenv("LUCY_PHRASE_CACHE_MB", "256"))
+PHRASE_CACHE_MAX_CHARS   = 80     # longer sentences are too unlikely to recur to be worth storing
+PHRASES_FILE             = os.getenv("LUCY_PHRASES_FILE")  # one phrase per line, pre-rendered at startup
+DATA_DIR                 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+MEMORIES                 = int(os.getenv("LUCY_MEMORIES", "3"))  # past utterances recalled per reply, 0 = off
+DEFAULT_PHRASES = [
+    "Hey, it's Lucy!",
+    "Hey, it's Lucy. How's it going?",
+    "So, how did today go?",
+    "Did you get it done?",
+    "Okay.",
+    "Mm-hmm.",
+    "Got it.",
+    "Tell me more.",
+    "I'm proud of you.",
+    "Talk to you tomorrow!",
+    "Bye for now!",
+]
 
 if not all([TWILIO_SID, TWILIO_TOKEN, TWILIO_FROM, CALL_TO]):
     sys.exit("✖  Missing Twilio environment variables. Check .env file.")
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"[config] Using device: {DEVICE}")
-GENERATOR = load_csm_1b(device=DEVICE) # Pass determined device
-GEN_SR    = GENERATOR.sample_rate
-VOSK_MODEL = vosk.Model("csm/vosk_model")  # 8 kHz model folder
+# Fork the ASR workers before CUDA and the model threads exist; they load the model in the background
+ASR_POOL = ASRPool(VOSK_MODEL_PATH, workers=ASR_WORKERS, wait=False) if ASR_WORKERS > 0 else None
+
+PHRASE_CACHE = PhraseCache(PHRASE_CACHE_DIR, CSM_MODEL_VERSION, max_bytes=PHRASE_CACHE_MB * 1024 * 1024)
 
 FRAME_MS  = 20
 DST_RATE  = 8000
 SAMPLES   = DST_RATE * FRAME_MS // 1000
-MU        = 255
 
 ###############################################################################
 #  HELPERS                                                                    #
 ###############################################################################
 
-def ulaw2pcm16(b: bytes) -> bytes:
-    return audioop.ulaw2lin(b, 2)
-
-def pcm16_to_ulaw_bytes(pcm16: np.ndarray) -> bytes:
-    x = pcm16.astype(np.float32) / 32768.0
-    mag = np.log1p(MU * np.abs(x)) / np.log1p(MU)
-    ul  = np.sign(x) * mag
-    return (((ul + 1) / 2 * MU).astype(np.uint8) ^ 0xFF).tobytes()
-
-def resample(pcm: np.ndarray, src: int, dst: int) -> np.ndarray:
-    if src == dst:
-        return pcm
-    dst_len = int(len(pcm) * dst / src)
-    idx = np.linspace(0, len(pcm) - 1, num=dst_len)
-    return np.interp(idx, np.arange(len(pcm)), pcm).astype(np.float32)
-
-# New Helper: Robust Ollama JSON extraction
-def ask_ollama(model_name: str, prompt: str) -> dict | None:
-    """Calls Ollama, attempts to extract JSON from response."""
+def ollama_messages(system: str, prompt: str) -> list[dict]:
+    # The fixed instructions go first, byte-identical every call, so Ollama can
+    # reuse their KV cache and only prefill the caller's words
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+def ask_ollama_stream(model_name: str, system: str, prompt: str) -> Iterator[str]:
+    """Streams the model's plain-text reply token by token."""
     try:
-        res = chat(model=model_name, messages=[{"role": "user", "content": prompt}])
-        content = res["message"]["content"]
-        # Try to find JSON object using regex, even if surrounded by text/markdown
-        match = re.search(r"\{.*\}", content, re.DOTALL)
-        if match:
-            # Strip whitespace before parsing
-            json_str = match.group(0).strip()
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError as json_e:
-                print(f"\n[ollama] JSON decode error: {json_e}", file=sys.stderr)
-                print(f"[ollama] Raw content was: {content}", file=sys.stderr)
-                # Add the attempted parsed string for debugging
-                print(f"[ollama] Attempted to parse: >>{json_str}<<", file=sys.stderr)
-                return None
-        else:
-            print(f"\n[ollama] No JSON object found in response.", file=sys.stderr)
-            print(f"[ollama] Raw content was: {content}", file=sys.stderr)
-            return None
+        # Only the waits on Ollama count as "llm", not the time TTS keeps this generator suspended
+        for chunk in metrics.timed("llm", chat(model=model_name, messages=ollama_messages(system, prompt),
+                                               stream=True, keep_alive=OLLAMA_KEEP_ALIVE)):
+            token = chunk["message"]["content"]
+            if token:
+                metrics.mark("time_to_first_token")
+                yield token
     except Exception as e:
         print(f"\n[ollama] API call error: {e}", file=sys.stderr)
-        return None
+
+def ask_decision(model_name: str, system: str, prompt: str) -> bool:
+    """Streams a constrained {"speak": bool} answer and stops reading once the boolean is in."""
+    answer = decision.Decision()
+    body = decision.request_body(model_name, ollama_messages(system, prompt), OLLAMA_KEEP_ALIVE)
+    try:
+        chunks = chat(**body)
+        try:
+            for chunk in chunks:
+                if answer.feed(chunk["message"]["content"]):
+                    break
+        finally:
+            chunks.close()  # closes the HTTP stream, so Ollama stops generating
+    except Exception as e:
+        return answer.failed(e)
+    return answer.result()
 
 ###############################################################################
 #  TTS STREAMER                                                               #
 ###############################################################################
-
-def stream_tts(ws, sid: str, text: str, seq: int) -> int:
-    import torch
-    with torch.inference_mode():
-        audio = GENERATOR.generate(text=text, speaker=0, context=[], max_audio_length_ms=10000)
-    pcm = audio.squeeze().cpu().numpy()
-    pcm8 = resample(pcm, GEN_SR, DST_RATE)
-    pcm16 = np.clip(pcm8 * 32767, -32768, 32767).astype(np.int16)
-    for idx, off in enumerate(range(0, len(pcm16) - SAMPLES + 1, SAMPLES)):
-        payload = base64.b64encode(pcm16_to_ulaw_bytes(pcm16[off:off + SAMPLES])).decode()
-        ws.send(json.dumps({
-            "event": "media", "streamSid": sid,
-            "sequenceNumber": str(seq + idx),
-            "media": {"track": "outbound", "chunk": str(seq + idx),
-                      "timestamp": str(FRAME_MS * (seq + idx - 1)),
-                      "payload": payload},
-        }))
-    final = seq + idx + 1
-    ws.send(json.dumps({"event": "mark", "streamSid": sid,
-                        "sequenceNumber": str(final), "mark": {"name": "csm-done"}}))
-    return final
+TTFF_MS = deque(maxlen=500)  # time-to-first-frame per reply, newest last
+
+def synthesize(text: str, priority: int = FOLLOW_UP, reply: Reply | None = None) -> np.ndarray:
+    request = TTS_MODEL.get().submit(text, SPEAKER, priority)
+    if reply is not None:
+        reply.on_cancel(request.cancel)  # a barge-in drops it from the queue, other calls get the GPU
+    return request.result()
+
+def synthesize_ulaw(text: str, priority: int = FOLLOW_UP, reply: Reply | None = None) -> np.ndarray:
+    """Final 8 kHz μ-law for one sentence, straight from CSM."""
+    with metrics.span("tts"):
+        audio = synthesize(text, priority, reply)
+    if not len(audio):
+        return np.zeros(0, dtype=np.uint8)  # cancelled before it ran
+    with metrics.span("encode"):
+        return ulaw.encode(ulaw.float_to_pcm16(resample(audio, TTS_MODEL.get().sample_rate, DST_RATE)))
+
+def render_ulaw(text: str, priority: int = FOLLOW_UP, reply: Reply | None = None) -> np.ndarray:
+    """Final 8 kHz μ-law for one sentence, from the phrase cache when possible."""
+    cached = PHRASE_CACHE.get(text, SPEAKER)
+    if cached is not None:
+        return cached
+    encoded = synthesize_ulaw(text, priority, reply)
+    if len(text) <= PHRASE_CACHE_MAX_CHARS and len(encoded):
+        PHRASE_CACHE.put(text, SPEAKER, encoded)
+    return encoded
+
+def prerender(text: str) -> Rendered:
+    return Rendered(text, render_ulaw(text, FIRST_SENTENCE))
+
+def prerender_phrases():
+    phrases = load_phrases(PHRASES_FILE, DEFAULT_PHRASES)
+    t0 = time.perf_counter()
+    rendered = PHRASE_CACHE.prerender(phrases, lambda text: synthesize_ulaw(text, BACKGROUND), SPEAKER)
+    print(f"\n[phrase-cache] {len(phrases)} phrases ready ({rendered} rendered in {time.perf_counter() - t0:.1f}s, "
+          f"{len(PHRASE_CACHE)} entries, {PHRASE_CACHE.size_bytes / 1e6:.1f} MB)")
+
+def stream_tts(out: MediaWriter, sid: str, sentences: Iterable[str | Rendered], seq: int, t_start: float | None = None,
+               reply: Reply | None = None) -> int:
+    """Synthesises each sentence and queues its frames while the next one is still being generated."""
+    t_start = t_start or time.perf_counter()
+    tail = np.zeros(0, dtype=np.uint8)  # leftover μ-law samples short of a full frame
+    spoken = 0
+    cancelled = reply.cancelled if reply else threading.Event()
+    for item in sentences:
+        if cancelled.is_set():
+            break
+        text, encoded = item if isinstance(item, Rendered) else (item, None)
+        print(f"\n[tts] Speaking: '{text}'")
+        if encoded is None:
+            encoded = render_ulaw(text, FIRST_SENTENCE if spoken == 0 else FOLLOW_UP, reply)
+        if cancelled.is_set():
+            reply.dropped += 1  # the caller barged in while it was being synthesised
+            break
+        encoded = np.concatenate([tail, encoded])
+        full = len(encoded) - len(encoded) % SAMPLES
+        start_seq, seq = seq, out.media(sid, encoded[:full], seq)
+        if reply:
+            reply.sent(seq - start_seq)
+        tail = encoded[full:]
+        if spoken == 0 and full:
+            ttff = (time.perf_counter() - t_start) * 1000
+            TTFF_MS.append(ttff)
+            metrics.mark("time_to_first_audio")
+            print(f"\n[tts] Time to first frame: {ttff:.0f} ms")
+        spoken += 1
+    if cancelled.is_set():
+        getattr(sentences, "close", lambda: None)()  # stops the LLM; the barge-in already cleared Twilio's buffer
+        return seq
+    if not spoken:
+        print("\n[tts] Warning: Nothing to speak.", file=sys.stderr)
+        return seq
+    seq = out.media(sid, ulaw.pad_to_frame(tail, SAMPLES), seq)
+    out.mark(sid, "csm-done", seq)
+    return seq + 1
 
 ###############################################################################
 #  FLASK APP                                                                  #
@@ -141,108 +229,93 @@ def stream_tts(ws, sid: str, text: str, seq: int) -> int:
 app = Flask(__name__)
 sock = Sock(app)
 client = Client(TWILIO_SID, TWILIO_TOKEN)
-CL, BS = "\x1b[0K", "\x08"
+
+def should_speak(snippet_text: str) -> bool:
+    """Asks the Decision Model if we should speak."""
+    return ask_decision(OLLAMA_DECISION_MODEL, DECISION_SYSTEM, decision_prompt(snippet_text))
+
+def recall(snippet_text: str) -> list[str]:
+    """What the caller said on earlier calls that relates to the snippet."""
+    if MEMORIES <= 0 or not MEMORY.ready:
+        return []
+    index, user_id = MEMORY.value
+    try:
+        with metrics.span("recall"):
+            return [m["text"] for m in index.search(user_id, snippet_text, MEMORIES)]
+    except Exception as e:  # the index, its embedder or SQLite
+        print(f"\n[memory] Recall failed: {e!r}", file=sys.stderr)
+        return []  # answer without memories rather than not at all
+
+def reply_sentences(snippet_text: str) -> Iterator[str]:
+    """Streams the Conversational Model's reply, cut into speakable sentences."""
+    prompt = reply_prompt(snippet_text, recall(snippet_text))
+    tokens = ask_ollama_stream(OLLAMA_CONVERSATIONAL_MODEL, CONVERSATION_SYSTEM, prompt)
+    return iter_sentences(tokens)
 
 @sock.route("/stream")
 def stream(ws):
-    rec = vosk.KaldiRecognizer(VOSK_MODEL, 8000)
-    words = deque(maxlen=100)  # Store recent words
-    last_check = time.time()
-    seq = 1; sid = None
-    CL, BS = "\x1b[0K", "\x08" # ANSI escape codes for clearing line/backspace
-
-    while True:
-        raw = ws.receive()
-        if raw is None:
-            print("\n[stream] WebSocket closed.")
-            break
-        pkt = json.loads(raw)
-        evt = pkt.get("event")
-
-        if evt == "start":
-            sid = pkt["streamSid"]
-            print(f"\n[stream] Started stream {sid}")
-            continue
-        if evt == "stop":
-            print(f"\n[stream] Stopped stream {sid}")
-            break
-        if evt != "media":
-            continue # Ignore non-media messages for now
-
-        # Process incoming audio
-        pcm_bytes = ulaw2pcm16(base64.b64decode(pkt["media"]["payload"]))
-        if rec.AcceptWaveform(pcm_bytes):
-            result = json.loads(rec.Result())
-            txt = result["text"].strip()
-            if txt:
-                print(CL + txt + " ", end="", flush=True)
-                words.extend(txt.split())
-        else:
-            partial_result = json.loads(rec.PartialResult())
-            part = partial_result.get("partial", "").strip()
-            # Only print partial if non-empty to avoid flickering
-            if part:
-                 # Print partial, overwrite with backspaces
-                print(CL + part + BS * len(part), end="", flush=True)
-                # Don't add partial results to the main word buffer
-                # to avoid duplicate processing on final result
-                # words.extend(part.split()) # <-- Removed this
-
-        # ---- Ask Ollama periodically ----
-        current_time = time.time()
-        if current_time - last_check >= CHECK_EVERY and words:
-            last_check = current_time # Reset timer immediately
-            snippet_text = " ".join(list(words)[-30:]) # Use last 30 words for context
-
-            # 1. Ask the Decision Model if we should speak
-            decision_prompt = (
-                "You are an AI assistant deciding *only* whether to speak right now or wait for the user to continue. "
-                "Consider the last 30 words spoken by the caller. Respond ONLY with JSON: "
-                '{\\"speak\\": true} or {\\"speak\\": false}. '
-                "Do not add any other text or explanation.\\n"
-                f'Caller words: \\"{snippet_text}\\"'
-            )
-            decision_result = ask_ollama(OLLAMA_DECISION_MODEL, decision_prompt)
-
-            if decision_result and decision_result.get("speak") is True:
-                print(f"\n[ollama-decision] Decided to speak based on: '{snippet_text}'")
-
-                # 2. Ask the Conversational Model what to say
-                #    (Could potentially use more history from `words` here if needed)
-                conversation_prompt = (
-                   "You are Lucy, an emotional AI assistant. Briefly respond to the user's last statement. "
-                   "Be concise and natural. Respond ONLY with JSON containing the response text: "
-                   '{\\"response\\": \\"Your response here.\\"}. '
-                   "Do not add any other text or explanation.\\n"
-                   f'User said: \\"{snippet_text}\\"'
-                )
-                conversation_result = ask_ollama(OLLAMA_CONVERSATIONAL_MODEL, conversation_prompt)
-
-                if conversation_result and isinstance(conversation_result.get("response"), str):
-                    response_text = conversation_result["response"].strip()
-                    if response_text:
-                        print(f"\n[ollama-convo] Generating speech for: '{response_text}'")
-                        seq = stream_tts(ws, sid, response_text, seq)
-                        words.clear() # Clear buffer after responding
-                        # Reset timer again after speaking to avoid immediate re-trigger
-                        last_check = time.time()
-                    else:
-                         print("\n[ollama-convo] Warning: Received empty response string.", file=sys.stderr)
-
-                elif conversation_result:
-                    print(f"\n[ollama-convo] Error: Unexpected format from conversational model: {conversation_result}", file=sys.stderr)
-                # If conversation_result is None, ask_ollama already printed an error
-
-            elif decision_result and decision_result.get("speak") is False:
-                # Optional: Log that we decided not to speak
-                # print(f"\n[ollama-decision] Decided not to speak for '{snippet_text}'")
-                pass # Do nothing if speak is false
-
-            # If decision_result is None, ask_ollama already printed an error
+    # This thread only reads the websocket; ASR, decisions and TTS run in the pipeline
+    state = {"sid": None, "seq": 1}
+
+    def speak(sentences, t_turn):
+        state["seq"] = stream_tts(out, state["sid"], sentences, state["seq"], t_turn, call.reply)
+
+    def clear():
+        # Frames not sent yet are dropped here, Twilio drops the ones it has queued
+        out.clear(state["sid"])
+
+    endpointer = Endpointer(min_silence_ms=END_SILENCE_MS, flush_silence_ms=FORCE_FINAL_MS)
+    try:
+        recognizer = new_recognizer()
+    except RuntimeError as e:
+        print(f"\n[stream] Rejecting call: {e}", file=sys.stderr)
+        return
+    call = CallPipeline(recognizer, should_speak, reply_sentences, speak,
+                        endpointer=endpointer, speculation=SPECULATION, prerender=prerender,
+                        barge_in_ms=BARGE_IN_MS, on_barge_in=clear)
+    # Frames go out from the writer's thread, paced, and its sends are timed in the call's trace
+    out = metrics.bind(call.trace).run(MediaWriter, ws.send, SEND_LEAD_MS)
+    try:
+        while True:
+            raw = ws.receive()
+            if raw is None:
+                print("\n[stream] WebSocket closed.")
+                break
+            pkt = json.loads(raw)
+            evt = pkt.get("event")
+
+            if evt == "start":
+                state["sid"] = call.trace.sid = pkt["streamSid"]
+                print(f"\n[stream] Started stream {state['sid']}")
+            elif evt == "stop":
+                print(f"\n[stream] Stopped stream {state['sid']}")
+                break
+            elif evt == "media":
+                call.feed(base64.b64decode(pkt["media"]["payload"]))
+            # Ignore other messages for now
+    finally:
+        call.close()
+        out.close()
+        if ASR_POOL:
+            recognizer.close()
+        if MEMORY.ready and call.transcript:
+            index, user_id = MEMORY.value
+            index.add(user_id, state["sid"], call.transcript)  # recalled on the next call
+        if TTS_MODEL.ready:
+            print(f"[tts] scheduler {TTS_MODEL.value.stats()}")
 
 ###############################################################################
 #  TWILIO ROUTES & ENTRYPOINT                                                 #
 ###############################################################################
+@app.route("/ready")
+def ready():
+    report = WARMUP.report()
+    return report, 200 if report["ready"] else 503
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return metrics.REGISTRY.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
 @app.route("/call", methods=["POST"])
 def call():
     vr = VoiceResponse(); st = Start(); st.stream(url=f"wss://{request.host}/stream"); vr.append(st)
@@ -250,6 +323,70 @@ def call():
     client.calls.create(to=CALL_TO, from_=TWILIO_FROM, twiml=vr)
     return str(vr), 200, {"Content-Type": "text/xml"}
 
+###############################################################################
+#  MODELS & WARM-UP                                                           #
+###############################################################################
+# Heavy imports and model loads run in background threads so Flask binds at once;
+# each model then runs one warm-up inference before it counts as ready.
+def load_tts() -> TTSScheduler:
+    import torch
+    from generator import load_csm_1b
+    from src.services.csm_api.batched import BatchedGenerator
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"[config] Using device: {device}")
+    # Single owner of the generator: concurrent calls queue here, first sentences first,
+    # and sentences of different calls share a pass through the backbone
+    return TTSScheduler(BatchedGenerator(load_csm_1b(device=device)), max_batch=int(os.getenv("CSM_MAX_BATCH", "4")))
+
+def warm_tts(tts: TTSScheduler):
+    tts.synthesize("Hello there.", SPEAKER, BACKGROUND)  # kernel selection, allocator growth
+    prerender_phrases()  # instant when the phrases are already on disk
+
+def load_asr():
+    if ASR_POOL:
+        return ASR_POOL.wait_ready()  # the pool workers load their own copy
+    import vosk
+    return vosk.Model(VOSK_MODEL_PATH)
+
+def warm_asr(model):
+    if not ASR_POOL:
+        import vosk
+        rec = vosk.KaldiRecognizer(model, 8000)
+        rec.AcceptWaveform(bytes(16000))
+        rec.FinalResult()
+
+def warm_ollama(_):
+    # An empty prompt only loads a model; a decision request then caches its system prompt prefix.
+    # It goes straight to chat(): a warm-up is not a decision, so it stays out of the metrics
+    for model in (OLLAMA_DECISION_MODEL, OLLAMA_CONVERSATIONAL_MODEL):
+        generate(model=model, prompt="", keep_alive=OLLAMA_KEEP_ALIVE)
+    body = decision.request_body(OLLAMA_DECISION_MODEL, ollama_messages(DECISION_SYSTEM, decision_prompt("hello")),
+                                 OLLAMA_KEEP_ALIVE)
+    for _ in chat(**body):
+        pass
+
+def load_memory():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db = os.path.join(DATA_DIR, "users.db")
+    users = UserStore(db, readers=1)
+    user = asyncio.run(users.create_user(None, CALL_TO))  # the one number this bridge calls
+    users.close()
+    return MemoryIndex(db, os.path.join(DATA_DIR, "memory.f32")), user["user_id"]
+
+def new_recognizer():
+    model = ASR_MODEL.get()  # waits if the model is still loading
+    if ASR_POOL:
+        return ASR_POOL.recognizer()
+    import vosk
+    return vosk.KaldiRecognizer(model, 8000)
+
+WARMUP = Warmup(STARTED)
+TTS_MODEL = WARMUP.add("csm", load_tts, warm_tts)
+ASR_MODEL = WARMUP.add("asr", load_asr, warm_asr)
+WARMUP.add("ollama", lambda: None, warm_ollama)
+MEMORY = WARMUP.add("memory", load_memory)
+WARMUP.start()
+
 if __name__ == "__main__":
     PORT = 5001
     # Import the specific exception class
@@ -298,19 +435,28 @@ if __name__ == "__main__":
         twiml_response.append(start)
         twiml_response.pause(length=int(60 * MAX_CALL_MIN))
         
-        try:
-            print(f"[twilio] Creating outbound call to {CALL_TO} from {TWILIO_FROM}...")
-            call = client.calls.create(to=CALL_TO, from_=TWILIO_FROM, twiml=str(twiml_response))
-            print(f"[twilio] Outbound call SID: {call.sid}")
-        except Exception as e:
-            import traceback
-            print(f"[twilio] Outbound call failed:", file=sys.stderr)
-            traceback.print_exc()
-            # Allow server to run even if outbound call fails, 
-            # maybe an inbound call will trigger it.
+        def place_call():
+            # Only ring once CSM and ASR are warm, so the first reply isn't a cold start
+            WARMUP.wait()
+            WARMUP.print_report()
+            if not (TTS_MODEL.ready and ASR_MODEL.ready):
+                print("[twilio] Not placing the outbound call: models failed to load.", file=sys.stderr)
+                return
+            try:
+                print(f"[twilio] Creating outbound call to {CALL_TO} from {TWILIO_FROM}...")
+                call = client.calls.create(to=CALL_TO, from_=TWILIO_FROM, twiml=str(twiml_response))
+                print(f"[twilio] Outbound call SID: {call.sid}")
+            except Exception as e:
+                import traceback
+                print(f"[twilio] Outbound call failed:", file=sys.stderr)
+                traceback.print_exc()
+                # Allow server to run even if outbound call fails, 
+                # maybe an inbound call will trigger it.
+
+        threading.Thread(target=place_call, daemon=True).start()
 
         # --- Run Flask App --- 
-        print(f"[flask] Starting server on port {PORT}...")
+        print(f"[flask] Starting server on port {PORT} ({time.perf_counter() - STARTED:.2f}s after start; models warming up)...")
         app.run(host="0.0.0.0", port=PORT)
 
     # Catch the specific PyngrokNgrokError
@@ -0,0 +1,91 @@
+'''
+Band-limited polyphase resampler.
+The Kaiser-windowed sinc filter bank is built once per (src, dst) pair and
+cached; `StreamResampler` keeps the filter history between chunks so audio
+can be converted piece by piece without clicks at the chunk edges.
+'''
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+
+KAISER_BETA = 5.0
+HALF_TAPS = 10  # filter half-length per unit of max(up, down), same default as scipy's resample_poly
+
+
+@lru_cache(maxsize=16)
+def filter_bank(src: int, dst: int) -> tuple:
+    '''
+    Returns (up, down, bank, delay). `bank[p]` holds the time-reversed taps of
+    phase p and `delay` is the group delay in output samples.
+    '''
+    g = gcd(src, dst)
+    up, down = dst // g, src // g
+    half_len = HALF_TAPS * max(up, down)
+    n = np.arange(2 * half_len + 1) - half_len
+    cutoff = 0.5 / max(up, down)  # cycles per sample at the upsampled rate
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(len(n), KAISER_BETA)
+    h *= up / h.sum()
+    taps = -(-len(h) // up)
+    h = np.concatenate([h, np.zeros(taps * up - len(h))])
+    bank = h.reshape(taps, up).T[:, ::-1].astype(np.float32)
+    bank.setflags(write=False)
+    return up, down, bank, half_len / down
+
+
+class StreamResampler:
+    '''Stateful resampler: feed chunks with `process`, then call `flush` once at the end.'''
+
+    def __init__(self, src: int, dst: int):
+        self.up, self.down, self.bank, delay = filter_bank(src, dst)
+        self.taps = self.bank.shape[1]
+        self._skip = int(round(delay))  # outputs swallowed to cancel the group delay
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._n_in = 0     # input samples seen
+        self._n_out = 0    # output samples computed, including skipped ones
+        self._emitted = 0  # output samples returned
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        chunk = np.asarray(chunk, dtype=np.float32).ravel()
+        buf = np.concatenate([self._history, chunk])
+        base = self._n_in - len(self._history)  # absolute index of buf[0]
+        self._n_in += len(chunk)
+        last = (self._n_in * self.up - 1) // self.down  # last output whose newest input has arrived
+        n = np.arange(self._n_out, last + 1)
+        self._n_out = last + 1
+        self._history = buf[len(buf) - (self.taps - 1):]
+        if not len(n):
+            return np.zeros(0, dtype=np.float32)
+        pos = n * self.down
+        start = pos // self.up - base - (self.taps - 1)
+        windows = np.lib.stride_tricks.sliding_window_view(buf, self.taps)
+        out = np.empty(len(n), dtype=np.float32)
+        # Outputs `up` apart share a phase and their windows sit `down` apart,
+        # so each phase is one strided (no-copy) matrix-vector product.
+        for k in range(min(self.up, len(n))):
+            s0, count = start[k], len(range(k, len(n), self.up))
+            out[k::self.up] = windows[s0:s0 + (count - 1) * self.down + 1:self.down] @ self.bank[pos[k] % self.up]
+        if self._skip:
+            drop = min(self._skip, len(out))
+            self._skip -= drop
+            out = out[drop:]
+        self._emitted += len(out)
+        return out
+
+    def flush(self) -> np.ndarray:
+        '''Pushes silence through the filter to emit the delayed tail.'''
+        expected = -(-self._n_in * self.up // self.down)
+        pad = np.zeros(self.taps, dtype=np.float32)
+        out = [np.zeros(0, dtype=np.float32)]
+        while self._emitted < expected:
+            out.append(self.process(pad))
+        tail = np.concatenate(out)
+        return tail[:len(tail) - (self._emitted - expected)]
+
+
+def resample(pcm: np.ndarray, src: int, dst: int) -> np.ndarray:
+    '''One-shot conversion of a whole buffer; output is aligned with the input.'''
+    if src == dst:
+        return np.asarray(pcm, dtype=np.float32)
+    r = StreamResampler(src, dst)
+    return np.concatenate([r.process(pcm), r.flush()])
@@ -0,0 +1,70 @@
+'''
+Speed and quality of the polyphase resampler against the old np.interp version.
+Run: python -m src.services.audio.tests.bench_resample
+'''
+import time
+
+import numpy as np
+
+from src.services.audio.resample import StreamResampler, resample
+
+SRC, DST = 24000, 8000  # CSM-1B -> Twilio
+SECONDS = 10
+
+
+def legacy_resample(pcm: np.ndarray, src: int, dst: int) -> np.ndarray:
+    # resample() as it was in code.py
+    dst_len = int(len(pcm) * dst / src)
+    idx = np.linspace(0, len(pcm) - 1, num=dst_len)
+    return np.interp(idx, np.arange(len(pcm)), pcm).astype(np.float32)
+
+
+def tone(freq, rate, seconds):
+    return np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+
+
+def db(x):
+    return 20 * np.log10(max(x, 1e-12))
+
+
+def rms(x):
+    return float(np.sqrt(np.mean(x[200:-200] ** 2)))
+
+
+def bench(name, fn, repeat=10):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    dt = (time.perf_counter() - t0) / repeat
+    print(f"{name:<30} {dt * 1000:8.2f} ms / {SECONDS}s audio   {SECONDS / dt:8.0f}x realtime")
+
+
+def chunked(pcm, size=2400):
+    r = StreamResampler(SRC, DST)
+    out = [r.process(pcm[o:o + size]) for o in range(0, len(pcm), size)]
+    return np.concatenate(out + [r.flush()])
+
+
+def main():
+    speech_like = np.random.default_rng(0).standard_normal(SRC * SECONDS).astype(np.float32) * 0.3
+    print("speed")
+    bench("legacy np.interp", lambda: legacy_resample(speech_like, SRC, DST))
+    bench("polyphase, one shot", lambda: resample(speech_like, SRC, DST))
+    bench("polyphase, 100 ms chunks", lambda: chunked(speech_like))
+
+    print("quality (aliasing of tones above 4 kHz, lower is better)")
+    for freq in (4500, 6000, 9000, 11000):
+        x = tone(freq, SRC, 1)
+        print(f"  {freq:5d} Hz   legacy {db(rms(legacy_resample(x, SRC, DST))):7.1f} dB"
+              f"   polyphase {db(rms(resample(x, SRC, DST))):7.1f} dB")
+    print("quality (error on in-band tones, lower is better)")
+    for freq in (300, 1000, 3000):
+        ref = tone(freq, DST, 1)
+        err_old = rms(legacy_resample(tone(freq, SRC, 1), SRC, DST) - ref)
+        err_new = rms(resample(tone(freq, SRC, 1), SRC, DST) - ref)
+        print(f"  {freq:5d} Hz   legacy {db(err_old):7.1f} dB   polyphase {db(err_new):7.1f} dB")
+
+
+if __name__ == "__main__":
+    main()
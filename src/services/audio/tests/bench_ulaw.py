@@ -0,0 +1,56 @@
+'''
+Throughput of the table codec against the old per-frame float encoder and audioop.
+Run: python -m src.services.audio.tests.bench_ulaw
+'''
+import time
+import warnings
+
+import numpy as np
+
+from src.services.audio import ulaw
+
+SECONDS = 10
+FRAME = ulaw.FRAME_SAMPLES
+MU = 255
+
+
+def legacy_encode_frame(pcm16: np.ndarray) -> bytes:
+    # pcm16_to_ulaw_bytes() as it was in code.py
+    x = pcm16.astype(np.float32) / 32768.0
+    mag = np.log1p(MU * np.abs(x)) / np.log1p(MU)
+    ul = np.sign(x) * mag
+    return (((ul + 1) / 2 * MU).astype(np.uint8) ^ 0xFF).tobytes()
+
+
+def bench(name, fn, repeat=20):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    dt = (time.perf_counter() - t0) / repeat
+    print(f"{name:<34} {dt * 1000:8.3f} ms / {SECONDS}s audio   {SECONDS / dt:10.0f}x realtime")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    pcm = (rng.standard_normal(8000 * SECONDS) * 6000).clip(-32768, 32767).astype(np.int16)
+    encoded = ulaw.encode(pcm).tobytes()
+
+    print("encode")
+    bench("legacy float math, per frame", lambda: [legacy_encode_frame(pcm[o:o + FRAME]) for o in range(0, len(pcm), FRAME)])
+    bench("table, whole utterance + frames", lambda: ulaw.frames(ulaw.encode(pcm)))
+    print("decode")
+    bench("table, per 20 ms frame", lambda: [ulaw.decode(encoded[o:o + FRAME]) for o in range(0, len(encoded), FRAME)])
+    bench("table, whole buffer", lambda: ulaw.decode(encoded))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            import audioop
+        except ImportError:
+            return
+    bench("audioop.ulaw2lin, per 20 ms frame", lambda: [audioop.ulaw2lin(encoded[o:o + FRAME], 2) for o in range(0, len(encoded), FRAME)])
+    bench("audioop.lin2ulaw, whole buffer", lambda: audioop.lin2ulaw(pcm.tobytes(), 2))
+
+
+if __name__ == "__main__":
+    main()
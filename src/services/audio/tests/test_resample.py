@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from src.services.audio.resample import StreamResampler, filter_bank, resample
+
+
+def tone(freq, rate, seconds=1.0):
+    return np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+
+
+@pytest.mark.parametrize("src, dst", [(24000, 8000), (16000, 8000), (8000, 16000), (44100, 8000)])
+def test_length_matches_rate_ratio(src, dst):
+    assert len(resample(tone(440, src, 0.5), src, dst)) == -(-int(src * 0.5) * dst // src)
+
+
+def test_passband_tone_is_preserved_and_aligned():
+    out = resample(tone(1000, 24000), 24000, 8000)
+    assert np.abs(out[100:-100] - tone(1000, 8000)[100:-100]).max() < 5e-3
+
+
+def test_tone_above_new_nyquist_is_rejected():
+    out = resample(tone(5000, 24000), 24000, 8000)
+    assert np.sqrt(np.mean(out[100:-100] ** 2)) < 0.01
+
+
+def test_chunked_stream_equals_one_shot():
+    x = np.random.default_rng(1).standard_normal(24000).astype(np.float32)
+    r = StreamResampler(24000, 8000)
+    sizes = [1, 2, 480, 3333, 17, 960]
+    parts, off = [], 0
+    while off < len(x):
+        n = sizes[len(parts) % len(sizes)]
+        parts.append(r.process(x[off:off + n]))
+        off += n
+    parts.append(r.flush())
+    np.testing.assert_allclose(np.concatenate(parts), resample(x, 24000, 8000), atol=1e-6)
+
+
+def test_filter_bank_is_cached():
+    assert filter_bank(24000, 8000) is filter_bank(24000, 8000)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src.services.audio import ulaw
+
+
+def g191_compress(x: int) -> int:
+    '''Line-by-line port of ulaw_compress() from the ITU-T G.191 STL g711.c.'''
+    absno = ((~x) >> 2) + 33 if x < 0 else (x >> 2) + 33
+    if absno > 0x1FFF:
+        absno = 0x1FFF
+    i = absno >> 6
+    segno = 1
+    while i != 0:
+        segno += 1
+        i >>= 1
+    high_nibble = 0x0008 - segno
+    low_nibble = 0x000F - ((absno >> segno) & 0x000F)
+    out = (high_nibble << 4) | low_nibble
+    if x >= 0:
+        out |= 0x0080
+    return out
+
+
+def g191_expand(code: int) -> int:
+    '''Line-by-line port of ulaw_expand() from the ITU-T G.191 STL g711.c.'''
+    sign = -1 if code < 0x0080 else 1
+    mantissa = ~code
+    exponent = (mantissa >> 4) & 0x0007
+    segment = exponent + 1
+    mantissa &= 0x000F
+    step = 4 << segment
+    return sign * ((0x0080 << exponent) + step * mantissa + step // 2 - 4 * 33)
+
+
+def test_encode_matches_reference_for_every_sample():
+    pcm = np.arange(-32768, 32768, dtype=np.int16)
+    expected = np.array([g191_compress(int(x)) for x in pcm], dtype=np.uint8)
+    assert np.array_equal(ulaw.encode(pcm), expected)
+
+
+def test_decode_matches_reference_for_every_code():
+    expected = np.array([g191_expand(c) for c in range(256)], dtype=np.int16)
+    assert np.array_equal(ulaw.decode(bytes(range(256))), expected)
+
+
+@pytest.mark.parametrize("code, pcm", [
+    (0x00, -32124), (0x0F, -16764), (0x10, -15996), (0x70, -120), (0x7E, -8), (0x7F, 0),
+    (0x80, 32124), (0xA0, 7932), (0xCE, 988), (0xF0, 120), (0xFE, 8), (0xFF, 0),
+])
+def test_decode_vectors(code, pcm):
+    assert ulaw.decode(bytes([code]))[0] == pcm
+
+
+@pytest.mark.parametrize("pcm, code", [
+    (0, 0xFF), (-1, 0x7F), (4, 0xFE), (-5, 0x7E), (100, 0xF2), (-100, 0x73), (1000, 0xCE),
+    (-1000, 0x4E), (8000, 0xA0), (-8000, 0x20), (32767, 0x80), (-32768, 0x00),
+])
+def test_encode_vectors(pcm, code):
+    assert ulaw.encode(np.array([pcm], dtype=np.int16))[0] == code
+
+
+def test_decoded_levels_are_fixed_points():
+    levels = ulaw.decode(bytes(range(256)))
+    assert np.array_equal(ulaw.decode(ulaw.encode(levels).tobytes()), levels)
+
+
+def test_frames_are_zero_copy_views():
+    encoded = ulaw.encode(np.zeros(ulaw.FRAME_SAMPLES * 3 + 7, dtype=np.int16))
+    frames = ulaw.frames(encoded)
+    assert len(frames) == 3 and all(len(f) == ulaw.FRAME_SAMPLES for f in frames)
+    assert np.shares_memory(np.frombuffer(frames[1], dtype=np.uint8), encoded)
+
+
+def test_pad_to_frame_uses_silence():
+    padded = ulaw.pad_to_frame(np.zeros(10, dtype=np.uint8))
+    assert len(padded) == ulaw.FRAME_SAMPLES and padded[-1] == 0xFF
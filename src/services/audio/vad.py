@@ -0,0 +1,37 @@
+'''
+Frame-level energy voice activity detector.
+Tracks an adaptive noise floor so line hiss and comfort noise on phone calls
+don't count as speech.
+'''
+import numpy as np
+
+FULL_SCALE = 32768.0 ** 2
+
+
+def frame_db(pcm16: np.ndarray) -> float:
+    '''Mean energy of an int16 frame in dBFS.'''
+    x = pcm16.astype(np.float32)
+    return float(10 * np.log10(np.dot(x, x) / (len(x) * FULL_SCALE) + 1e-10))
+
+
+class EnergyVAD:
+    '''
+    A frame is speech when it is `threshold_db` above the running noise floor
+    and louder than `min_level_db`. The floor drops instantly and rises slowly.
+    '''
+
+    def __init__(self, threshold_db: float = 10.0, min_level_db: float = -45.0,
+                 floor_db: float = -60.0, rise: float = 0.02):
+        self.threshold_db = threshold_db
+        self.min_level_db = min_level_db
+        self.floor_db = floor_db
+        self.rise = rise
+
+    def is_speech(self, pcm16: np.ndarray) -> bool:
+        level = frame_db(pcm16)
+        speech = level > max(self.floor_db + self.threshold_db, self.min_level_db)
+        if level < self.floor_db:
+            self.floor_db = level
+        elif not speech:
+            self.floor_db += self.rise * (level - self.floor_db)
+        return speech
@@ -0,0 +1,124 @@
+'''
+Batched generation for CSM-1B.
+The CSM repository's Generator synthesises one sentence at a time. This wraps
+it and runs a batch of sentences through the backbone together: the prompts
+are left-padded to one length, pad positions are masked out of attention, and
+every row then decodes one audio frame per step. The rows share positions;
+RoPE only sees relative distances, so padding doesn't change a row's result.
+A row is done at its own end-of-audio frame; it is decoded by Mimi,
+watermarked and handed to `on_audio` right away, while the longer rows go on.
+'''
+from typing import Callable, List
+
+import torch
+
+class _PadMasked(torch.nn.Module):
+    '''The backbone, with pad keys hidden from every real query.'''
+
+    def __init__(self, backbone, keep: torch.Tensor):
+        super().__init__()
+        self.backbone = backbone
+        self.keep = keep  # (batch, max_seq_len): False at the pad positions of each row
+
+    def caches_are_enabled(self) -> bool:
+        return self.backbone.caches_are_enabled()
+
+    def forward(self, h, input_pos, mask):
+        # Pad queries may see earlier pads: a query with no key at all would turn into NaN
+        pad_query = ~self.keep.gather(1, input_pos)
+        return self.backbone(h, input_pos=input_pos, mask=mask & (self.keep[:, None, :] | pad_query[..., None]))
+
+class BatchedGenerator:
+    '''`generate_batch` over a CSM Generator (generator.load_csm_1b()); `generate` is a batch of one.'''
+
+    def __init__(self, generator, temperature: float = 0.9, topk: int = 50):
+        self.generator = generator
+        self.model = generator._model
+        self.sample_rate = generator.sample_rate
+        self.device = generator.device
+        self.temperature = temperature
+        self.topk = topk
+        self.max_seq_len = self.model.backbone.max_seq_len
+        self._cache_batch = 1  # Generator sets the caches up for one row
+
+    def generate(self, text: str, speaker: int, context: list, max_audio_length_ms: int = 10000) -> torch.Tensor:
+        return self.generate_batch([text], [speaker], [context], max_audio_length_ms)[0]
+
+    def _prompt(self, text: str, speaker: int, context: list):
+        tokens, masks = [], []
+        for segment in context:
+            t, m = self.generator._tokenize_segment(segment)
+            tokens.append(t)
+            masks.append(m)
+        t, m = self.generator._tokenize_text_segment(text, speaker)
+        return torch.cat(tokens + [t]).long(), torch.cat(masks + [m]).bool()
+
+    def _audio(self, frames: List[torch.Tensor]) -> torch.Tensor:
+        from watermarking import CSM_1B_GH_WATERMARK, watermark  # from the CSM repository
+        import torchaudio
+        if not frames:
+            return torch.zeros(0)
+        codes = torch.stack(frames).permute(1, 0).unsqueeze(0)  # (1, codebooks, frames)
+        audio = self.generator._audio_tokenizer.decode(codes).squeeze(0).squeeze(0)
+        audio, rate = watermark(self.generator._watermarker, audio, self.sample_rate, CSM_1B_GH_WATERMARK)
+        return torchaudio.functional.resample(audio, orig_freq=rate, new_freq=self.sample_rate)
+
+    @torch.inference_mode()
+    def generate_batch(self, texts: List[str], speakers: List[int], contexts: List[list],
+                       max_audio_length_ms: int = 10000,
+                       on_audio: Callable[[int, torch.Tensor], None] | None = None) -> List[torch.Tensor]:
+        '''Audio per text; `on_audio(i, audio)` is called as soon as row `i` is finished.'''
+        b = len(texts)
+        prompts = [self._prompt(t, s, c) for t, s, c in zip(texts, speakers, contexts)]
+        length = max(len(t) for t, _ in prompts)
+        frames_max = min(int(max_audio_length_ms / 80), self.max_seq_len - length)
+        if frames_max <= 0:
+            raise ValueError(f"prompt of {length} tokens leaves no room for audio (max {self.max_seq_len})")
+
+        width = prompts[0][0].size(1)
+        tokens = torch.zeros(b, length, width, dtype=torch.long)
+        masks = torch.zeros(b, length, width, dtype=torch.bool)
+        keep = torch.ones(b, self.max_seq_len, dtype=torch.bool)
+        for i, (t, m) in enumerate(prompts):
+            pad = length - len(t)
+            tokens[i, pad:], masks[i, pad:] = t, m
+            keep[i, :pad] = False
+        tokens, masks, keep = tokens.to(self.device), masks.to(self.device), keep.to(self.device)
+
+        model = self.model
+        if self._cache_batch != b:
+            model.setup_caches(b)
+            self._cache_batch = b
+        model.reset_caches()
+        backbone = model.backbone
+        model.backbone = _PadMasked(backbone, keep)
+        samples: List[List[torch.Tensor]] = [[] for _ in range(b)]
+        out: List[torch.Tensor | None] = [None] * b
+        try:
+            pos = torch.arange(length, device=self.device).unsqueeze(0).repeat(b, 1)
+            for _ in range(frames_max):
+                sample = model.generate_frame(tokens, masks, pos, self.temperature, self.topk)  # (b, codebooks)
+                ended = (sample == 0).all(dim=1).tolist()
+                for i in range(b):
+                    if out[i] is not None:
+                        continue
+                    if ended[i]:
+                        out[i] = self._audio(samples[i])
+                        if on_audio:
+                            on_audio(i, out[i])
+                    else:
+                        samples[i].append(sample[i])
+                if all(a is not None for a in out):
+                    break
+                zeros = torch.zeros(b, 1, dtype=torch.long, device=self.device)
+                tokens = torch.cat([sample, zeros], dim=1).unsqueeze(1)
+                masks = torch.cat([torch.ones_like(sample).bool(), zeros.bool()], dim=1).unsqueeze(1)
+                pos = pos[:, -1:] + 1
+        finally:
+            model.backbone = backbone
+        for i in range(b):
+            if out[i] is None:  # hit max_audio_length_ms
+                out[i] = self._audio(samples[i])
+                if on_audio:
+                    on_audio(i, out[i])
+        return out
@@ -0,0 +1,114 @@
+import asyncio, os
+from typing import AsyncIterator, List
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from src.services.audio import ulaw
+from src.services.audio.resample import StreamResampler
+from src.services.csm_api.scheduler import FIRST_SENTENCE, FOLLOW_UP, TTSRequest, TTSScheduler
+from src.services.twilio_api.sentences import iter_sentences
+from src.services.warmup import Warmup
+
+'''
+Streaming TTS service around CSM-1B
+POST /csm_api/tts {"text": ..., "speaker": 0, "format": "ulaw8k" | "pcm16"}
+returns audio as each sentence is synthesised; dropping the connection cancels what is left.
+All requests share one generator through the batching scheduler. CSM_BACKEND=stub runs without weights.
+The model loads and runs a warm-up sentence in the background; /csm_api/ready says when it is done.
+'''
+
+app = FastAPI()
+BACKEND = os.getenv("CSM_BACKEND", "csm")                   # "csm" or "stub"
+DEVICE = os.getenv("CSM_DEVICE")                            # default: cuda when available
+MAX_BATCH = int(os.getenv("CSM_MAX_BATCH", "4"))
+CHUNK_MS = int(os.getenv("CSM_CHUNK_MS", "200"))            # audio per response chunk
+FORMATS = {"ulaw8k": "audio/basic", "pcm16": "audio/L16"}
+
+class TTSBody(BaseModel):
+    text: str
+    speaker: int = 0
+    format: str = "ulaw8k"
+
+def load_generator():
+    if BACKEND == "stub":
+        from src.services.csm_api.stub import StubGenerator
+        return StubGenerator()
+    import torch
+    from generator import load_csm_1b  # from the CSM repository, as in code.py
+    from src.services.csm_api.batched import BatchedGenerator
+    return BatchedGenerator(load_csm_1b(device=DEVICE or ("cuda" if torch.cuda.is_available() else "cpu")))
+
+def warm_scheduler(tts: TTSScheduler):
+    tts.synthesize("Hello there.")  # first inference pays for kernel selection and allocator growth
+
+warmup = Warmup()
+model = warmup.add("csm", lambda: TTSScheduler(load_generator(), max_batch=MAX_BATCH), warm_scheduler)
+
+def get_scheduler() -> TTSScheduler:
+    return model.get()
+
+def is_ready() -> bool:
+    return warmup.ready()
+
+@app.on_event("startup")
+async def startup():
+    warmup.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if model.ready:
+        model.value.close()
+
+@app.get("/csm_api/ready")
+async def ready(response: Response):
+    report = warmup.report()
+    response.status_code = 200 if report["ready"] else 503
+    return report
+
+@app.get("/csm_api/stats")
+async def stats():
+    return model.value.stats() if model.ready else {"requests": 0}
+
+def encoder(fmt: str, sample_rate: int):
+    '''
+    (encode, finish): float audio -> response bytes, and the bytes still owed after the last sentence.
+    μ-law keeps its resampler state across sentences and flushes its tail once, at the end.
+    '''
+    if fmt == "pcm16":
+        return (lambda audio: ulaw.float_to_pcm16(audio).tobytes()), (lambda: b"")
+    resampler = StreamResampler(sample_rate, 8000)
+    to_ulaw = lambda pcm: ulaw.encode(ulaw.float_to_pcm16(pcm)).tobytes()
+    return (lambda audio: to_ulaw(resampler.process(audio))), (lambda: to_ulaw(resampler.flush()))
+
+async def tts_chunks(tts: TTSScheduler, text: str, speaker: int, fmt: str,
+                     request: Request | None = None) -> AsyncIterator[bytes]:
+    # Queue every sentence up front: the scheduler batches them and serves the first one first
+    pending: List[TTSRequest] = [tts.submit(s, speaker, FIRST_SENTENCE if i == 0 else FOLLOW_UP)
+                                 for i, s in enumerate(iter_sentences([text]))]
+    encode, finish = encoder(fmt, tts.sample_rate)
+    step = (8000 if fmt == "ulaw8k" else tts.sample_rate * 2) * CHUNK_MS // 1000
+    try:
+        for r in pending:
+            audio = await r.aresult()
+            if request is not None and await request.is_disconnected():
+                break
+            data = encode(audio)
+            for i in range(0, len(data), step):
+                yield data[i:i + step]
+        else:
+            tail = finish()
+            if tail:
+                yield tail
+    finally:
+        for r in pending:  # client went away (or an error): don't synthesise the rest
+            r.cancel()
+
+@app.post("/csm_api/tts")
+async def tts(body: TTSBody, request: Request):
+    if body.format not in FORMATS:
+        raise HTTPException(400, f"format must be one of {sorted(FORMATS)}")
+    tts = await asyncio.get_running_loop().run_in_executor(None, get_scheduler)
+    rate = 8000 if body.format == "ulaw8k" else tts.sample_rate
+    media_type = FORMATS[body.format] + ("" if body.format == "ulaw8k" else f";rate={rate}")
+    return StreamingResponse(tts_chunks(tts, body.text, body.speaker, body.format, request),
+                             media_type=media_type, headers={"X-Sample-Rate": str(rate)})
@@ -0,0 +1,136 @@
+'''
+Disk-backed cache of finished TTS audio for phrases Lucy says on most calls
+(greetings, check-in openers, sign-offs).
+Entries are final 8 kHz μ-law, content-addressed by (normalised text, speaker,
+model version), one file each, memory-mapped on a hit and evicted LRU-first
+once the cache grows past its size cap. An entry is written to a temporary file
+and renamed into place; temporary files left by a crash are removed on start.
+'''
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+import numpy as np
+
+SUFFIX = ".ulaw"
+TMP_SUFFIX = ".tmp"
+
+
+def normalize(text: str) -> str:
+    # Case and spacing don't change what CSM says; punctuation does (prosody), so it stays
+    text = unicodedata.normalize("NFKC", text).replace("’", "'").replace("“", '"').replace("”", '"')
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _writing(tmp_name: str) -> bool:
+    '''Whether the process that owns a temporary file is still alive (it may share the directory).'''
+    try:
+        os.kill(int(tmp_name.split(".")[-3]), 0)
+    except (ValueError, IndexError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass  # alive, someone else's
+    return True
+
+
+class PhraseCache:
+    def __init__(self, root: str, model_version: str, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.model_version = model_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes, least recently used first
+        self._bytes = 0
+        os.makedirs(root, exist_ok=True)
+        entries = []
+        for name in os.listdir(root):
+            if name.endswith(SUFFIX):
+                st = os.stat(os.path.join(root, name))
+                entries.append((st.st_mtime, name[:-len(SUFFIX)], st.st_size))
+            elif name.endswith(TMP_SUFFIX) and not _writing(name):  # a put() that never got to its rename
+                _remove(os.path.join(root, name))
+        for _, key, size in sorted(entries):  # mtime is bumped on every hit
+            self._index[key] = size
+            self._bytes += size
+
+    def key(self, text: str, speaker: int) -> str:
+        return hashlib.sha256(f"{self.model_version}\0{speaker}\0{normalize(text)}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key + SUFFIX)
+
+    def get(self, text: str, speaker: int = 0) -> np.ndarray | None:
+        key = self.key(text, speaker)
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        try:
+            audio = np.memmap(self._path(key), dtype=np.uint8, mode="r")
+            os.utime(self._path(key))  # keeps LRU order across restarts
+            return audio
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self._bytes -= self._index.pop(key, 0)
+            return None
+
+    def put(self, text: str, speaker: int, ulaw: np.ndarray) -> None:
+        if not len(ulaw):
+            return
+        key = self.key(text, speaker)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}"
+        try:
+            np.ascontiguousarray(ulaw, dtype=np.uint8).tofile(tmp)
+            os.replace(tmp, path)  # readers never see a half-written entry
+        except BaseException:
+            _remove(tmp)
+            raise
+        with self._lock:
+            self._bytes += len(ulaw) - self._index.pop(key, 0)
+            self._index[key] = len(ulaw)
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old, size = self._index.popitem(last=False)
+                self._bytes -= size
+                _remove(self._path(old))
+
+    def prerender(self, phrases: Iterable[str], render: Callable[[str], np.ndarray], speaker: int = 0) -> int:
+        '''Renders every phrase not cached yet; returns how many were rendered.'''
+        rendered = 0
+        for phrase in phrases:
+            with self._lock:
+                if self.key(phrase, speaker) in self._index:
+                    continue
+            self.put(phrase, speaker, render(phrase))
+            rendered += 1
+        return rendered
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+def load_phrases(path: str | None, default: Iterable[str]) -> list:
+    '''One phrase per line; blank lines and # comments are skipped.'''
+    if not path:
+        return list(default)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
@@ -0,0 +1,190 @@
+'''
+Cross-call TTS scheduler.
+One worker thread owns the CSM generator and every call submits its sentences
+here instead of calling the model directly. Pending requests are collected into
+micro-batches within a short window, most urgent first (a reply's first sentence
+beats follow-ups, which beat background pre-rendering), and each request gets
+its own result stream back.
+
+Batches run through `generator.generate_batch(texts, speakers, contexts, max_audio_length_ms)`
+when the generator has one (batched.BatchedGenerator for CSM-1B, the stub); a
+batch-1 generator is driven one request at a time, re-checking priorities after
+each so a first sentence never waits behind a queue. A generator whose
+generate_batch takes `on_audio` hands each sentence over as soon as it is done,
+so a short one doesn't wait for the longest of its batch.
+'''
+import asyncio, heapq, inspect, itertools, queue, sys, threading, time
+from contextlib import nullcontext
+from typing import Iterator, List
+
+import numpy as np
+
+FIRST_SENTENCE, FOLLOW_UP, BACKGROUND = 0, 1, 2  # lower runs first
+
+_DONE = object()
+
+def to_numpy(audio) -> np.ndarray:
+    if hasattr(audio, "cpu"):
+        audio = audio.squeeze().cpu().numpy()
+    return np.asarray(audio, dtype=np.float32).ravel()
+
+class TTSRequest:
+    def __init__(self, text: str, speaker: int, priority: int):
+        self.text = text
+        self.speaker = speaker
+        self.priority = priority
+        self.submitted = time.perf_counter()
+        self.started: float | None = None
+        self.cancelled = threading.Event()
+        self.finished = False
+        self._chunks = queue.Queue()
+        self._watchers = []
+        self._lock = threading.Lock()
+
+    def chunks(self, timeout: float | None = None) -> Iterator[np.ndarray]:
+        '''Audio at the generator's sample rate: the whole sentence as one chunk, once it is synthesised.'''
+        while (item := self._chunks.get(timeout=timeout)) is not _DONE:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def result(self, timeout: float | None = None) -> np.ndarray:
+        parts = list(self.chunks(timeout))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    async def aresult(self) -> np.ndarray:
+        '''result() for asyncio callers, without parking an executor thread on the queue.'''
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        with self._lock:
+            if not self.finished:
+                self._watchers.append(lambda: loop.call_soon_threadsafe(done.set))
+            else:
+                done.set()
+        await done.wait()
+        return self.result(timeout=0)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _put(self, item):
+        self._chunks.put(item)
+        if item is _DONE:
+            with self._lock:
+                self.finished, watchers, self._watchers = True, self._watchers, []
+            for notify in watchers:
+                notify()
+
+    @property
+    def queue_wait(self) -> float | None:
+        return None if self.started is None else self.started - self.submitted
+
+class TTSScheduler:
+    def __init__(self, generator, max_batch: int = 4, window_ms: float = 10,
+                 max_audio_length_ms: int = 10000):
+        self.generator = generator
+        self.batched = hasattr(generator, "generate_batch")
+        self.early = self.batched and "on_audio" in inspect.signature(generator.generate_batch).parameters
+        self.max_batch = max_batch if self.batched else 1
+        self.window = window_ms / 1000
+        self.max_audio_length_ms = max_audio_length_ms
+        self.batches = 0
+        self.requests = 0
+        self.cancelled = 0
+        self.busy_s = 0.0
+        self._heap: List = []
+        self._order = itertools.count()
+        self._cv = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="tts-scheduler", daemon=True)
+        self._thread.start()
+
+    @property
+    def sample_rate(self) -> int:
+        return self.generator.sample_rate
+
+    def submit(self, text: str, speaker: int = 0, priority: int = FOLLOW_UP) -> TTSRequest:
+        request = TTSRequest(text, speaker, priority)
+        with self._cv:
+            heapq.heappush(self._heap, (priority, next(self._order), request))
+            self._cv.notify()
+        return request
+
+    def synthesize(self, text: str, speaker: int = 0, priority: int = FOLLOW_UP) -> np.ndarray:
+        return self.submit(text, speaker, priority).result()
+
+    def close(self):
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        self._thread.join(5)
+        with self._cv:
+            while self._heap:
+                heapq.heappop(self._heap)[2]._put(_DONE)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "requests": self.requests, "cancelled": self.cancelled,
+                "mean_batch": self.requests / self.batches if self.batches else 0.0,
+                "busy_s": round(self.busy_s, 3)}
+
+    def _next_batch(self) -> List[TTSRequest]:
+        with self._cv:
+            while not self._heap and not self._closed:
+                self._cv.wait()
+            if self._closed:
+                return []
+            batch = [heapq.heappop(self._heap)[2]]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                if not self._heap and not self._cv.wait(max(0.0, deadline - time.monotonic())):
+                    break
+                if self._heap:
+                    batch.append(heapq.heappop(self._heap)[2])
+            return batch
+
+    def _deliver(self, request: TTSRequest, audio):
+        if not request.finished:
+            request._put(to_numpy(audio))
+            request._put(_DONE)
+
+    def _run(self):
+        try:
+            import torch
+            inference = torch.inference_mode
+        except ImportError:
+            inference = nullcontext
+        while batch := self._next_batch():
+            live = [r for r in batch if not r.cancelled.is_set()]
+            for r in batch:
+                if r.cancelled.is_set():
+                    self.cancelled += 1
+                    r._put(_DONE)
+            if not live:
+                continue
+            t0 = time.perf_counter()
+            for r in live:
+                r.started = t0
+            try:
+                with inference():
+                    if self.batched:
+                        extra = {"on_audio": lambda i, audio: self._deliver(live[i], audio)} if self.early else {}
+                        audios = self.generator.generate_batch(
+                            texts=[r.text for r in live], speakers=[r.speaker for r in live],
+                            contexts=[[] for _ in live], max_audio_length_ms=self.max_audio_length_ms, **extra)
+                    else:
+                        audios = [self.generator.generate(text=live[0].text, speaker=live[0].speaker, context=[],
+                                                          max_audio_length_ms=self.max_audio_length_ms)]
+                for r, audio in zip(live, audios):
+                    self._deliver(r, audio)
+            except Exception as e:
+                print(f"\n[tts-scheduler] Generation failed: {e}", file=sys.stderr)
+                for r in live:
+                    if not r.finished:
+                        r._put(e)
+            finally:
+                for r in live:
+                    if not r.finished:
+                        r._put(_DONE)
+                self.busy_s += time.perf_counter() - t0
+                self.batches += 1
+                self.requests += len(live)
@@ -0,0 +1,39 @@
+'''
+Stand-in for the CSM generator, for tests and load runs without model weights.
+Produces a quiet tone whose length follows the text and takes `rtf` times that
+long to "synthesise"; a batch costs about as much as its longest member, like
+a GPU that still has headroom, and its shorter members are done earlier.
+'''
+import time
+from typing import Callable, List
+
+import numpy as np
+
+class StubGenerator:
+    sample_rate = 24000
+
+    def __init__(self, seconds_per_char: float = 0.06, rtf: float = 0.2):
+        self.seconds_per_char = seconds_per_char
+        self.rtf = rtf
+        self.calls = 0
+
+    def _audio(self, text: str) -> np.ndarray:
+        n = int(max(len(text), 1) * self.seconds_per_char * self.sample_rate)
+        return (0.1 * np.sin(2 * np.pi * 220 * np.arange(n) / self.sample_rate)).astype(np.float32)
+
+    def generate(self, text: str, speaker: int, context: list, max_audio_length_ms: int = 10000) -> np.ndarray:
+        return self.generate_batch([text], [speaker], [context], max_audio_length_ms)[0]
+
+    def generate_batch(self, texts: List[str], speakers: List[int], contexts: List[list],
+                       max_audio_length_ms: int = 10000,
+                       on_audio: Callable[[int, np.ndarray], None] | None = None) -> List[np.ndarray]:
+        audios = [self._audio(t)[:max_audio_length_ms * self.sample_rate // 1000] for t in texts]
+        spent = 0.0
+        for i in sorted(range(len(audios)), key=lambda i: len(audios[i])):  # rows finish shortest first
+            cost = self.rtf * len(audios[i]) / self.sample_rate
+            time.sleep(cost - spent)
+            spent = cost
+            if on_audio:
+                on_audio(i, audios[i])
+        self.calls += 1
+        return audios
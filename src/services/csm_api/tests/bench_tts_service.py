@@ -0,0 +1,67 @@
+'''
+Load test for the TTS service: N concurrent clients each stream one reply.
+Reports time to first audio byte, total time and audio produced per second of
+wall time. Runs the app in-process with the stub generator unless --url is given.
+
+Run: python -m src.services.csm_api.tests.bench_tts_service --clients 1 4 16 64
+'''
+import argparse, asyncio, os, socket, threading, time
+
+import httpx
+import numpy as np
+
+TEXT = ("Oh, that sounds lovely. I remember you said the garden was in full bloom last week. "
+        "Did the roses make it through the rain? Tell me everything.")
+
+
+def serve_stub() -> str:
+    os.environ["CSM_BACKEND"] = "stub"
+    import uvicorn
+    from src.services.csm_api.main import app
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def one(client: httpx.AsyncClient, url: str):
+    t0 = time.perf_counter()
+    first, size = None, 0
+    async with client.stream("POST", f"{url}/csm_api/tts", json={"text": TEXT}) as r:
+        async for chunk in r.aiter_bytes():
+            first = first or time.perf_counter() - t0
+            size += len(chunk)
+    return first, time.perf_counter() - t0, size / 8000
+
+
+async def load(url: str, clients: int):
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=clients)) as client:
+        await one(client, url)  # load the model / warm up
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(one(client, url) for _ in range(clients)))
+        wall = time.perf_counter() - t0
+        stats = (await client.get(f"{url}/csm_api/stats")).json()
+    ttfb = np.array([r[0] for r in results]) * 1000
+    total = np.array([r[1] for r in results])
+    audio = sum(r[2] for r in results)
+    print(f"{clients:4d} clients  first audio p50={np.percentile(ttfb, 50):7.0f} ms p95={np.percentile(ttfb, 95):7.0f} ms  "
+          f"reply p95={np.percentile(total, 95):6.2f}s  {audio / wall:6.1f} audio-s/s  "
+          f"mean batch={stats.get('mean_batch', 0):.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", help="running service (default: in-process stub)")
+    ap.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = ap.parse_args()
+    url = args.url or serve_stub()
+    for n in args.clients:
+        asyncio.run(load(url, n))
+
+
+if __name__ == "__main__":
+    main()
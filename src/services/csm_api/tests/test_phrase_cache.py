@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+
+from src.services.csm_api.phrase_cache import PhraseCache, load_phrases
+
+
+def audio(n, value=1):
+    return np.full(n, value, dtype=np.uint8)
+
+
+def test_hit_is_memory_mapped_and_normalised(tmp_path):
+    cache = PhraseCache(str(tmp_path), "csm-1b")
+    cache.put("Good morning!", 0, audio(1600, 7))
+    hit = cache.get("  good   MORNING! ", 0)
+    assert isinstance(hit, np.memmap) and np.array_equal(hit, audio(1600, 7))
+    assert cache.get("Good morning?", 0) is None      # punctuation changes prosody
+    assert cache.get("Good morning!", 1) is None      # other speaker
+    assert PhraseCache(str(tmp_path), "csm-2").get("Good morning!", 0) is None  # other model
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction_under_size_cap(tmp_path):
+    cache = PhraseCache(str(tmp_path), "v", max_bytes=3000)
+    for text in ("a", "b", "c"):
+        cache.put(text, 0, audio(1000))
+    cache.get("a", 0)
+    cache.put("d", 0, audio(1000))
+    assert cache.get("b", 0) is None
+    assert all(cache.get(t, 0) is not None for t in ("a", "c", "d"))
+    assert cache.size_bytes == 3000 and len(list(tmp_path.iterdir())) == 3
+
+
+def test_index_survives_restart(tmp_path):
+    PhraseCache(str(tmp_path), "v").put("See you tomorrow.", 0, audio(800))
+    assert len(PhraseCache(str(tmp_path), "v").get("See you tomorrow.", 0)) == 800
+
+
+def test_prerender_only_renders_misses(tmp_path):
+    cache = PhraseCache(str(tmp_path), "v")
+    rendered = []
+    render = lambda text: rendered.append(text) or audio(160)
+    assert cache.prerender(["Hi!", "Bye."], render) == 2
+    assert cache.prerender(["Hi!", "Bye.", "Ready?"], render) == 1
+    assert rendered == ["Hi!", "Bye.", "Ready?"]
+
+
+def test_load_phrases(tmp_path):
+    path = tmp_path / "phrases.txt"
+    path.write_text("# openers\nHey, it's Lucy.\n\nHow did it go?\n")
+    assert load_phrases(str(path), []) == ["Hey, it's Lucy.", "How did it go?"]
+    assert load_phrases(None, ["x"]) == ["x"]
+
+
+def test_leftover_temporary_files_are_removed_on_start(tmp_path):
+    cache = PhraseCache(str(tmp_path), "v")
+    cache.put("hello", 0, audio(100))
+    path = cache._path(cache.key("hello", 0))
+    crashed = tmp_path / f"{cache.key('bye', 0)}.ulaw.999999999.1.tmp"  # no such process
+    writing = tmp_path / f"{cache.key('hi', 0)}.ulaw.{os.getpid()}.1.tmp"
+    crashed.write_bytes(b"half")
+    writing.write_bytes(b"half")
+    cache = PhraseCache(str(tmp_path), "v")
+    assert not crashed.exists() and writing.exists()
+    assert len(cache) == 1 and os.path.exists(path)
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import numpy as np
+
+from src.services.csm_api.scheduler import BACKGROUND, FIRST_SENTENCE, FOLLOW_UP, TTSScheduler
+
+
+class FakeGenerator:
+    '''Batch-1 generator: 10 ms per request, audio length = len(text).'''
+    sample_rate = 24000
+
+    def __init__(self, delay=0.01, gate=None):
+        self.delay, self.gate, self.calls = delay, gate, []
+
+    def generate(self, text, speaker, context, max_audio_length_ms):
+        if self.gate:
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        self.calls.append(text)
+        return np.ones(len(text), dtype=np.float32)
+
+
+class FakeBatchGenerator(FakeGenerator):
+    '''Costs the same per batch as per single request, like a GPU with headroom.'''
+
+    def __init__(self, delay=0.01):
+        super().__init__(delay)
+        self.batch_sizes = []
+
+    def generate_batch(self, texts, speakers, contexts, max_audio_length_ms):
+        time.sleep(self.delay)
+        self.batch_sizes.append(len(texts))
+        return [np.ones(len(t), dtype=np.float32) for t in texts]
+
+
+def test_each_request_gets_its_own_audio():
+    tts = TTSScheduler(FakeGenerator(delay=0))
+    try:
+        requests = [tts.submit("x" * n) for n in (3, 5, 7)]
+        assert [len(r.result(timeout=2)) for r in requests] == [3, 5, 7]
+    finally:
+        tts.close()
+
+
+def test_first_sentences_jump_the_queue():
+    gate = threading.Event()
+    gen = FakeGenerator(delay=0, gate=gate)
+    tts = TTSScheduler(gen)
+    try:
+        blocker = tts.submit("busy")
+        time.sleep(0.05)  # worker is now stuck on "busy"
+        later = [tts.submit("prerender", priority=BACKGROUND), tts.submit("follow", priority=FOLLOW_UP),
+                 tts.submit("first", priority=FIRST_SENTENCE)]
+        gate.set()
+        for r in [blocker] + later:
+            r.result(timeout=2)
+        assert gen.calls == ["busy", "first", "follow", "prerender"]
+    finally:
+        tts.close()
+
+
+def test_concurrent_calls_are_batched():
+    gen = FakeBatchGenerator(delay=0.02)
+    tts = TTSScheduler(gen, max_batch=8, window_ms=20)
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(tts.synthesize(f"call {i}")))
+                   for i in range(16)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        elapsed = time.perf_counter() - t0
+        assert len(results) == 16
+        assert max(gen.batch_sizes) > 1 and sum(gen.batch_sizes) == 16
+        assert elapsed < 16 * 0.02  # better than one request at a time
+    finally:
+        tts.close()
+
+
+def test_cancelled_requests_are_skipped():
+    gate = threading.Event()
+    gen = FakeGenerator(delay=0, gate=gate)
+    tts = TTSScheduler(gen)
+    try:
+        tts.submit("busy")
+        time.sleep(0.05)
+        dropped = tts.submit("stale")
+        dropped.cancel()
+        kept = tts.submit("fresh")
+        gate.set()
+        assert len(kept.result(timeout=2)) == 5
+        assert len(dropped.result(timeout=2)) == 0
+        assert "stale" not in gen.calls and tts.cancelled == 1
+    finally:
+        tts.close()
+
+
+def test_short_sentence_is_not_held_by_its_batch():
+    from src.services.csm_api.stub import StubGenerator
+    tts = TTSScheduler(StubGenerator(seconds_per_char=0.01, rtf=1.0), window_ms=50)
+    try:
+        long, short = tts.submit("x" * 40), tts.submit("hi")
+        t0 = time.perf_counter()
+        short.result(timeout=2)
+        short_s = time.perf_counter() - t0
+        long.result(timeout=2)
+        assert tts.batches == 1
+        assert short_s < 0.2 < time.perf_counter() - t0  # 20 ms of audio, then 400 ms
+    finally:
+        tts.close()
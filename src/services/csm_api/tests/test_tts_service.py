@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from src.services.csm_api import main
+from src.services.csm_api.scheduler import TTSScheduler
+from src.services.csm_api.stub import StubGenerator
+
+TEXT = "Hello there, nice to hear from you. I was just thinking about our walk. Shall we go again tomorrow?"
+
+
+def stub_client():
+    main.BACKEND = "stub"
+    main.model.reset()
+    return TestClient(main.app)
+
+
+def test_streams_ulaw_per_sentence():
+    with stub_client() as client:
+        r = client.post("/csm_api/tts", json={"text": TEXT})
+    assert r.status_code == 200 and r.headers["x-sample-rate"] == "8000"
+    assert abs(len(r.content) - len(TEXT) * 0.06 * 8000) < 8000 * 0.1  # 60 ms of audio per character
+    assert main.model.value.requests == 2 + 1  # one per sentence, plus the warm-up
+
+
+def test_chunks_are_yielded_as_sentences_finish():
+    tts = TTSScheduler(StubGenerator(), max_batch=1)
+
+    async def collect():
+        return [(chunk, time.monotonic()) async for chunk in main.tts_chunks(tts, TEXT, 0, "ulaw8k")]
+
+    try:
+        chunks = asyncio.run(collect())
+        assert len(chunks) > 2
+        assert all(len(c) <= 8000 * main.CHUNK_MS // 1000 for c, _ in chunks)
+        assert chunks[-1][1] - chunks[0][1] > 0.1  # the first audio left before the last sentence was done
+    finally:
+        tts.close()
+
+
+def test_pcm16_at_generator_rate():
+    with stub_client() as client:
+        r = client.post("/csm_api/tts", json={"text": "Hi.", "format": "pcm16"})
+    assert r.status_code == 200 and r.headers["x-sample-rate"] == "24000"
+    assert len(r.content) == 2 * int(3 * 0.06 * 24000)
+
+
+def test_ready_once_warmed_up():
+    with stub_client() as client:
+        assert main.model.get(timeout=5)
+        r = client.get("/csm_api/ready")
+        assert r.status_code == 200 and r.json()["components"]["csm"]["warm_s"] is not None
+
+
+def test_unknown_format_is_rejected():
+    with stub_client() as client:
+        assert client.post("/csm_api/tts", json={"text": "Hi.", "format": "mp3"}).status_code == 400
+
+
+def test_leaving_early_cancels_remaining_sentences():
+    tts = TTSScheduler(StubGenerator(rtf=0.5), max_batch=1)
+
+    async def first_chunk_then_leave():
+        chunks = main.tts_chunks(tts, " ".join([TEXT] * 3), 0, "ulaw8k")
+        first = await chunks.__anext__()
+        await chunks.aclose()
+        return first
+
+    try:
+        assert asyncio.run(first_chunk_then_leave())
+        deadline = time.monotonic() + 3
+        while tts._heap and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert tts.cancelled >= 3
+    finally:
+        tts.close()
+
+
+def test_empty_sentence_does_not_flush_the_resampler():
+    audio = np.sin(np.arange(24000) / 7).astype(np.float32)
+    encode, finish = main.encoder("ulaw8k", 24000)
+    whole = encode(audio) + finish()
+    encode, finish = main.encoder("ulaw8k", 24000)
+    split = encode(audio[:12000]) + encode(np.zeros(0, dtype=np.float32)) + encode(audio[12000:]) + finish()
+    assert split == whole and len(whole) == 8000
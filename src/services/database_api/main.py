@@ -1,61 +1,83 @@
-from fastapi import FastAPI
-import sqlalchemy
-import sqlite3
-import databases
+from fastapi import FastAPI, Query, Response
+import asyncio
 import os
 
-from ulid import ULID # from 'python-ulid' module
-import datetime
+from src.services.database_api.memory import HashingEmbedder, MemoryIndex, OllamaEmbedder
+from src.services.database_api.store import UserStore
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 DATA_DIR = os.path.join(BASE_DIR, "data")
-DATABASE_URL = f"sqlite:///{os.path.join(DATA_DIR, 'users.db')}"
+DATABASE_PATH = os.path.join(DATA_DIR, "users.db")
+READERS = int(os.getenv("DB_READERS", "4"))            # read-only connections kept open
+CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "10000"))  # users kept in memory for lookups
+VECTORS_PATH = os.path.join(DATA_DIR, "memory.f32")
+EMBEDDER = os.getenv("MEMORY_EMBEDDER", "hash")         # "hash" or "ollama"
 
-database = databases.Database(DATABASE_URL)
-metadata = sqlalchemy.MetaData()
+store: UserStore | None = None
+memory: MemoryIndex | None = None
 
-users = sqlalchemy.Table(
-    "users", metadata,
-    sqlalchemy.Column("user_id",    sqlalchemy.String, unique=True),
-    sqlalchemy.Column("name",  sqlalchemy.String),
-    sqlalchemy.Column("phone_number", sqlalchemy.String, unique=True),
-)
-
-# Engine for sync tasks (like migrations)
-engine = sqlalchemy.create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
-metadata.create_all(engine)
+def load_embedder():
+    if EMBEDDER == "ollama":
+        return OllamaEmbedder(os.getenv("OLLAMA_HOST", "http://192.168.1.234:11434"),
+                              os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text"))
+    return HashingEmbedder()
 
 app = FastAPI()
 
 @app.on_event("startup")
 async def startup():
-    await database.connect()
+    global store, memory
+    os.makedirs(DATA_DIR, exist_ok=True)
+    store = UserStore(DATABASE_PATH, readers=READERS, cache_size=CACHE_SIZE)
+    memory = MemoryIndex(DATABASE_PATH, VECTORS_PATH, load_embedder())
 
 @app.on_event("shutdown")
 async def shutdown():
-    await database.disconnect()
+    if store:
+        store.close()
+    if memory:
+        memory.close()
+
+def is_ready() -> bool:
+    return store is not None
+
+@app.get("/database_api/ready")
+async def ready(response: Response):
+    response.status_code = 200 if is_ready() else 503
+    return {"ready": is_ready()}
+
+@app.get("/database_api/stats")
+async def stats():
+    return store.stats() if store else {}
 
 @app.post("/database_api/create_user")
 async def create_user(payload: dict):
-    name = payload.get("name")
-    phone_number = payload.get("phone_number")
-    user_id = str(ULID.from_datetime(datetime.datetime.now()))
-    query = users.insert().values(user_id=user_id, name=name, phone_number=phone_number)
-    try:
-        await database.execute(query)
-    except sqlite3.IntegrityError:
-        query = users.select().where(users.c.phone_number == phone_number)
-        existing_user = await database.fetch_one(query)
-        return existing_user
-    return await get_user(user_id) # Check if user was created
+    # Existing phone numbers return the user already on file
+    return await store.create_user(payload.get("name"), payload.get("phone_number"))
+
+@app.post("/database_api/create_users")
+async def create_users(payload: dict):
+    users = payload.get("users", [])
+    created = await store.create_users(users)
+    return {"created": created, "existing": len(users) - created}
 
 @app.get("/database_api/get_user/{user_id}")
 async def get_user(user_id: str):
-    query = users.select().where(users.c.user_id == user_id)
-    user = await database.fetch_one(query)
-    return user
+    return await store.get_user(user_id)
+
+@app.get("/database_api/get_user_by_phone/{phone_number}")
+async def get_user_by_phone(phone_number: str):
+    return await store.get_user_by_phone(phone_number)
+
+@app.post("/database_api/memory/{user_id}")
+async def add_memory(user_id: str, payload: dict):
+    # {"call_sid": ..., "utterances": [{"role": "caller" | "lucy", "text": ...}, ...]}
+    added = await asyncio.to_thread(memory.add, user_id, payload.get("call_sid"), payload.get("utterances", []))
+    return {"added": added}
+
+@app.get("/database_api/memory/{user_id}/search")
+async def search_memory(user_id: str, q: str, k: int = Query(3, ge=1, le=50)):
+    return await asyncio.to_thread(memory.search, user_id, q, k)
 
 def is_port_in_use(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
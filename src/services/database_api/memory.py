@@ -0,0 +1,236 @@
+'''
+Conversation memory: every utterance of every call, searchable per user.
+Texts live in the `utterances` table of the users database; their embeddings
+in an append-only float32 matrix in a memory-mapped file. The file is handed
+out to users in extents that double in size (64, 128, ... rows), so a user's
+vectors sit in a handful of contiguous slices: a search is one matrix-vector
+product per extent, straight off the map, whatever the total size of the store.
+'''
+import os, re, sqlite3, threading, time, zlib
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from src.services.database_api.store import PRAGMAS, create_schema
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by do did for from had has have i i'm im in is it it's its just like me my "
+    "of oh on or so that the them then there they this to um uh was we were what with yeah you your".split())
+
+class HashingEmbedder:
+    '''
+    Feature hashing of words and word pairs into `dim` signed buckets.
+    No model and microseconds per sentence; it matches on shared words, which
+    is what "what did they tell me about their exam" needs.
+    '''
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = [w for w in re.findall(r"[a-z0-9']+", text.lower()) if w not in STOPWORDS]
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode())
+                out[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-9)
+
+class OllamaEmbedder:
+    '''Embeddings from an Ollama embedding model (e.g. nomic-embed-text, 768 dimensions).'''
+
+    def __init__(self, host: str, model: str = "nomic-embed-text", dim: int = 768):
+        import httpx
+        self.client = httpx.Client(base_url=host, timeout=30)
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        r = self.client.post("/api/embed", json={"model": self.model, "input": texts})
+        r.raise_for_status()
+        out = np.asarray(r.json()["embeddings"], dtype=np.float32).reshape(len(texts), self.dim)
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-9)
+
+class VectorFile:
+    '''Append-only float32 matrix backed by a memory-mapped file that grows in chunks.'''
+
+    def __init__(self, path: str, dim: int, rows: int = 0, chunk_rows: int = 65536):
+        self.path = path
+        self.dim = dim
+        self.chunk_rows = chunk_rows
+        self.count = rows  # rows handed out; the rest of the file is preallocated
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self.capacity = os.path.getsize(path) // (dim * 4)
+        if self.capacity < rows:
+            raise ValueError(f"{path} holds {self.capacity} vectors, the database expects {rows}")
+        self._map()
+
+    def _map(self):
+        if self.capacity:
+            self.matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+
+    def allocate(self, rows: int) -> int:
+        '''Reserves `rows` rows at the end; returns the first.'''
+        start, end = self.count, self.count + rows
+        if end > self.capacity:
+            # Grow by doubling, so appends stay amortised O(1); earlier maps of the file remain valid
+            self.capacity = max(end, 2 * self.capacity, self.chunk_rows)
+            os.truncate(self.path, self.capacity * self.dim * 4)
+            self._map()
+        self.count = end
+        return start
+
+    def append(self, vectors: np.ndarray) -> int:
+        start = self.allocate(len(vectors))
+        self.matrix[start:start + len(vectors)] = vectors
+        return start
+
+    def flush(self):
+        if isinstance(self.matrix, np.memmap):
+            self.matrix.flush()
+
+class Extents:
+    '''One user's slices of the vector file: `used` rows filled in order across them.'''
+
+    def __init__(self, starts: List[int], sizes: List[int], used: int):
+        self.starts, self.sizes, self.used = starts, sizes, used
+
+    def pieces(self, last: int | None = None) -> List[Tuple[int, int]]:
+        '''(start, rows) of the filled slices, limited to the `last` rows.'''
+        out, left = [], self.used
+        for start, size in zip(self.starts, self.sizes):
+            if left <= 0:
+                break
+            out.append((start, min(size, left)))
+            left -= size
+        if last is not None:
+            skip = self.used - last
+            while skip > 0 and out:
+                start, n = out[0]
+                if n <= skip:
+                    out.pop(0)
+                    skip -= n
+                else:
+                    out[0] = (start + skip, n - skip)
+                    skip = 0
+        return out
+
+    def free_rows(self, n: int) -> List[Tuple[int, int]]:
+        '''(start, rows) slices where the next `n` rows go, within the current extents.'''
+        out, offset = [], 0
+        for start, size in zip(self.starts, self.sizes):
+            lo = max(self.used - offset, 0)
+            if lo < size and n > 0:
+                take = min(size - lo, n)
+                out.append((start + lo, take))
+                n -= take
+            offset += size
+        return out
+
+class MemoryIndex:
+    MIN_EXTENT, MAX_EXTENT = 64, 65536
+
+    def __init__(self, path: str, vectors_path: str, embedder=None, max_rows: int = 200_000):
+        self.embedder = embedder or HashingEmbedder()
+        self.max_rows = max_rows  # a search looks at this many of the user's most recent utterances
+        self._lock = threading.Lock()
+        self._extents: Dict[str, Extents] = {}  # loaded on a user's first add or search
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            self.db.execute(pragma)
+        create_schema(self.db)
+        self.db.execute("CREATE TABLE IF NOT EXISTS utterances ("
+                        "row INTEGER PRIMARY KEY, user_id VARCHAR NOT NULL, call_sid VARCHAR, "
+                        "role VARCHAR NOT NULL, text TEXT NOT NULL, created_at REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS ix_utterances_user_id ON utterances (user_id)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS memory_extents ("
+                        "user_id VARCHAR NOT NULL, start INTEGER NOT NULL, size INTEGER NOT NULL, "
+                        "PRIMARY KEY (user_id, start))")
+        # Space handed out by a write that never committed is simply handed out again
+        rows = self.db.execute("SELECT coalesce(max(start + size), 0) FROM memory_extents").fetchone()[0]
+        self.vectors = VectorFile(vectors_path, self.embedder.dim, rows)
+
+    def _user(self, user_id: str) -> Extents:
+        ext = self._extents.get(user_id)
+        if ext is None:
+            found = self.db.execute("SELECT start, size FROM memory_extents WHERE user_id = ? ORDER BY start",
+                                    (user_id,)).fetchall()
+            used = self.db.execute("SELECT count(*) FROM utterances WHERE user_id = ?", (user_id,)).fetchone()[0]
+            ext = self._extents[user_id] = Extents([r[0] for r in found], [r[1] for r in found], used)
+        return ext
+
+    def add(self, user_id: str, call_sid: str | None, utterances: Iterable[Dict]) -> int:
+        '''Stores {"role", "text"} utterances of one call; returns how many.'''
+        items = [(u["role"], u["text"].strip()) for u in utterances if u.get("text", "").strip()]
+        if not items:
+            return 0
+        vectors = self.embedder.embed([text for _, text in items])
+        now = time.time()
+        with self._lock:
+            ext = self._user(user_id)
+            new = []
+            while sum(ext.sizes) + sum(size for _, size in new) < ext.used + len(items):
+                size = min(max(self.MIN_EXTENT, sum(ext.sizes) + sum(s for _, s in new)), self.MAX_EXTENT)
+                new.append((self.vectors.allocate(size), size))
+            grown = Extents(ext.starts + [s for s, _ in new], ext.sizes + [n for _, n in new], ext.used)
+            rows, done = [], 0
+            for start, n in grown.free_rows(len(items)):
+                self.vectors.matrix[start:start + n] = vectors[done:done + n]
+                rows.extend(range(start, start + n))
+                done += n
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany("INSERT INTO memory_extents (user_id, start, size) VALUES (?, ?, ?)",
+                                    [(user_id, start, size) for start, size in new])
+                self.db.executemany(
+                    "INSERT INTO utterances (row, user_id, call_sid, role, text, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(row, user_id, call_sid, role, text, now) for row, (role, text) in zip(rows, items)])
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            grown.used += len(items)
+            self._extents[user_id] = grown
+        return len(items)
+
+    def search(self, user_id: str, query: str, k: int = 3, min_score: float = 0.2) -> List[Dict]:
+        '''The user's `k` utterances most similar to `query`, best first.'''
+        with self._lock:
+            pieces = self._user(user_id).pieces(self.max_rows)
+            matrix = self.vectors.matrix
+        if not pieces or not query.strip() or k < 1:
+            return []
+        q = self.embedder.embed([query])[0]
+        scores = np.concatenate([matrix[start:start + n] @ q for start, n in pieces])
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] >= min_score]
+        if not len(top):
+            return []
+        # Position in the concatenated scores -> row of the vector file
+        ends = np.cumsum([n for _, n in pieces])
+        piece = np.searchsorted(ends, top, side="right")
+        starts = np.array([start for start, _ in pieces])
+        rows = [int(r) for r in starts[piece] + top - (ends[piece] - np.array([pieces[p][1] for p in piece]))]
+        with self._lock:
+            found = {r["row"]: r for r in self.db.execute(
+                f"SELECT row, role, text, call_sid, created_at FROM utterances WHERE row IN ({','.join('?' * len(rows))})",
+                rows)}
+        return [dict(found[row], score=round(float(scores[i]), 3)) for row, i in zip(rows, top)]
+
+    def count(self, user_id: str | None = None) -> int:
+        with self._lock:
+            if user_id is None:
+                return self.db.execute("SELECT count(*) FROM utterances").fetchone()[0]
+            return self._user(user_id).used
+
+    def close(self):
+        with self._lock:
+            self.vectors.flush()  # vectors otherwise reach the disk when the OS writes the pages back
+            self.db.close()
@@ -0,0 +1,145 @@
+'''
+SQLite user store for the database API.
+The database runs in WAL mode so lookups never wait for a write. All writes go
+through one connection on one thread (SQLite has a single writer anyway), reads
+through a small pool of read-only connections; both stay open for the life of
+the process. Creating a user is a single upsert statement, bulk imports are one
+transaction, and recently read users are served from an in-process LRU.
+'''
+import asyncio, sqlite3, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+from ulid import ULID  # from 'python-ulid' module
+
+PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",   # WAL stays consistent; only the last commits can be lost on power failure
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",    # 64 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # reads straight from the page cache of the OS
+)
+COLUMNS = "user_id, name, phone_number"
+UPSERT = (f"INSERT INTO users ({COLUMNS}) VALUES (?, ?, ?) "
+          # a no-op update, so the existing row comes back through RETURNING
+          f"ON CONFLICT(phone_number) DO UPDATE SET phone_number = excluded.phone_number RETURNING {COLUMNS}")
+INSERT_MANY = f"INSERT INTO users ({COLUMNS}) VALUES (?, ?, ?) ON CONFLICT(phone_number) DO NOTHING"
+
+def new_user_id() -> str:
+    return str(ULID())
+
+def create_schema(db: sqlite3.Connection):
+    '''WAL mode and the users table with its indexes; safe to run on every start.'''
+    db.execute("PRAGMA journal_mode=WAL")  # persistent: recorded in the database file
+    db.execute("CREATE TABLE IF NOT EXISTS users (user_id VARCHAR, name VARCHAR, phone_number VARCHAR)")
+    # Stores created by the old schema already have unique indexes from inline UNIQUE constraints
+    unique = set()
+    for index in db.execute("PRAGMA index_list(users)").fetchall():
+        if index["unique"]:
+            unique.update(row["name"] for row in db.execute(f"PRAGMA index_info('{index['name']}')"))
+    for column in ("user_id", "phone_number"):
+        if column not in unique:
+            db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ix_users_{column} ON users ({column})")
+
+class UserStore:
+    def __init__(self, path: str, readers: int = 4, cache_size: int = 10000):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, Dict]" = OrderedDict()  # user_id and "tel:<phone>" keys, least recent first
+        self.hits = self.misses = 0
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        db = self._connect()
+        create_schema(db)
+        db.close()
+        self._writer = ThreadPoolExecutor(1, "db-write", initializer=self._open)
+        self._readers = ThreadPoolExecutor(readers, "db-read", initializer=self._open, initargs=(True,))
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            db.execute(pragma)
+        if readonly:
+            db.execute("PRAGMA query_only=1")
+        return db
+
+    def _open(self, readonly: bool = False):
+        self._local.db = self._connect(readonly)
+        with self._lock:
+            self._connections.append(self._local.db)
+
+    # ── writes ─────────────────────────────────────────────────────────────
+    def _upsert(self, name, phone_number) -> Dict:
+        return dict(self._local.db.execute(UPSERT, (new_user_id(), name, phone_number)).fetchone())
+
+    def _insert_many(self, rows: List[tuple]) -> int:
+        db = self._local.db
+        before = db.total_changes
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(INSERT_MANY, rows)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return db.total_changes - before
+
+    async def create_user(self, name, phone_number) -> Dict:
+        '''The new user, or the existing one with that phone number.'''
+        loop = asyncio.get_running_loop()
+        user = await loop.run_in_executor(self._writer, self._upsert, name, phone_number)
+        self._remember(user)
+        return user
+
+    async def create_users(self, users: Iterable[Dict]) -> int:
+        '''Inserts many users in one transaction; existing phone numbers are skipped. Returns how many were new.'''
+        rows = [(new_user_id(), u.get("name"), u.get("phone_number")) for u in users]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._insert_many, rows)
+
+    # ── reads ──────────────────────────────────────────────────────────────
+    def _fetch(self, column: str, value) -> Dict | None:
+        row = self._local.db.execute(f"SELECT {COLUMNS} FROM users WHERE {column} = ?", (value,)).fetchone()
+        return dict(row) if row else None
+
+    async def _get(self, key: str, column: str, value) -> Dict | None:
+        user = self.cache.get(key)
+        if user is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return user
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        user = await loop.run_in_executor(self._readers, self._fetch, column, value)
+        if user:  # misses are not cached: the user may be created a moment later
+            self._remember(user)
+        return user
+
+    async def get_user(self, user_id: str) -> Dict | None:
+        return await self._get(user_id, "user_id", user_id)
+
+    async def get_user_by_phone(self, phone_number: str) -> Dict | None:
+        return await self._get(f"tel:{phone_number}", "phone_number", phone_number)
+
+    def _remember(self, user: Dict):
+        # Users are never updated or deleted, so cached rows cannot go stale
+        keys = [user["user_id"]] + ([f"tel:{user['phone_number']}"] if user["phone_number"] is not None else [])
+        for key in keys:
+            self.cache[key] = user
+            self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"cached": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._writer.shutdown()
+        self._readers.shutdown()
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
@@ -0,0 +1,60 @@
+'''
+Benchmark for the conversation memory index: --utterances utterances spread
+over --users users (plus one heavy user with --heavy of them), stored one call
+(50 utterances) at a time, then per-turn search latency for a typical and for
+the heavy user, cold (first search after a restart) and warm.
+
+Run: python -m src.services.database_api.tests.bench_memory_index --utterances 2000000
+'''
+import argparse, os, random, tempfile, time
+
+import numpy as np
+
+from src.services.database_api.memory import MemoryIndex
+
+WORDS = ("exam study gym run sister mom dad work boss project deadline sleep tired coffee friend party "
+         "guitar practice essay math chemistry piano diet walk dog cat weekend trip money rent job "
+         "interview code bug launch meeting lunch dinner movie book read write call doctor").split()
+
+
+def sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14)))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--utterances", type=int, default=2_000_000)
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--heavy", type=int, default=100_000, help="utterances of the heaviest user")
+    ap.add_argument("--searches", type=int, default=500)
+    args = ap.parse_args()
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db, vectors = os.path.join(tmp, "users.db"), os.path.join(tmp, "memory.f32")
+        memory = MemoryIndex(db, vectors)
+        t = time.perf_counter()
+        for n in range(0, args.utterances, 50):
+            user = "heavy" if n < args.heavy else f"user{rng.randrange(args.users)}"
+            memory.add(user, f"CA{n}", [{"role": "caller", "text": sentence(rng)} for _ in range(50)])
+        wall = time.perf_counter() - t
+        print(f"stored       {memory.count():,} utterances in {wall:.0f}s = {memory.count() / wall:,.0f}/s "
+              f"(vectors {os.path.getsize(vectors) / 1e6:.0f} MB)")
+        memory.close()
+
+        memory = MemoryIndex(db, vectors)  # restart: per-user rows are loaded on first use
+        for label, user in (("typical", "user7"), ("heavy", "heavy")):
+            t = time.perf_counter()
+            memory.search(user, sentence(rng))
+            cold = (time.perf_counter() - t) * 1000
+            ms = []
+            for _ in range(args.searches):
+                t = time.perf_counter()
+                memory.search(user, sentence(rng), k=3)
+                ms.append((time.perf_counter() - t) * 1000)
+            print(f"search {label:<8} {memory.count(user):7,} rows  cold {cold:6.1f} ms  "
+                  f"warm p50={np.percentile(ms, 50):.2f} ms p99={np.percentile(ms, 99):.2f} ms")
+        memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+'''
+Benchmark for the user store: bulk import, single upserts and lookups at scale.
+Imports --users users in --batch sized transactions, then measures single
+create_user upserts (new and duplicate numbers) and the latency of random
+lookups by user_id and by phone number, cold (from SQLite) and warm (LRU hits),
+with --concurrency lookups in flight at once.
+
+Run: python -m src.services.database_api.tests.bench_user_store --users 1000000
+'''
+import argparse, asyncio, os, random, sqlite3, tempfile, time
+
+import numpy as np
+
+from src.services.database_api.store import UserStore
+
+
+def phone(i: int) -> str:
+    return f"+1{5550000000 + i}"
+
+
+async def timed(coro) -> float:
+    t = time.perf_counter()
+    await coro
+    return (time.perf_counter() - t) * 1000
+
+
+async def lookups(fn, keys, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(key):
+        async with sem:
+            return await timed(fn(key))
+
+    t = time.perf_counter()
+    ms = await asyncio.gather(*(one(k) for k in keys))
+    return np.array(ms), time.perf_counter() - t
+
+
+def report(label: str, ms: np.ndarray, wall: float):
+    print(f"{label:<24} p50={np.percentile(ms, 50):6.3f} ms  p99={np.percentile(ms, 99):6.3f} ms  "
+          f"max={ms.max():7.2f} ms  {len(ms) / wall:9,.0f} ops/s")
+
+
+async def serial(make, n: int):
+    t = time.perf_counter()
+    ms = [await timed(make(i)) for i in range(n)]
+    return np.array(ms), time.perf_counter() - t
+
+
+async def bench(path: str, users: int, batch: int, samples: int, concurrency: int):
+    store = UserStore(path, cache_size=4 * samples)  # every lookup below fits
+    t = time.perf_counter()
+    for start in range(0, users, batch):
+        await store.create_users({"name": f"user{i}", "phone_number": phone(i)} for i in range(start, min(users, start + batch)))
+    wall = time.perf_counter() - t
+    print(f"bulk import              {users:,} users in {wall:.1f}s = {users / wall:,.0f} inserts/s "
+          f"(db {os.path.getsize(path) / 1e6:.0f} MB)")
+
+    report("create_user (new)", *await serial(lambda i: store.create_user("new", phone(users + i)), samples))
+    report("create_user (existing)", *await serial(lambda i: store.create_user("dup", phone(random.randrange(users))),
+                                                   samples))
+    store.cache.clear()
+
+    db = sqlite3.connect(path)
+    ids = [row[0] for row in db.execute(f"SELECT user_id FROM users ORDER BY random() LIMIT {samples}")]
+    db.close()
+    numbers = [phone(random.randrange(users)) for _ in range(samples)]
+    report("get_user cold", *await lookups(store.get_user, ids, concurrency))
+    report("get_user warm", *await lookups(store.get_user, ids, concurrency))
+    report("get_user_by_phone cold", *await lookups(store.get_user_by_phone, numbers, concurrency))
+    report("get_user_by_phone warm", *await lookups(store.get_user_by_phone, numbers, concurrency))
+    store.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--batch", type=int, default=10_000)
+    ap.add_argument("--samples", type=int, default=5000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--db", help="database file (default: a temporary one)")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(bench(args.db or os.path.join(tmp, "users.db"), args.users, args.batch,
+                          args.samples, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
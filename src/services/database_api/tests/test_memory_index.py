@@ -0,0 +1,78 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+from src.services.database_api import main
+from src.services.database_api.memory import HashingEmbedder, MemoryIndex, VectorFile
+from src.services.twilio_api.prompts import reply_prompt
+
+CALL = [
+    {"role": "caller", "text": "I have my chemistry exam on Friday and I'm nervous"},
+    {"role": "lucy", "text": "You studied hard for it, you'll be fine."},
+    {"role": "caller", "text": "My sister Anna is visiting next week"},
+    {"role": "caller", "text": ""},
+]
+
+
+def test_hashing_embedder_matches_shared_words():
+    e = HashingEmbedder(dim=256)
+    v = e.embed(["chemistry exam friday", "how did the chemistry exam go", "my sister is visiting"])
+    assert v.dtype == np.float32 and np.allclose(np.linalg.norm(v, axis=1), 1)
+    assert v[0] @ v[1] > 0.4 > v[0] @ v[2]
+
+
+def test_vector_file_grows_and_keeps_rows(tmp_path):
+    path = str(tmp_path / "m.f32")
+    f = VectorFile(path, dim=4, chunk_rows=2)
+    assert f.append(np.ones((3, 4), dtype=np.float32)) == 0
+    assert f.append(np.full((2, 4), 2, dtype=np.float32)) == 3
+    f.flush()
+    again = VectorFile(path, dim=4, rows=5)
+    assert again.capacity >= 5 and again.matrix[4, 0] == 2 and again.matrix[0, 0] == 1
+
+
+def test_search_is_per_user_and_survives_restart(tmp_path):
+    db, vectors = str(tmp_path / "users.db"), str(tmp_path / "memory.f32")
+    memory = MemoryIndex(db, vectors)
+    assert memory.add("u1", "CA1", CALL) == 3
+    memory.add("u2", "CA2", [{"role": "caller", "text": "My chemistry exam is tomorrow"}])
+    hits = memory.search("u1", "how was the chemistry exam", k=2)
+    assert hits[0]["text"].startswith("I have my chemistry exam") and hits[0]["call_sid"] == "CA1"
+    assert all(h["score"] >= 0.2 for h in hits)
+    assert memory.search("u3", "chemistry exam") == []
+    assert memory.search("u1", "chemistry exam", k=0) == memory.search("u1", "chemistry exam", k=-2) == []
+    memory.close()
+
+    memory = MemoryIndex(db, vectors)
+    assert memory.count() == 4 and memory.count("u1") == 3
+    memory.add("u1", "CA3", [{"role": "caller", "text": "Anna left today"}])
+    assert memory.search("u1", "is anna still visiting", k=1)[0]["row"] in (2, 3)
+    memory.close()
+
+
+def test_users_grow_in_doubling_extents(tmp_path):
+    memory = MemoryIndex(str(tmp_path / "users.db"), str(tmp_path / "memory.f32"), max_rows=150)
+    for call in range(4):
+        memory.add("u1", f"CA{call}", [{"role": "caller", "text": f"call {call} line {i}"} for i in range(50)])
+        memory.add("u2", f"CB{call}", [{"role": "caller", "text": "something else entirely"}])
+    assert memory._user("u1").sizes == [64, 64, 128] and memory.count("u1") == 200
+    assert memory.search("u1", "call 3 line 49", k=1)[0]["text"] == "call 3 line 49"
+    assert memory.search("u1", "call 0 line 20", k=1)[0]["text"] != "call 0 line 20"  # beyond max_rows
+    memory.close()
+
+
+def test_reply_prompt_carries_memories():
+    assert reply_prompt("hi") == 'User said: "hi"'
+    prompt = reply_prompt("the exam went well", ["I have my chemistry exam on Friday"])
+    assert "- I have my chemistry exam on Friday" in prompt and prompt.endswith('User said: "the exam went well"')
+
+
+def test_memory_endpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "DATABASE_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setattr(main, "VECTORS_PATH", str(tmp_path / "memory.f32"))
+    with TestClient(main.app) as client:
+        r = client.post("/database_api/memory/u1", json={"call_sid": "CA1", "utterances": CALL})
+        assert r.json() == {"added": 3}
+        hits = client.get("/database_api/memory/u1/search", params={"q": "sister visiting", "k": 1}).json()
+        assert [h["text"] for h in hits] == ["My sister Anna is visiting next week"]
+        assert client.get("/database_api/memory/u1/search", params={"q": "sister", "k": -1}).status_code == 422
@@ -0,0 +1,76 @@
+import asyncio
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from src.services.database_api import main
+from src.services.database_api.store import UserStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_upsert_returns_existing_user(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"))
+    first = run(store.create_user("Ada", "+15550001"))
+    again = run(store.create_user("Someone else", "+15550001"))
+    assert again == first
+    assert run(store.get_user(first["user_id"]))["name"] == "Ada"
+    db = sqlite3.connect(tmp_path / "users.db")
+    assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db.execute("SELECT count(*) FROM users").fetchone()[0] == 1
+    store.close()
+
+
+def test_bulk_insert_skips_existing_numbers(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"))
+    run(store.create_user("Ada", "+15550001"))
+    users = [{"name": f"user{i}", "phone_number": f"+1555000{i}"} for i in range(1, 6)]
+    assert run(store.create_users(users)) == 4
+    assert run(store.create_users(users)) == 0
+    assert run(store.get_user_by_phone("+15550003"))["name"] == "user3"
+    assert run(store.get_user_by_phone("+15550001"))["name"] == "Ada"
+    store.close()
+
+
+def test_old_schema_keeps_its_indexes(tmp_path):
+    path = str(tmp_path / "users.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE users (user_id VARCHAR, name VARCHAR, phone_number VARCHAR, "
+               "UNIQUE (user_id), UNIQUE (phone_number))")
+    db.execute("INSERT INTO users VALUES ('01OLD', 'Grace', '+15550009')")
+    db.commit()
+    store = UserStore(path)
+    assert run(store.create_user("Other", "+15550009"))["user_id"] == "01OLD"
+    indexes = [row[1] for row in db.execute("PRAGMA index_list(users)")]
+    assert len(indexes) == 2 and not any(name.startswith("ix_") for name in indexes)
+    store.close()
+
+
+def test_reads_are_cached_and_misses_are_not(tmp_path):
+    store = UserStore(str(tmp_path / "users.db"), cache_size=4)
+    assert run(store.get_user_by_phone("+15550001")) is None
+    run(store.create_users([{"name": "Ada", "phone_number": "+15550001"}]))
+    user = run(store.get_user_by_phone("+15550001"))
+    assert user["name"] == "Ada"
+    assert run(store.get_user(user["user_id"])) == user
+    assert store.stats() == {"cached": 2, "hits": 1, "misses": 2}
+    for i in range(2, 6):
+        run(store.create_user(f"user{i}", f"+1555000{i}"))
+    assert len(store.cache) == 4 and user["user_id"] not in store.cache
+    store.close()
+
+
+def test_endpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "DATABASE_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setattr(main, "VECTORS_PATH", str(tmp_path / "memory.f32"))
+    with TestClient(main.app) as client:
+        assert client.get("/database_api/ready").status_code == 200
+        user = client.post("/database_api/create_user", json={"name": "Ada", "phone_number": "+15550001"}).json()
+        r = client.post("/database_api/create_users", json={"users": [
+            {"name": "Ada", "phone_number": "+15550001"}, {"name": "Grace", "phone_number": "+15550002"}]})
+        assert r.json() == {"created": 1, "existing": 1}
+        assert client.get(f"/database_api/get_user/{user['user_id']}").json() == user
+        assert client.get("/database_api/get_user_by_phone/+15550002").json()["name"] == "Grace"
@@ -0,0 +1,234 @@
+'''
+Streaming speech-to-text on top of faster-whisper.
+Each caller owns a `WhisperStream` holding a sliding window of 16 kHz audio.
+One `BatchEngine` thread re-decodes the windows that grew since their last pass,
+several streams per model call. Words that two consecutive passes agree on
+are committed (local agreement); the rest is sent as the partial. A window is
+closed and emptied when the energy VAD hears a pause, or when it reaches
+`max_window_s`.
+'''
+import threading, time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from src.services.audio import ulaw
+from src.services.audio.resample import StreamResampler
+from src.services.audio.vad import EnergyVAD
+
+SAMPLE_RATE = 16000  # what Whisper expects
+_FRAME = 320         # 20 ms at 16 kHz, the VAD's frame
+
+class WhisperBackend:
+    '''int8 CPU faster-whisper model decoding a batch of windows in one CTranslate2 call.'''
+
+    def __init__(self, model_size: str = "base.en", compute_type: str = "int8",
+                 cpu_threads: int = 0, language: str = "en", beam_size: int = 1):
+        from faster_whisper import WhisperModel
+        from faster_whisper.tokenizer import Tokenizer
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+        multilingual = self.model.model.is_multilingual
+        self.tokenizer = Tokenizer(self.model.hf_tokenizer, multilingual, task="transcribe",
+                                   language=language if multilingual else None)
+        self.prompt = list(self.tokenizer.sot_sequence) + [self.tokenizer.no_timestamps]
+        self.beam_size = beam_size
+
+    def transcribe(self, windows: List[np.ndarray]) -> List[str]:
+        import ctranslate2
+        extractor = self.model.feature_extractor
+        frames = extractor.nb_max_frames  # the encoder always sees 30 s
+        features = np.zeros((len(windows), extractor.feature_size, frames), dtype=np.float32)
+        for i, audio in enumerate(windows):
+            f = extractor(audio)[:, :frames]
+            features[i, :, :f.shape[1]] = f
+        results = self.model.model.generate(
+            ctranslate2.StorageView.from_array(features), [self.prompt] * len(windows),
+            beam_size=self.beam_size, max_length=224, suppress_blank=True)
+        return [self.tokenizer.decode(r.sequences_ids[0]).strip() for r in results]
+
+class StubBackend:
+    '''No model: one word per 0.25 s of voiced audio. For tests and load runs without weights.'''
+
+    def __init__(self, delay_s: float = 0.0):
+        self.delay_s = delay_s
+        self.batches: List[int] = []
+
+    def transcribe(self, windows: List[np.ndarray]) -> List[str]:
+        time.sleep(self.delay_s)
+        self.batches.append(len(windows))
+        out = []
+        for audio in windows:
+            frames = audio[:len(audio) - len(audio) % _FRAME].reshape(-1, _FRAME)
+            voiced = int((np.abs(frames).max(axis=1) > 0.01).sum()) if len(frames) else 0
+            out.append(" ".join(f"w{i}" for i in range(voiced * _FRAME // (SAMPLE_RATE // 4))))
+        return out
+
+def common_prefix(a: List[str], b: List[str]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x.strip(".,?!").lower() != y.strip(".,?!").lower():
+            break
+        n += 1
+    return n
+
+class WhisperStream:
+    '''
+    One caller's audio and transcript state. `feed()` takes 8 kHz μ-law or
+    pcm16 bytes; `on_event({"type": "partial"|"final", "text": ...})` is called
+    from the engine thread.
+    '''
+
+    def __init__(self, on_event: Callable[[Dict], None], encoding: str = "mulaw", sample_rate: int = 8000,
+                 step_s: float = 0.5, max_window_s: float = 15.0, commit_silence_ms: int = 500):
+        self.on_event = on_event
+        self.encoding = encoding
+        self.resampler = StreamResampler(sample_rate, SAMPLE_RATE) if sample_rate != SAMPLE_RATE else None
+        self.vad = EnergyVAD()
+        self.step = int(step_s * SAMPLE_RATE)
+        self.max_window = int(max_window_s * SAMPLE_RATE)
+        self.commit_silence = commit_silence_ms // 20
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.fed = 0              # samples of audio since the stream started
+        self.decoded_at = 0       # len(self.audio) at the last decode
+        self.silent_frames = 0
+        self.voiced = False       # speech in the current window
+        self.previous: List[str] = []
+        self.committed = 0        # words of the current window already sent as final
+        self.last_partial = ""
+        self.closing = False
+        self.closed = threading.Event()
+        self.waiting_since: float | None = None
+        self._vad_tail = np.zeros(0, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def feed(self, data: bytes):
+        if self.encoding == "mulaw":
+            pcm16 = ulaw.decode(data)
+        else:
+            pcm16 = np.frombuffer(data, dtype=np.int16)
+        pcm = pcm16.astype(np.float32) / 32768
+        if self.resampler:
+            pcm = self.resampler.process(pcm)
+        with self._lock:
+            self.audio = np.concatenate([self.audio, pcm])
+            self.fed += len(pcm)
+            self._run_vad(pcm)
+            if self.waiting_since is None and self.ready():
+                self.waiting_since = time.monotonic()
+
+    def close(self):
+        '''Decodes what is left, emits it as final, then sets `closed`.'''
+        with self._lock:
+            if self.resampler:
+                self.audio = np.concatenate([self.audio, self.resampler.flush()])
+            self.closing = True
+            if self.waiting_since is None:
+                self.waiting_since = time.monotonic()
+
+    def ready(self) -> bool:
+        if self.closing:
+            return True
+        if not self.voiced:
+            return False
+        return len(self.audio) - self.decoded_at >= self.step or self.silent_frames >= self.commit_silence
+
+    def _run_vad(self, pcm: np.ndarray):
+        buf = np.concatenate([self._vad_tail, pcm])
+        usable = len(buf) - len(buf) % _FRAME
+        for frame in buf[:usable].reshape(-1, _FRAME):
+            if self.vad.is_speech((frame * 32767).astype(np.int16)):
+                self.voiced = True
+                self.silent_frames = 0
+            else:
+                self.silent_frames += 1
+        self._vad_tail = buf[usable:]
+        if not self.voiced and len(self.audio) > SAMPLE_RATE:
+            self.audio = self.audio[-SAMPLE_RATE // 2:]  # keep a little lead-in, drop long silences
+
+    def take_window(self) -> np.ndarray:
+        with self._lock:
+            self.decoded_at = len(self.audio)
+            self.waiting_since = None
+            return self.audio
+
+    def apply(self, text: str, decoded: int):
+        '''Result of decoding the first `decoded` samples of the current window.'''
+        words = text.split()
+        with self._lock:
+            pause = self.silent_frames >= self.commit_silence
+            finished = self.closing and decoded >= len(self.audio)  # audio fed after the window was taken needs another pass
+            end = finished or pause or decoded >= self.max_window
+            stable = len(words) if end else max(self.committed, common_prefix(self.previous, words))
+            new, partial = words[self.committed:stable], words[stable:]
+            if end:
+                # Window finished: start the next one from the audio that arrived meanwhile
+                self.audio = self.audio[decoded:]
+                self.decoded_at = 0
+                self.previous, self.committed = [], 0
+                self.voiced = self.voiced and not pause
+            else:
+                self.previous, self.committed = words, stable
+            partial = " ".join(partial)
+            partial_changed, self.last_partial = partial != self.last_partial, partial
+            if self.waiting_since is None and self.ready():
+                self.waiting_since = time.monotonic()
+        if new:
+            self.on_event({"type": "final", "text": " ".join(new)})
+        if partial_changed:
+            self.on_event({"type": "partial", "text": partial})
+        if finished:
+            self.closed.set()
+
+class BatchEngine:
+    '''Decodes ready windows from all streams, up to `max_batch` per model call, longest-waiting first.'''
+
+    def __init__(self, backend, max_batch: int = 8, idle_s: float = 0.02):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.idle_s = idle_s
+        self.streams: List[WhisperStream] = []
+        self.calls = 0
+        self.windows = 0
+        self.busy_s = 0.0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="whisper-engine", daemon=True)
+        self._thread.start()
+
+    def open(self, on_event: Callable[[Dict], None], **kwargs) -> WhisperStream:
+        stream = WhisperStream(on_event, **kwargs)
+        with self._lock:
+            self.streams.append(stream)
+        return stream
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join(5)
+
+    def stats(self) -> dict:
+        return {"streams": len(self.streams), "calls": self.calls, "windows": self.windows,
+                "mean_batch": self.windows / self.calls if self.calls else 0.0, "busy_s": round(self.busy_s, 3)}
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                ready = sorted((s for s in self.streams if s.waiting_since is not None), key=lambda s: s.waiting_since)
+                batch = ready[:self.max_batch]
+            if not batch:
+                self._stopped.wait(self.idle_s)
+                continue
+            windows = [s.take_window() for s in batch]
+            t0 = time.perf_counter()
+            try:
+                texts = self.backend.transcribe([w if len(w) else np.zeros(_FRAME, dtype=np.float32) for w in windows])
+            except Exception as e:
+                print(f"\n[faster_whisper_api] Decode failed: {e}")
+                texts = [""] * len(batch)
+            self.busy_s += time.perf_counter() - t0
+            self.calls += 1
+            self.windows += len(batch)
+            for stream, window, text in zip(batch, windows, texts):
+                stream.apply(text, len(window))
+                if stream.closed.is_set():
+                    with self._lock:
+                        self.streams.remove(stream)
@@ -0,0 +1,99 @@
+import asyncio, json, os
+import numpy as np
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
+from src.services.faster_whisper_api.engine import SAMPLE_RATE, BatchEngine, StubBackend, WhisperBackend
+from src.services.warmup import Warmup
+
+'''
+Streaming speech-to-text with faster-whisper (int8, CPU)
+Connect to /faster_whisper_api/stream?encoding=mulaw&sample_rate=8000, send audio as
+binary messages and {"event": "stop"} when done; receive {"type": "partial"|"final", "text"}.
+The model loads and decodes a second of silence in the background (see /faster_whisper_api/ready);
+FW_BACKEND=stub runs without it.
+'''
+
+app = FastAPI()
+BACKEND = os.getenv("FW_BACKEND", "whisper")  # "whisper" or "stub"
+MODEL_SIZE = os.getenv("FW_MODEL", "base.en")
+COMPUTE_TYPE = os.getenv("FW_COMPUTE_TYPE", "int8")
+CPU_THREADS = int(os.getenv("FW_CPU_THREADS", "0"))          # 0 = CTranslate2 default
+MAX_BATCH = int(os.getenv("FW_MAX_BATCH", "8"))              # windows decoded per model call
+STEP_S = float(os.getenv("FW_STEP_S", "0.5"))                # new audio before a window is re-decoded
+MAX_WINDOW_S = float(os.getenv("FW_MAX_WINDOW_S", "15"))
+COMMIT_SILENCE_MS = int(os.getenv("FW_COMMIT_SILENCE_MS", "500"))
+
+def load_engine() -> BatchEngine:
+    backend = StubBackend() if BACKEND == "stub" else WhisperBackend(MODEL_SIZE, COMPUTE_TYPE, CPU_THREADS)
+    return BatchEngine(backend, max_batch=MAX_BATCH)
+
+def warm_engine(engine: BatchEngine):
+    engine.backend.transcribe([np.zeros(SAMPLE_RATE, dtype=np.float32)])
+
+warmup = Warmup()
+model = warmup.add("whisper", load_engine, warm_engine)
+
+def get_engine() -> BatchEngine:
+    return model.get()
+
+def is_ready() -> bool:
+    return warmup.ready()
+
+@app.on_event("startup")
+async def startup():
+    warmup.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if model.ready:
+        model.value.close()
+
+@app.get("/faster_whisper_api/ready")
+async def ready(response: Response):
+    report = warmup.report()
+    response.status_code = 200 if report["ready"] else 503
+    return report
+
+@app.get("/faster_whisper_api/stats")
+async def stats():
+    return model.value.stats() if model.ready else {"streams": 0}
+
+@app.websocket("/faster_whisper_api/stream")
+async def stream(ws: WebSocket, encoding: str = "mulaw", sample_rate: int = 8000):
+    await ws.accept()
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    # Results come from the engine thread; hand them to this connection's event loop
+    on_event = lambda event: loop.call_soon_threadsafe(events.put_nowait, event)
+    eng = await loop.run_in_executor(None, get_engine)
+    s = eng.open(on_event, encoding=encoding, sample_rate=sample_rate, step_s=STEP_S,
+                 max_window_s=MAX_WINDOW_S, commit_silence_ms=COMMIT_SILENCE_MS)
+
+    async def send_events():
+        while (event := await events.get()) is not None:
+            await ws.send_text(json.dumps(event))
+
+    sender = asyncio.create_task(send_events())
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes"):
+                # Decoding, resampling and the VAD run off the event loop
+                await loop.run_in_executor(None, s.feed, msg["bytes"])
+            elif msg.get("text") and json.loads(msg["text"]).get("event") == "stop":
+                break
+    except WebSocketDisconnect:
+        pass
+    except BaseException:
+        sender.cancel()
+        raise
+    finally:
+        s.close()  # the engine only lets go of a stream once it has closed
+    await loop.run_in_executor(None, s.closed.wait, 10)
+    events.put_nowait(None)
+    try:
+        await sender
+        await ws.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # the client already went away
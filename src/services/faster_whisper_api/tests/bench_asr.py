@@ -0,0 +1,139 @@
+'''
+Streaming faster-whisper against the Vosk path in code.py, on local WAV fixtures.
+Every fixture is converted to 8 kHz μ-law (what Twilio sends) and fed in 20 ms
+frames at `--speed` times real time to both engines.
+
+    real-time factor  model busy time / audio duration (lower is better)
+    word latency      wall time from a word's end being fed to the word arriving
+                      as final; word ends come from Vosk's word timestamps and
+                      are matched to Whisper's words by position
+    WER               when a `<name>.txt` reference sits next to the WAV
+
+Run: python -m src.services.faster_whisper_api.tests.bench_asr fixtures/*.wav --vosk csm/vosk_model
+     (--backend stub measures the streaming/batching overhead without a model)
+'''
+import argparse, json, os, time, wave
+
+import numpy as np
+
+from src.services.audio import ulaw
+from src.services.audio.resample import resample
+from src.services.faster_whisper_api.engine import BatchEngine, StubBackend, WhisperBackend
+
+FRAME = 160  # 20 ms of 8 kHz μ-law
+
+
+def load_ulaw(path: str) -> bytes:
+    with wave.open(path) as w:
+        assert w.getsampwidth() == 2, f"{path}: expected 16-bit PCM"
+        pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).reshape(-1, w.getnchannels())[:, 0]
+        rate = w.getframerate()
+    pcm = resample(pcm.astype(np.float32) / 32768, rate, 8000)
+    return ulaw.encode(ulaw.float_to_pcm16(pcm)).tobytes()
+
+
+def paced(audio: bytes, speed: float):
+    '''Yields (frame, wall time the frame's audio ends) at `speed` x real time.'''
+    t0 = time.perf_counter()
+    for k, i in enumerate(range(0, len(audio), FRAME)):
+        due = t0 + k * 0.02 / speed
+        time.sleep(max(0.0, due - time.perf_counter()))
+        yield audio[i:i + FRAME], t0 + (k + 1) * 0.02 / speed
+
+
+def wer(ref: list, hyp: list) -> float:
+    ref, hyp = [w.strip(".,?!").lower() for w in ref], [w.strip(".,?!").lower() for w in hyp]
+    d = np.arange(len(hyp) + 1)
+    for i, r in enumerate(ref, 1):
+        prev, d[0] = d.copy(), i
+        for j, h in enumerate(hyp, 1):
+            d[j] = min(prev[j] + 1, d[j - 1] + 1, prev[j - 1] + (r != h))
+    return d[-1] / max(len(ref), 1)
+
+
+def run_vosk(model, audio: bytes, speed: float):
+    import vosk
+    rec = vosk.KaldiRecognizer(model, 8000)
+    rec.SetWords(True)
+    words, busy, t0 = [], 0.0, time.perf_counter()
+
+    def take(result, now):
+        for w in json.loads(result).get("result", []):
+            words.append((w["word"], w["end"], now))
+
+    for frame, _ in paced(audio, speed):
+        t = time.perf_counter()
+        done = rec.AcceptWaveform(ulaw.decode(frame).tobytes())  # as code.py does
+        busy += time.perf_counter() - t
+        if done:
+            take(rec.Result(), time.perf_counter())
+    take(rec.FinalResult(), time.perf_counter())
+    # audio time -> wall time the audio was fed
+    return [(w, t0 + end / speed, at) for w, end, at in words], busy
+
+
+def run_whisper(engine: BatchEngine, audio: bytes, speed: float):
+    finals = []
+    s = engine.open(lambda e: e["type"] == "final" and finals.extend((w, time.perf_counter()) for w in e["text"].split()))
+    busy0 = engine.busy_s
+    for frame, _ in paced(audio, speed):
+        s.feed(frame)
+    s.close()
+    s.closed.wait(60)
+    return finals, engine.busy_s - busy0
+
+
+def latencies(words, reference):
+    '''words: [(word, emitted_at)], reference: [(word, audio_end_wall, _)] from Vosk.'''
+    return [max(0.0, at - ref[1]) for (_, at), ref in zip(words, reference)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("wavs", nargs="+")
+    ap.add_argument("--vosk", help="Vosk model folder; without it only Whisper runs and latency is skipped")
+    ap.add_argument("--backend", default="whisper", choices=["whisper", "stub"])
+    ap.add_argument("--model", default="base.en")
+    ap.add_argument("--speed", type=float, default=1.0, help="feed speed, x real time")
+    args = ap.parse_args()
+
+    vosk_model = None
+    if args.vosk:
+        import vosk
+        vosk.SetLogLevel(-1)
+        vosk_model = vosk.Model(args.vosk)
+    engine = BatchEngine(StubBackend() if args.backend == "stub" else WhisperBackend(args.model))
+    rows = []
+    try:
+        for path in args.wavs:
+            audio = load_ulaw(path)
+            duration = len(audio) / 8000
+            ref_path = os.path.splitext(path)[0] + ".txt"
+            ref = open(ref_path).read().split() if os.path.exists(ref_path) else None
+            v_words, v_busy = run_vosk(vosk_model, audio, args.speed) if vosk_model else ([], None)
+            w_words, w_busy = run_whisper(engine, audio, args.speed)
+            row = {"file": os.path.basename(path), "seconds": round(duration, 1),
+                   "whisper_rtf": round(w_busy / duration, 3)}
+            if vosk_model:
+                v_lat = [max(0.0, at - end) for _, end, at in v_words]
+                w_lat = latencies(w_words, v_words)
+                row.update(vosk_rtf=round(v_busy / duration, 3),
+                           vosk_latency_ms=round(1000 * float(np.median(v_lat)), 0) if v_lat else None,
+                           whisper_latency_ms=round(1000 * float(np.median(w_lat)), 0) if w_lat else None)
+            if ref:
+                row["whisper_wer"] = round(wer(ref, [w for w, _ in w_words]), 3)
+                if vosk_model:
+                    row["vosk_wer"] = round(wer(ref, [w for w, _, _ in v_words]), 3)
+            rows.append(row)
+            print(json.dumps(row))
+    finally:
+        engine.close()
+    if rows:
+        total = sum(r["seconds"] for r in rows)
+        summary = {key: round(sum(r[key] * r["seconds"] for r in rows if r.get(key) is not None) / total, 3)
+                   for key in rows[0] if key.endswith(("rtf", "wer", "_ms"))}
+        print("summary (duration-weighted):", json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
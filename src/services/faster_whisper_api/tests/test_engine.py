@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.services.audio import ulaw
+from src.services.faster_whisper_api.engine import BatchEngine, StubBackend, common_prefix
+
+SPEECH = ulaw.encode((np.random.default_rng(0).standard_normal(1600) * 6000).astype(np.int16)).tobytes()  # 200 ms
+SILENCE = bytes([0xFF]) * 1600
+
+
+class Collector:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    def finals(self):
+        return " ".join(e["text"] for e in self.events if e["type"] == "final").split()
+
+
+def wait_for(cond, timeout=3.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_common_prefix_ignores_case_and_punctuation():
+    assert common_prefix("Hello there, how".split(), "hello there how are".split()) == 3
+    assert common_prefix("a b".split(), "c b".split()) == 0
+
+
+def test_words_commit_once_two_passes_agree():
+    engine = BatchEngine(StubBackend())
+    try:
+        out = Collector()
+        s = engine.open(out)
+        for _ in range(8):  # 1.6 s of speech, decoded every 0.5 s
+            s.feed(SPEECH)
+            time.sleep(0.05)
+        assert wait_for(lambda: out.finals()[:2] == ["w0", "w1"])
+        assert any(e["type"] == "partial" and e["text"] for e in out.events)
+    finally:
+        engine.close()
+
+
+def test_pause_commits_the_whole_window():
+    engine = BatchEngine(StubBackend())
+    try:
+        out = Collector()
+        s = engine.open(out)
+        for chunk in [SPEECH] * 5 + [SILENCE] * 4:
+            s.feed(chunk)
+        assert wait_for(lambda: out.finals() == ["w0", "w1", "w2", "w3"])
+        assert len(s.audio) < 16000  # window emptied
+    finally:
+        engine.close()
+
+
+def test_close_flushes_and_signals():
+    engine = BatchEngine(StubBackend())
+    try:
+        out = Collector()
+        s = engine.open(out)
+        s.feed(SPEECH + SPEECH)
+        s.close()
+        assert s.closed.wait(2)
+        assert out.finals() == ["w0"]
+        assert wait_for(lambda: not engine.streams)
+    finally:
+        engine.close()
+
+
+def test_concurrent_streams_share_model_calls():
+    backend = StubBackend(delay_s=0.05)
+    engine = BatchEngine(backend, max_batch=8)
+    try:
+        outs = [Collector() for _ in range(8)]
+        streams = [engine.open(o) for o in outs]
+
+        def caller(s):
+            for _ in range(10):
+                s.feed(SPEECH)
+                time.sleep(0.02)
+            s.close()
+
+        threads = [threading.Thread(target=caller, args=(s,)) for s in streams]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert all(s.closed.wait(3) for s in streams)
+        assert max(backend.batches) > 1
+        assert engine.calls < engine.windows
+        assert all(len(o.finals()) == 8 for o in outs)  # 2 s of speech each
+    finally:
+        engine.close()
+
+
+def test_websocket_streams_transcripts():
+    from fastapi.testclient import TestClient
+    from src.services.faster_whisper_api import main
+
+    main.BACKEND = "stub"
+    main.model.reset()
+    try:
+        with TestClient(main.app) as client, client.websocket_connect("/faster_whisper_api/stream") as ws:
+            for _ in range(4):
+                ws.send_bytes(SPEECH)
+            ws.send_text('{"event": "stop"}')
+            finals = []
+            while True:
+                try:
+                    event = ws.receive_json()
+                except Exception:
+                    break
+                if event["type"] == "final":
+                    finals += event["text"].split()
+        assert finals == ["w0", "w1", "w2"]
+        assert client.get("/faster_whisper_api/ready").status_code == 200
+    finally:
+        if main.model.ready:
+            main.model.value.close()
+        main.model.reset()
+
+
+def test_websocket_error_still_closes_the_stream():
+    from fastapi.testclient import TestClient
+    from src.services.faster_whisper_api import main
+
+    main.BACKEND = "stub"
+    main.model.reset()
+    try:
+        with TestClient(main.app) as client:
+            with pytest.raises(json.JSONDecodeError), client.websocket_connect("/faster_whisper_api/stream") as ws:
+                ws.send_bytes(SPEECH)
+                ws.send_text("not json")
+                ws.receive_json()
+            engine = main.model.get(timeout=5)
+            assert wait_for(lambda: not engine.streams)
+    finally:
+        if main.model.ready:
+            main.model.value.close()
+        main.model.reset()
@@ -1,14 +1,155 @@
-from fastapi import FastAPI
-from src.services.database_api.main import app as database_app
-from src.services.ollama_api.main import app as ollama_app
-from src.services.twilio_api.main import app as twilio_app
-app = FastAPI()
+import asyncio, importlib, time
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
+from src.services import metrics
 
-# already specified path in the imported apps, e.g. /ollama_api
-app.mount("/", database_app)
-app.mount("/", ollama_app)
-app.mount("/", twilio_app)
+'''
+Gateway for all services.
+The port binds right away; every service is imported in the background and
+its own startup hooks (model loads, warm-up) run once it has been imported.
+Requests go to a service by path prefix (/csm_api/..., /ollama_api/...) and are
+only routed once that service reports ready; until then it answers 503.
+/ready and /startup report the state and a startup-time breakdown; /metrics
+has the per-stage latency histograms of every service in the Prometheus text
+format and /traces/{streamSid} the spans of one call.
+'''
+
+STARTED = time.perf_counter()
+SERVICES = {
+    "csm_api": "src.services.csm_api.main",
+    "database_api": "src.services.database_api.main",
+    "faster_whisper_api": "src.services.faster_whisper_api.main",
+    "ollama_api": "src.services.ollama_api.main",
+    "scheduler_api": "src.services.scheduler_api.main",
+    "twilio_api": "src.services.twilio_api.main",
+}
+
+class LazyService:
+    '''ASGI app imported and started in the background; 503 until it is ready.'''
+
+    def __init__(self, name: str, module: str):
+        self.name = name
+        self.module_name = module
+        self.module = None
+        self.app = None
+        self.state = "pending"  # pending -> importing -> starting -> started | failed
+        self.error: str | None = None
+        self.import_s = self.startup_s = self.started_after_s = None
+        self._lifespan: asyncio.Task | None = None
+        self._events: asyncio.Queue | None = None
+        self.task: asyncio.Task | None = None
+
+    async def load(self):
+        try:
+            self.state = "importing"
+            t = time.perf_counter()
+            self.module = await asyncio.to_thread(importlib.import_module, self.module_name)
+            self.app = self.module.app
+            self.import_s = round(time.perf_counter() - t, 3)
+            self.state = "starting"
+            t = time.perf_counter()
+            await self._start()
+            self.startup_s = round(time.perf_counter() - t, 3)
+            self.state = "started"
+        except Exception as e:
+            self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+            print(f"[gateway] {self.name} failed: {self.error}")
+        self.started_after_s = round(time.perf_counter() - STARTED, 3)
+
+    async def _start(self):
+        # Mounted apps never see a lifespan of their own, so drive theirs by hand
+        self._events = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+
+        async def send(message):
+            if message["type"].startswith("lifespan.startup") and not started.done():
+                started.set_result(message)
+
+        await self._events.put({"type": "lifespan.startup"})
+        self._lifespan = asyncio.create_task(
+            self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, self._events.get, send))
+        message = await started
+        if message["type"] == "lifespan.startup.failed":
+            raise RuntimeError(message.get("message", "startup failed"))
+
+    async def stop(self):
+        if self._lifespan and not self._lifespan.done():
+            await self._events.put({"type": "lifespan.shutdown"})
+            try:
+                await asyncio.wait_for(self._lifespan, 10)
+            except asyncio.TimeoutError:
+                self._lifespan.cancel()
+
+    def ready(self) -> bool:
+        if self.state != "started":
+            return False
+        is_ready = getattr(self.module, "is_ready", None)
+        return is_ready() if is_ready else True
+
+    def report(self) -> dict:
+        return {"state": self.state, "ready": self.ready(), "import_s": self.import_s, "startup_s": self.startup_s,
+                "started_after_s": self.started_after_s, "error": self.error}
+
+    async def __call__(self, scope, receive, send):
+        probe = scope["path"].rstrip("/").endswith(("/ready", "/stats"))
+        if self.ready() or (probe and self.state == "started"):
+            return await self.app(scope, receive, send)
+        detail = f"{self.name} is {self.state if self.state != 'started' else 'warming up'}"
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1013, "reason": detail})  # try again later
+            return
+        await JSONResponse({"detail": detail}, status_code=503, headers={"Retry-After": "5"})(scope, receive, send)
+
+services = {name: LazyService(name, module) for name, module in SERVICES.items()}
+gateway = FastAPI()
+
+@gateway.on_event("startup")
+async def startup():
+    print(f"[gateway] listening {time.perf_counter() - STARTED:.2f}s after start; loading services in the background")
+    for service in services.values():
+        service.task = asyncio.create_task(service.load())
+
+@gateway.on_event("shutdown")
+async def shutdown():
+    await asyncio.gather(*(s.stop() for s in services.values()))
+
+@gateway.get("/ready")
+async def ready(response: Response):
+    report = {name: s.report() for name, s in services.items()}
+    response.status_code = 200 if all(s["ready"] for s in report.values()) else 503
+    return report
+
+@gateway.get("/startup")
+async def startup_report():
+    '''Where startup time went: imports, startup hooks and each service's warm-up components.'''
+    report = {}
+    for name, s in services.items():
+        report[name] = s.report()
+        warmup = getattr(s.module, "warmup", None)
+        if warmup is not None:
+            report[name]["components"] = warmup.report()["components"]
+    return {"uptime_s": round(time.perf_counter() - STARTED, 3), "services": report}
+
+@gateway.get("/metrics")
+async def prometheus_metrics():
+    # The services run in this process, so one registry holds all of them
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@gateway.get("/traces/{stream_sid}")
+async def trace(stream_sid: str):
+    found = metrics.REGISTRY.trace(stream_sid)
+    if found is None:
+        raise HTTPException(404, f"no recent call with streamSid {stream_sid}")
+    return found.report()
+
+async def app(scope, receive, send):
+    # Dispatch on the first path segment; everything else (lifespan, /ready, /startup) is the gateway's
+    if scope["type"] in ("http", "websocket"):
+        service = services.get(scope["path"].split("/", 2)[1])
+        if service is not None:
+            return await service(scope, receive, send)
+    await gateway(scope, receive, send)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("project_main:app", host="0.0.0.0", port=5001, reload=True)
\ No newline at end of file
+    uvicorn.run("src.services.main:app", host="0.0.0.0", port=5001, reload=True)
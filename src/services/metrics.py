@@ -0,0 +1,263 @@
+'''
+Per-turn latency tracing and Prometheus metrics for the voice pipeline.
+Each call has a Trace, keyed by its streamSid once the stream has started.
+`span(stage)` times one stage of a turn (asr, decision, recall, llm, tts,
+encode, send) and `mark(event)` records how long after the caller's turn ended
+something happened (first LLM token, first audio frame). The current call's
+trace travels in a context variable, so the Ollama and CSM backends can report
+without being handed the call.
+
+Histograms have fixed buckets: an observation is a bisect and three additions
+under a lock (about a microsecond), cheap enough to leave on in production.
+/metrics renders them in the Prometheus text format; p50/p95/p99 are read
+off the buckets.
+'''
+import bisect, contextvars, threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterable, Iterator, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75,
+           1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+STAGE = "lucy_stage_seconds"
+HELP = {
+    STAGE: "Time spent in one stage of a turn",
+    "lucy_time_to_first_token_seconds": "End of the caller's turn to the first token of the reply",
+    "lucy_time_to_first_audio_seconds": "End of the caller's turn to the first reply frame sent",
+    "lucy_turns_total": "Caller turns put to the decision model",
+    "lucy_decisions_total": "Speak/no-speak decisions by outcome (speak, wait, unparsed, error)",
+    "lucy_barge_ins_total": "Replies cut short because the caller started talking",
+    "lucy_cancelled_sentences_total": "Reply sentences dropped by a barge-in before they were sent",
+    "lucy_cleared_audio_seconds_total": "Reply audio already sent to Twilio and cleared by a barge-in",
+}
+
+class Histogram:
+    '''Cumulative-bucket histogram of seconds, as Prometheus expects it.'''
+
+    def __init__(self, buckets: Iterable[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        '''Estimate of the q-quantile, interpolated within its bucket.'''
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]  # beyond the last bucket all we know is "more than"
+                lo = self.buckets[i - 1] if i else 0.0
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def lines(self, name: str, labels: str) -> Iterable[str]:
+        with self._lock:
+            counts, total, s = list(self.counts), self.count, self.sum
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f'{name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {s}" if labels else f"{name}_sum {s}"
+        yield f"{name}_count{{{labels}}} {total}" if labels else f"{name}_count {total}"
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1):
+        with self._lock:
+            self.value += n
+
+    def lines(self, name: str, labels: str) -> Iterable[str]:
+        yield f"{name}{{{labels}}} {self.value}" if labels else f"{name} {self.value}"
+
+class Registry:
+    '''The process's metrics, by name and labels, and the traces of its most recent calls.'''
+
+    def __init__(self, keep_traces: int = 256):
+        self._metrics: Dict[str, Tuple[str, Dict[Tuple, object]]] = {}  # name -> (type, {labels: metric})
+        self._lock = threading.Lock()
+        self.traces: deque = deque(maxlen=keep_traces)
+
+    def _get(self, kind: str, cls, name: str, labels: dict):
+        key = tuple(sorted(labels.items()))
+        family = self._metrics.get(name)
+        if family is None or key not in family[1]:
+            with self._lock:
+                family = self._metrics.setdefault(name, (kind, {}))
+                if family[0] != kind:
+                    raise ValueError(f"{name} is a {family[0]}, not a {kind}")
+                family[1].setdefault(key, cls())
+        return family[1][key]
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._get("histogram", Histogram, name, labels)
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get("counter", Counter, name, labels)
+
+    def trace(self, stream_sid: str):
+        return next((t for t in reversed(self.traces) if t.sid == stream_sid), None)
+
+    def render(self) -> str:
+        '''Everything in the Prometheus text exposition format.'''
+        out = []
+        with self._lock:
+            families = [(name, kind, list(series.items())) for name, (kind, series) in sorted(self._metrics.items())]
+        for name, kind, series in families:
+            if name in HELP:
+                out.append(f"# HELP {name} {HELP[name]}")
+            out.append(f"# TYPE {name} {kind}")
+            for key, metric in series:
+                labels = ",".join(f'{k}="{v}"' for k, v in key)
+                out.extend(metric.lines(name, labels))
+        return "\n".join(out) + "\n"
+
+    def summary(self) -> dict:
+        '''count and p50/p95/p99 in ms of every histogram, e.g. {"lucy_stage_seconds{stage=asr}": {...}}.'''
+        out = {}
+        with self._lock:
+            families = [(name, list(series.items())) for name, (kind, series) in sorted(self._metrics.items())
+                        if kind == "histogram"]
+        for name, series in families:
+            for key, h in series:
+                label = name + ("{" + ",".join(f"{k}={v}" for k, v in key) + "}" if key else "")
+                quantiles = {f"p{round(q * 100)}": h.quantile(q) for q in (0.5, 0.95, 0.99)}
+                out[label] = {"count": h.count,
+                              **{p: None if v is None else round(v * 1000, 1) for p, v in quantiles.items()}}
+        return out
+
+REGISTRY = Registry()
+
+class Trace:
+    '''Spans of one call: (turn, stage, start_s, duration_s, count), start relative to the call's start.'''
+
+    def __init__(self, registry: Registry = REGISTRY, keep: int = 1000):
+        self.registry = registry
+        self.sid: str | None = None
+        self.turn = 0
+        self.t_turn: float | None = None
+        self.spans: deque = deque(maxlen=keep)
+        self._t0 = time.perf_counter()
+        self._marked: set = set()
+        self._lock = threading.Lock()  # the threaded pipeline records from several threads
+        registry.traces.append(self)
+
+    def start_turn(self, t: float | None = None):
+        '''The caller's turn ended at `t`; marks from now on are measured from there.'''
+        self.turn += 1
+        self.t_turn = t if t is not None else time.perf_counter()
+        self._marked = set()
+        self.registry.counter("lucy_turns_total").inc()
+
+    def record(self, stage: str, start: float, end: float):
+        with self._lock:
+            last = self.spans[-1] if self.spans else None
+            if last and last[0] == self.turn and last[1] == stage:
+                # Runs of one stage (ASR batches, frame sends) fold into one span with a count
+                self.spans[-1] = (self.turn, stage, last[2], last[3] + end - start, last[4] + 1)
+            else:
+                self.spans.append((self.turn, stage, start - self._t0, end - start, 1))
+        self.registry.histogram(STAGE, stage=stage).observe(end - start)
+
+    def mark(self, event: str):
+        '''First `event` of this turn, e.g. "time_to_first_audio"; later ones are ignored.'''
+        with self._lock:
+            if self.t_turn is None or event in self._marked:
+                return
+            self._marked.add(event)
+            now = time.perf_counter()
+            self.spans.append((self.turn, event, now - self._t0, now - self.t_turn, 1))
+        self.registry.histogram(f"lucy_{event}_seconds").observe(now - self.t_turn)
+
+    def report(self) -> dict:
+        return {"stream_sid": self.sid, "turns": self.turn,
+                "spans": [{"turn": turn, "stage": stage, "start_s": round(start, 4), "ms": round(d * 1000, 2), "n": n}
+                          for turn, stage, start, d, n in list(self.spans)]}
+
+current: contextvars.ContextVar = contextvars.ContextVar("lucy_trace", default=None)
+
+def bind(trace: Trace) -> contextvars.Context:
+    '''A copy of the current context in which `trace` is the current trace; run a call's tasks or threads in it.'''
+    ctx = contextvars.copy_context()
+    ctx.run(current.set, trace)
+    return ctx
+
+def record(stage: str, start: float, seconds: float):
+    trace = current.get()
+    if trace is not None:
+        trace.record(stage, start, start + seconds)
+    else:
+        REGISTRY.histogram(STAGE, stage=stage).observe(seconds)
+
+@contextmanager
+def span(stage: str):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, t, time.perf_counter() - t)
+
+def timed(stage: str, items: Iterable) -> Iterator:
+    '''
+    Yields from `items`, e.g. a token stream, and records `stage` as the time
+    spent waiting for them only: a span around the loop would also count the
+    time its consumer keeps it suspended (synthesis, playback back-pressure).
+    '''
+    start, waited = time.perf_counter(), 0.0
+    it = iter(items)
+    try:
+        while True:
+            t = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - t
+            yield item
+    finally:
+        getattr(it, "close", lambda: None)()  # e.g. the HTTP stream of a reply cut short
+        record(stage, start, waited)
+
+async def atimed(stage: str, items: AsyncIterator) -> AsyncIterator:
+    '''timed() for async iterators.'''
+    start, waited = time.perf_counter(), 0.0
+    it = items.__aiter__()
+    try:
+        while True:
+            t = time.perf_counter()
+            try:
+                item = await it.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                waited += time.perf_counter() - t
+            yield item
+    finally:
+        if hasattr(it, "aclose"):
+            await it.aclose()
+        record(stage, start, waited)
+
+def mark(event: str):
+    trace = current.get()
+    if trace is not None:
+        trace.mark(event)
@@ -1,40 +1,152 @@
-import httpx, json
+import httpx, json, os, asyncio, time
 from typing import AsyncGenerator, List, Dict
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.responses import StreamingResponse
+from src.services.ollama_api.sessions import SessionStore
 
 '''
 Wrapper for locally hosted Ollama LLM
-Last edit: Implement server-side system message and session management
+Last edit: Incremental context mode (OLLAMA_CONTEXT_MODE=context) reusing Ollama's KV prefix
 use test_v3.py for testing
 '''
 
 app = FastAPI()
-OLLAMA_URL = "http://192.168.1.234:11434/api/chat"
-MODEL = "dolphin-mistral"
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://192.168.1.234:11434")
+OLLAMA_URL = f"{OLLAMA_HOST}/api/chat"
+MODEL = os.getenv("OLLAMA_MODEL", "dolphin-mistral")
 SYSTEM = "You are Lucy, a helpful assistant."
 
-sessions = {}
+# Connection pool shared by every request; reads stay generous for long generations
+LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32")),
+    max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE", "8")),
+    keepalive_expiry=60,
+)
+TIMEOUT = httpx.Timeout(
+    connect=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5")),
+    read=float(os.getenv("OLLAMA_READ_TIMEOUT", "120")),
+    write=10, pool=10,
+)
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")           # how long Ollama keeps MODEL loaded
+WARM_EVERY = float(os.getenv("OLLAMA_WARM_EVERY", "240"))   # seconds between keep-warm pings, 0 = off
+# "messages": resend the trimmed history to /api/chat every turn
+# "context":  send only the new message plus the context Ollama returned last turn
+CONTEXT_MODE = os.getenv("OLLAMA_CONTEXT_MODE", "messages")
+TIMING_FIELDS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration", "total_duration")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
 system = {"role": "system", "content": "You are Lucy, a helpful assistant."}
+sessions = SessionStore(
+    os.path.join(DATA_DIR, "sessions.db"), system,
+    max_sessions=int(os.getenv("OLLAMA_MAX_SESSIONS", "500")),       # kept in memory
+    ttl=float(os.getenv("OLLAMA_SESSION_TTL", "1800")),               # idle seconds before spilling to disk
+    token_budget=int(os.getenv("OLLAMA_HISTORY_TOKENS", "2048")),     # history sent per turn
+)
+
+client: httpx.AsyncClient | None = None
+warm_task: asyncio.Task | None = None
+warmed_after_s: float | None = None  # startup -> first successful warm-up
+started_at = time.perf_counter()
+
+def get_client() -> httpx.AsyncClient:
+    global client
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=LIMITS, timeout=TIMEOUT)
+    return client
+
+async def warm_model():
+    # A generate call without a prompt only loads the model and resets its keep_alive timer
+    response = await get_client().post(f"{OLLAMA_HOST}/api/generate", json={"model": MODEL, "keep_alive": KEEP_ALIVE})
+    response.raise_for_status()
+
+async def keep_warm():
+    global warmed_after_s
+    while True:
+        try:
+            await warm_model()
+            if warmed_after_s is None:
+                warmed_after_s = round(time.perf_counter() - started_at, 3)
+                print(f"[ollama_api] {MODEL} loaded {warmed_after_s}s after startup")
+        except httpx.HTTPError as e:
+            print(f"[ollama_api] keep-warm failed: {e!r}")
+        # Until the model answers once, retry soon: the service is not ready before that
+        await asyncio.sleep(WARM_EVERY if warmed_after_s is not None else min(WARM_EVERY, 5))
+
+def is_ready() -> bool:
+    return client is not None and (WARM_EVERY <= 0 or warmed_after_s is not None)
+
+@app.on_event("startup")
+async def startup():
+    global warm_task, started_at
+    started_at = time.perf_counter()
+    get_client()
+    if WARM_EVERY > 0:
+        warm_task = asyncio.create_task(keep_warm())
+
+@app.on_event("shutdown")
+async def shutdown():
+    if warm_task:
+        warm_task.cancel()
+    if client:
+        await client.aclose()
+    sessions.flush()
+
+@app.get("/ollama_api/ready")
+async def ready(response: Response):
+    response.status_code = 200 if is_ready() else 503
+    return {"ready": is_ready(), "model": MODEL, "warmed_after_s": warmed_after_s}
+
+async def stream_ollama(messages: List[Dict], stats: Dict | None = None) -> AsyncGenerator[str, None]:
+    payload = {"messages": messages, "model": MODEL, "keep_alive": KEEP_ALIVE}
+    async with get_client().stream("POST", OLLAMA_URL, json=payload) as response:
+        async for line in response.aiter_lines():
+            if line.strip(): 
+                parsed_line = json.loads(line)
+                if parsed_line.get("done") and stats is not None:
+                    stats.update({k: parsed_line.get(k) for k in TIMING_FIELDS})
+                yield parsed_line["message"]["content"]
+
+def render_history(messages: List[Dict]) -> str:
+    return "".join(f"{'Lucy' if m['role'] == 'assistant' else 'User'}: {m['content']}\n" for m in messages)
 
-async def stream_ollama(messages: List[Dict]) -> AsyncGenerator[str, None]:
-    async with httpx.AsyncClient(timeout=None) as client:
-        async with client.stream("POST", OLLAMA_URL, json={"messages": messages, "model": MODEL}, timeout=None) as response:
-            async for line in response.aiter_lines():
-                if line.strip(): 
-                    parsed_line = json.loads(line)
-                    yield parsed_line["message"]["content"]
+async def stream_ollama_context(session_id, message: str, stats: Dict | None = None) -> AsyncGenerator[str, None]:
+    context = sessions.get_context(session_id)
+    payload = {"model": MODEL, "prompt": message, "keep_alive": KEEP_ALIVE}
+    if context:
+        payload["context"] = context  # system prompt and earlier turns are already in Ollama's KV prefix
+    else:
+        # First turn, or the prefix outgrew the budget: prime once with the trimmed history
+        history = sessions.get(session_id)[1:-1]
+        payload["system"] = SYSTEM
+        if history:
+            payload["prompt"] = render_history(history) + f"User: {message}"
+    async with get_client().stream("POST", f"{OLLAMA_HOST}/api/generate", json=payload) as response:
+        async for line in response.aiter_lines():
+            if line.strip():
+                parsed_line = json.loads(line)
+                if parsed_line.get("done"):
+                    sessions.set_context(session_id, parsed_line.get("context"))
+                    if stats is not None:
+                        stats.update({k: parsed_line.get(k) for k in TIMING_FIELDS})
+                yield parsed_line.get("response", "")
 
 @app.post("/ollama_api")
 async def chat_stream(payload: dict):
     session_id = payload.get("session_id")
-    if session_id not in sessions:
-        sessions[session_id] = []
-        sessions[session_id].append(system)
-    sessions[session_id].append({"role": "user", "content": payload["message"]})
+    messages = sessions.append(session_id, {"role": "user", "content": payload["message"]})
+    if CONTEXT_MODE == "context":
+        chunks = stream_ollama_context(session_id, payload["message"])
+    else:
+        chunks = stream_ollama(messages)
     async def event_generator():
-        async for chunk in stream_ollama(sessions[session_id]):
+        reply = []
+        async for chunk in chunks:
+            reply.append(chunk)
             yield chunk + "\n"
+        sessions.append(session_id, {"role": "assistant", "content": "".join(reply)})
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 def is_port_in_use(port):
@@ -0,0 +1,112 @@
+'''
+Session store for the Ollama wrapper.
+Recent sessions live in memory (LRU with an idle TTL) and each history is
+trimmed to a token budget; evicted sessions are parked in SQLite and loaded
+again when the same session_id comes back. A session can also carry the
+Ollama `context` (token ids of the prompt so far) for incremental turns.
+'''
+import json, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Dict, List
+
+def estimate_tokens(message: Dict) -> int:
+    # ~4 characters per token for English, plus the chat template overhead
+    return len(message["content"]) // 4 + 4
+
+class SessionStore:
+    def __init__(self, path: str, system: Dict, max_sessions: int = 500,
+                 ttl: float = 1800, token_budget: int = 2048):
+        self.system = system
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.live: "OrderedDict[str, Dict]" = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL, context TEXT)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(sessions)")]
+        if "context" not in columns:  # stores created before context reuse
+            self._db.execute("ALTER TABLE sessions ADD COLUMN context TEXT")
+        self._db.commit()
+
+    def get(self, session_id) -> List[Dict]:
+        '''Current (trimmed) history of a session, system message first.'''
+        with self._lock:
+            return list(self._session(str(session_id))["messages"])
+
+    def append(self, session_id, message: Dict) -> List[Dict]:
+        '''Adds a message, trims the history to the budget and returns it.'''
+        with self._lock:
+            session = self._session(str(session_id))
+            session["messages"].append(message)
+            self._trim(session)
+            return list(session["messages"])
+
+    def get_context(self, session_id) -> List[int] | None:
+        '''Ollama context to continue from, or None when the session needs (re)priming.'''
+        with self._lock:
+            session = self._session(str(session_id))
+            if session["context"] and len(session["context"]) > self.token_budget:
+                session["context"] = None  # prefix outgrew the budget: re-prime from the trimmed history
+            return session["context"]
+
+    def set_context(self, session_id, context: List[int] | None):
+        with self._lock:
+            self._session(str(session_id))["context"] = context
+
+    def flush(self):
+        '''Writes every live session to disk (call on shutdown).'''
+        with self._lock:
+            for session_id, session in self.live.items():
+                self._save(session_id, session)
+            self._db.commit()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def _session(self, session_id: str) -> Dict:
+        now = time.time()
+        session = self.live.pop(session_id, None) or self._load(session_id)
+        session["touched"] = now
+        self.live[session_id] = session
+        self._evict(now)
+        return session
+
+    def _load(self, session_id: str) -> Dict:
+        row = self._db.execute("SELECT messages, context FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        messages = json.loads(row[0]) if row else [self.system]
+        session = {"messages": messages, "context": json.loads(row[1]) if row and row[1] else None}
+        self._trim(session)
+        return session
+
+    def _save(self, session_id: str, session: Dict):
+        self._db.execute(
+            "INSERT INTO sessions (session_id, messages, updated_at, context) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET messages = excluded.messages, "
+            "updated_at = excluded.updated_at, context = excluded.context",
+            (session_id, json.dumps(session["messages"]), session["touched"],
+             json.dumps(session["context"]) if session["context"] else None),
+        )
+
+    def _evict(self, now: float):
+        evicted = False
+        while self.live:
+            session_id, session = next(iter(self.live.items()))
+            if len(self.live) <= self.max_sessions and now - session["touched"] < self.ttl:
+                break
+            self._save(session_id, self.live.pop(session_id))
+            evicted = True
+        if evicted:
+            self._db.commit()
+
+    def _trim(self, session: Dict):
+        # Drop the oldest turns after the system message, always keeping the newest message
+        messages = session["messages"]
+        tokens = sum(estimate_tokens(m) for m in messages)
+        while tokens > self.token_budget and len(messages) > 2:
+            tokens -= estimate_tokens(messages.pop(1))
+        session["tokens"] = tokens
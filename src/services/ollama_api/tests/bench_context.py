@@ -0,0 +1,51 @@
+'''
+Prefill cost per turn on a long session: full history vs. incremental context.
+Needs a reachable Ollama (OLLAMA_HOST) with MODEL pulled.
+Run: python -m src.services.ollama_api.tests.bench_context [turns]
+'''
+import asyncio
+import sys
+import uuid
+
+from src.services.ollama_api import main
+from src.services.ollama_api.sessions import SessionStore
+
+MESSAGES = [
+    "I promised myself I'd study three hours today.",
+    "I only did one so far, I kept checking my phone.",
+    "Tomorrow I have the chemistry exam at nine.",
+    "Can you remind me why this matters to me?",
+    "Okay, what should I do in the next hour?",
+]
+
+
+async def run(mode: str, turns: int):
+    session_id = f"bench-{mode}-{uuid.uuid4().hex[:8]}"
+    rows = []
+    for i in range(turns):
+        text = MESSAGES[i % len(MESSAGES)]
+        messages = main.sessions.append(session_id, {"role": "user", "content": text})
+        stats = {}
+        chunks = main.stream_ollama_context(session_id, text, stats) if mode == "context" else main.stream_ollama(messages, stats)
+        reply = "".join([c async for c in chunks])
+        main.sessions.append(session_id, {"role": "assistant", "content": reply})
+        rows.append((stats.get("prompt_eval_count") or 0, (stats.get("prompt_eval_duration") or 0) / 1e6))
+        print(f"{mode:<8} turn {i + 1:3d}  prompt tokens {rows[-1][0]:6d}  prefill {rows[-1][1]:8.1f} ms")
+    return rows
+
+
+async def main_async(turns: int):
+    main.sessions = SessionStore(":memory:", main.system, token_budget=8192)
+    await main.warm_model()
+    results = {mode: await run(mode, turns) for mode in ("messages", "context")}
+    await main.get_client().aclose()
+    print()
+    for mode, rows in results.items():
+        late = rows[turns // 2:]
+        print(f"{mode:<8} mean prefill {sum(r[1] for r in rows) / turns:8.1f} ms"
+              f"   second half {sum(r[1] for r in late) / len(late):8.1f} ms"
+              f"   prompt tokens total {sum(r[0] for r in rows):7d}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
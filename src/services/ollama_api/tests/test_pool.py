@@ -0,0 +1,92 @@
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services.ollama_api import main
+from src.services.ollama_api.sessions import SessionStore
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    '''Stands in for the Ollama server: records requests, streams two chunks per chat.'''
+    seen = []
+
+    def handler(request: httpx.Request):
+        body = json.loads(request.content or b"{}")
+        seen.append((request.url.path, body))
+        if request.url.path == "/api/chat":
+            lines = [json.dumps({"message": {"content": c}}) for c in ("Hi", " there")]
+            return httpx.Response(200, text="\n".join(lines) + "\n")
+        if "prompt" in body:
+            context = body.get("context", []) + [len(seen)] * 10
+            lines = [json.dumps({"response": "Hi"}), json.dumps({"response": "", "done": True, "context": context})]
+            return httpx.Response(200, text="\n".join(lines) + "\n")
+        return httpx.Response(200, json={"done": True})
+
+    monkeypatch.setattr(main, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(main, "sessions", SessionStore(":memory:", main.system))
+    return seen
+
+
+def test_requests_share_one_client(stub, monkeypatch):
+    monkeypatch.setattr(main, "WARM_EVERY", 0)
+    pooled = main.client
+    with TestClient(main.app) as api:
+        for _ in range(3):
+            response = api.post("/ollama_api", json={"session_id": "a", "message": "hello"})
+            assert response.text == "Hi\n there\n"
+        assert main.get_client() is pooled
+    chats = [body for path, body in stub if path == "/api/chat"]
+    assert len(chats) == 3
+    assert all(body["keep_alive"] == main.KEEP_ALIVE for body in chats)
+    assert pooled.is_closed  # closed on shutdown
+
+
+def test_keep_warm_loads_model_on_startup(stub, monkeypatch):
+    monkeypatch.setattr(main, "WARM_EVERY", 3600)
+    with TestClient(main.app):
+        deadline = time.monotonic() + 2
+        while not stub and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert ("/api/generate", {"model": main.MODEL, "keep_alive": main.KEEP_ALIVE}) in stub
+
+
+def test_ready_after_first_warm_up(stub, monkeypatch):
+    monkeypatch.setattr(main, "WARM_EVERY", 3600)
+    monkeypatch.setattr(main, "warmed_after_s", None)
+    with TestClient(main.app) as api:
+        deadline = time.monotonic() + 2
+        while api.get("/ollama_api/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert api.get("/ollama_api/ready").json()["warmed_after_s"] is not None
+
+
+def test_context_mode_sends_only_the_new_message(stub, monkeypatch):
+    monkeypatch.setattr(main, "WARM_EVERY", 0)
+    monkeypatch.setattr(main, "CONTEXT_MODE", "context")
+    with TestClient(main.app) as api:
+        for text in ("first", "second", "third"):
+            api.post("/ollama_api", json={"session_id": "c", "message": text})
+    first, second, third = [body for path, body in stub if path == "/api/generate"]
+    assert first["system"] == main.SYSTEM and "context" not in first
+    assert second == {"model": main.MODEL, "prompt": "second", "keep_alive": main.KEEP_ALIVE,
+                      "context": [1] * 10}
+    assert third["prompt"] == "third" and len(third["context"]) == 20
+    # the plain history is still kept for trimming and re-priming
+    assert [m["content"] for m in main.sessions.get("c")[1:]] == ["first", "Hi", "second", "Hi", "third", "Hi"]
+
+
+def test_context_is_dropped_once_it_outgrows_the_budget(stub, monkeypatch):
+    monkeypatch.setattr(main, "WARM_EVERY", 0)
+    monkeypatch.setattr(main, "CONTEXT_MODE", "context")
+    monkeypatch.setattr(main, "sessions", SessionStore(":memory:", main.system, token_budget=25))
+    with TestClient(main.app) as api:
+        for text in ("first", "second", "third", "fourth"):
+            api.post("/ollama_api", json={"session_id": "d", "message": text})
+    third, fourth = [body for path, body in stub if path == "/api/generate"][-2:]
+    assert len(third["context"]) == 20
+    assert "context" not in fourth and fourth["system"] == main.SYSTEM
+    assert fourth["prompt"].startswith("Lucy: Hi\n") and fourth["prompt"].endswith("User: fourth")
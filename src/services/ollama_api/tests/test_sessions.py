@@ -0,0 +1,52 @@
+import json
+
+from src.services.ollama_api import sessions as sessions_mod
+from src.services.ollama_api.sessions import SessionStore, estimate_tokens
+
+SYSTEM = {"role": "system", "content": "You are Lucy, a helpful assistant."}
+
+
+def turn(store, session_id, i):
+    store.append(session_id, {"role": "user", "content": f"message number {i} " * 10})
+    return store.append(session_id, {"role": "assistant", "content": f"reply number {i} " * 10})
+
+
+def test_history_stays_within_budget(tmp_path):
+    store = SessionStore(str(tmp_path / "s.db"), SYSTEM, token_budget=500)
+    sizes = []
+    for i in range(200):
+        messages = turn(store, "a", i)
+        sizes.append(len(json.dumps(messages)))
+        assert sum(estimate_tokens(m) for m in messages) <= 500
+        assert messages[0] == SYSTEM
+    assert "reply number 199" in messages[-1]["content"]
+    assert max(sizes[50:]) - min(sizes[50:]) < 200  # flat, not growing
+
+
+def test_lru_eviction_spills_to_disk_and_reloads(tmp_path):
+    store = SessionStore(str(tmp_path / "s.db"), SYSTEM, max_sessions=2)
+    for sid in ("a", "b", "c"):
+        turn(store, sid, sid)
+    assert list(store.live) == ["b", "c"]
+    history = store.get("a")  # lazily loaded again
+    assert history[1]["content"].startswith("message number a")
+    assert list(store.live) == ["c", "a"]
+
+
+def test_idle_sessions_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions_mod.time, "time", lambda: now[0])
+    store = SessionStore(str(tmp_path / "s.db"), SYSTEM, ttl=60)
+    turn(store, "old", 1)
+    now[0] += 120
+    turn(store, "new", 2)
+    assert list(store.live) == ["new"]
+    assert len(store.get("old")) == 3
+
+
+def test_sessions_survive_restart(tmp_path):
+    path = str(tmp_path / "s.db")
+    store = SessionStore(path, SYSTEM)
+    turn(store, 42, 1)
+    store.close()
+    assert len(SessionStore(path, SYSTEM).get("42")) == 3
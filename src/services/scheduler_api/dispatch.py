@@ -0,0 +1,27 @@
+'''
+Dispatch targets for the call scheduler: each is an async callable taking the
+due schedule row (user_id, name, phone_number, times, tz, next_call_at).
+'''
+import asyncio
+from typing import Dict
+from urllib.parse import quote
+
+class TwilioDispatcher:
+    '''Places the call through the Twilio REST API; Twilio then fetches the TwiML from `voice_url`.'''
+
+    def __init__(self, client, from_: str, voice_url: str):
+        self.client = client
+        self.from_ = from_
+        self.voice_url = voice_url
+
+    async def __call__(self, user: Dict):
+        if not user.get("phone_number"):
+            raise ValueError(f"user {user['user_id']} has no phone number")
+        # The Twilio client is blocking; keep the scheduler's loop free while it talks to the API
+        # The user_id comes back in the media stream, so the call can recall and store memories
+        call = await asyncio.to_thread(self.client.calls.create, to=user["phone_number"], from_=self.from_,
+                                       url=f"{self.voice_url}?user_id={quote(user['user_id'])}")
+        print(f"[scheduler] Calling {user['user_id']} ({call.sid})")
+
+async def log_dispatch(user: Dict):
+    print(f"[scheduler] Would call {user['user_id']} at {user.get('phone_number')}")
@@ -0,0 +1,83 @@
+import asyncio, os
+from typing import Dict
+from fastapi import FastAPI, HTTPException, Response
+from src.services.database_api.main import DATA_DIR, DATABASE_PATH
+from src.services.scheduler_api.dispatch import TwilioDispatcher, log_dispatch
+from src.services.scheduler_api.schedule import CallScheduler
+
+'''
+Check-in call scheduler
+PUT /scheduler_api/schedule/{user_id} with {"times": ["08:30", "19:00"], "tz": "Europe/Berlin"}
+sets a user's daily call times (up to 5); POST /scheduler_api/schedules sets many at once.
+Due calls are placed through Twilio at SCHEDULER_RATE calls a second
+(SCHEDULER_DISPATCH=log only prints them).
+'''
+
+app = FastAPI()
+DISPATCH = os.getenv("SCHEDULER_DISPATCH", "twilio")        # "twilio" or "log"
+RATE = float(os.getenv("SCHEDULER_RATE", "1"))              # outbound calls a second (Twilio's default CPS)
+BURST = float(os.getenv("SCHEDULER_BURST", "5"))
+HORIZON_S = float(os.getenv("SCHEDULER_HORIZON_S", "300"))  # how far ahead due calls are held in memory
+GRACE_S = float(os.getenv("SCHEDULER_GRACE_S", "600"))      # calls later than this are skipped, not placed
+PUBLIC_URL = os.getenv("PUBLIC_URL", "")                    # where Twilio reaches /twilio_api/call
+
+scheduler: CallScheduler | None = None
+runner: asyncio.Task | None = None
+
+def make_dispatcher():
+    if DISPATCH == "log":
+        return log_dispatch
+    from twilio.rest import Client
+    client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN") or os.getenv("TWILIO_ACCESS_TOKEN"))
+    return TwilioDispatcher(client, os.getenv("TWILIO_PHONE_NUMBER"), f"{PUBLIC_URL}/twilio_api/call")
+
+@app.on_event("startup")
+async def startup():
+    global scheduler, runner
+    os.makedirs(DATA_DIR, exist_ok=True)
+    scheduler = CallScheduler(DATABASE_PATH, make_dispatcher(), rate=RATE, burst=BURST,
+                              horizon_s=HORIZON_S, grace_s=GRACE_S)
+    runner = asyncio.create_task(scheduler.run())
+
+@app.on_event("shutdown")
+async def shutdown():
+    if runner:
+        runner.cancel()
+    if scheduler:
+        await scheduler.close()
+
+def is_ready() -> bool:
+    return runner is not None and not runner.done()
+
+@app.get("/scheduler_api/ready")
+async def ready(response: Response):
+    response.status_code = 200 if is_ready() else 503
+    return {"ready": is_ready()}
+
+@app.get("/scheduler_api/stats")
+async def stats():
+    return scheduler.stats() if scheduler else {}
+
+@app.put("/scheduler_api/schedule/{user_id}")
+async def set_schedule(user_id: str, payload: dict):
+    try:
+        return await scheduler.set_schedule(user_id, payload.get("times", []), payload.get("tz") or "UTC")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.post("/scheduler_api/schedules")
+async def set_schedules(payload: dict):
+    schedules: list[Dict] = payload.get("schedules", [])
+    try:
+        return {"scheduled": len(await scheduler.set_schedules(schedules))}
+    except (ValueError, KeyError) as e:
+        raise HTTPException(400, str(e))
+
+@app.get("/scheduler_api/schedule/{user_id}")
+async def get_schedule(user_id: str):
+    return await scheduler.get(user_id)
+
+@app.delete("/scheduler_api/schedule/{user_id}")
+async def remove_schedule(user_id: str):
+    await scheduler.remove(user_id)
+    return {"removed": user_id}
@@ -0,0 +1,286 @@
+'''
+Check-in call scheduling.
+Each user has up to MAX_PER_DAY local call times; the next one is stored as
+`next_call_at` (epoch seconds) in the users database, indexed. The scheduler
+keeps only the calls due within `horizon_s` in a heap and refills it with one
+index range query per horizon, so nothing scans the table and scheduling is
+O(log n). A tick only moves due calls onto a queue; a separate consumer hands
+them to a pluggable async `dispatch(user)` through a token bucket, so a burst of
+9:00 check-ins goes out at the provider's rate without holding up the ticks.
+'''
+import asyncio, datetime, heapq, json, re, sqlite3, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+from zoneinfo import ZoneInfo
+
+from src.services.database_api.store import PRAGMAS, create_schema
+
+MAX_PER_DAY = 5  # "Get Me To Ivy"
+TIME = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$")
+
+def parse_times(times: Iterable[str]) -> List[str]:
+    times = sorted(set(times))
+    if not 1 <= len(times) <= MAX_PER_DAY:
+        raise ValueError(f"between 1 and {MAX_PER_DAY} call times a day, got {len(times)}")
+    for t in times:
+        if not TIME.match(t):
+            raise ValueError(f"call times are HH:MM, got {t!r}")
+    return times
+
+def next_call_at(times: List[str], tz: str, after: float) -> float:
+    '''First of the local `times` (HH:MM in `tz`) strictly after the epoch time `after`.'''
+    zone = ZoneInfo(tz)
+    day = datetime.datetime.fromtimestamp(after, zone).date()
+    for offset in range(3):  # today, tomorrow, and a spare day around DST changes
+        date = day + datetime.timedelta(days=offset)
+        for t in times:
+            hour, minute = map(int, t.split(":"))
+            ts = datetime.datetime(date.year, date.month, date.day, hour, minute, tzinfo=zone).timestamp()
+            if ts > after:
+                return ts
+    raise ValueError(f"no call time after {after}")
+
+class TokenBucket:
+    '''`rate` tokens a second, up to `burst` saved up.'''
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def take(self) -> float:
+        '''Takes a token; returns 0, or how long to wait before trying again.'''
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while (wait := self.take()) > 0:
+            await asyncio.sleep(wait)
+
+# Schedules with the user's name and phone number, as dispatch needs them
+SELECT = ("SELECT s.user_id, s.times, s.tz, s.next_call_at, s.last_call_at, u.name, u.phone_number "
+          "FROM schedules s LEFT JOIN users u ON u.user_id = s.user_id")
+
+class ScheduleStore:
+    '''The schedules table, next to users in the database_api store. Used from one thread.'''
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            self.db.execute(pragma)
+        create_schema(self.db)  # users may not exist yet when the scheduler starts first
+        self.db.execute("CREATE TABLE IF NOT EXISTS schedules ("
+                        "user_id VARCHAR PRIMARY KEY, times TEXT NOT NULL, tz TEXT NOT NULL, "
+                        "next_call_at REAL NOT NULL, last_call_at REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS ix_schedules_next_call_at ON schedules (next_call_at)")
+
+    def upsert(self, rows: List[Tuple[str, str, str, float]]):
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.executemany(
+                "INSERT INTO schedules (user_id, times, tz, next_call_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET times = excluded.times, tz = excluded.tz, "
+                "next_call_at = excluded.next_call_at", rows)
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def delete(self, user_id: str):
+        self.db.execute("DELETE FROM schedules WHERE user_id = ?", (user_id,))
+
+    def get(self, user_id: str) -> Dict | None:
+        row = self.db.execute(f"{SELECT} WHERE s.user_id = ?", (user_id,)).fetchone()
+        return dict(row, times=json.loads(row["times"])) if row else None
+
+    def due(self, after: float, until: float) -> List[Dict]:
+        '''Schedules with after < next_call_at <= until; an index range scan.'''
+        rows = self.db.execute(f"{SELECT} WHERE s.next_call_at > ? AND s.next_call_at <= ? ORDER BY s.next_call_at",
+                               (after, until))
+        return [dict(row, times=json.loads(row["times"])) for row in rows]
+
+    def advance(self, rows: List[Tuple[float, str]]):
+        '''(next_call_at, user_id) for calls that were taken off the schedule, to be placed or skipped.'''
+        self.db.executemany("UPDATE schedules SET next_call_at = ? WHERE user_id = ?", rows)
+
+    def placed(self, user_id: str, at: float):
+        self.db.execute("UPDATE schedules SET last_call_at = ? WHERE user_id = ?", (at, user_id))
+
+    def count(self) -> int:
+        return self.db.execute("SELECT count(*) FROM schedules").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+class CallScheduler:
+    '''
+    `dispatch(user)` places one call; `user` has user_id, name, phone_number and
+    the schedule. Calls more than `grace_s` late when a tick takes them off the
+    heap (the service was down) are skipped to the next slot instead of ringing
+    everyone at once on restart; waiting for the rate limit doesn't count.
+    '''
+
+    def __init__(self, path: str, dispatch: Callable[[Dict], Awaitable[None]], rate: float = 1.0, burst: float = 5,
+                 horizon_s: float = 300, grace_s: float = 600, clock: Callable[[], float] = time.time):
+        self.store = ScheduleStore(path)
+        self.dispatch = dispatch
+        self.bucket = TokenBucket(rate, burst)
+        self.horizon_s = horizon_s
+        self.grace_s = grace_s
+        self.clock = clock
+        self.loaded_until = float("-inf")  # every call due up to here is in the heap
+        self.heap: List[Tuple[float, str]] = []
+        self.queued: Dict[str, Dict] = {}  # user_id -> schedule row behind its live heap entry
+        self.counts = {"dispatched": 0, "failed": 0, "skipped": 0, "refills": 0}
+        self._db = ThreadPoolExecutor(1, "schedules")  # the store's connection lives on this thread
+        self._inflight: set = set()
+        self._wake = asyncio.Event()
+        self._pending: asyncio.Queue = asyncio.Queue()  # due rows, waiting for a token
+        self._waiting: Dict[str, Dict] = {}  # user_id -> its row in _pending, until removed or taken
+        self._consumer: asyncio.Task | None = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db, fn, *args)
+
+    # ── schedules ──────────────────────────────────────────────────────────
+    async def set_schedules(self, schedules: List[Dict]) -> List[Dict]:
+        '''Upserts {"user_id", "times", "tz"} entries in one transaction; returns them with next_call_at.'''
+        now = self.clock()
+        out = []
+        for s in schedules:
+            times = parse_times(s["times"])
+            tz = s.get("tz") or "UTC"
+            try:
+                ZoneInfo(tz)
+            except (ValueError, KeyError):
+                raise ValueError(f"unknown time zone {tz!r}")
+            out.append({"user_id": s["user_id"], "times": times, "tz": tz,
+                        "next_call_at": next_call_at(times, tz, now)})
+        await self._run(self.store.upsert, [(s["user_id"], json.dumps(s["times"]), s["tz"], s["next_call_at"])
+                                            for s in out])
+        for s in out:
+            self._unqueue(s["user_id"])
+            if s["next_call_at"] <= self.loaded_until:  # the refill that covers it already ran
+                self._queue(await self._run(self.store.get, s["user_id"]))
+        return out
+
+    async def set_schedule(self, user_id: str, times: List[str], tz: str = "UTC") -> Dict:
+        return (await self.set_schedules([{"user_id": user_id, "times": times, "tz": tz}]))[0]
+
+    async def remove(self, user_id: str):
+        await self._run(self.store.delete, user_id)
+        self._unqueue(user_id)
+        self._waiting.pop(user_id, None)  # due but not called yet: not any more
+
+    async def get(self, user_id: str) -> Dict | None:
+        return await self._run(self.store.get, user_id)
+
+    def _queue(self, row: Dict):
+        self.queued[row["user_id"]] = row
+        heapq.heappush(self.heap, (row["next_call_at"], row["user_id"]))
+        self._wake.set()
+
+    def _unqueue(self, user_id: str):
+        # Lazy deletion: the heap entry stays and is dropped when it surfaces
+        self.queued.pop(user_id, None)
+
+    # ── dispatch ───────────────────────────────────────────────────────────
+    async def refill(self, now: float):
+        until = now + self.horizon_s
+        for row in await self._run(self.store.due, self.loaded_until, until):
+            self._queue(row)
+        self.loaded_until = until
+        self.counts["refills"] += 1
+
+    async def tick(self, now: float | None = None) -> List[Dict]:
+        '''Queues every call due at `now` for dispatch; returns them.'''
+        now = self.clock() if now is None else now
+        if now + self.horizon_s / 2 > self.loaded_until:
+            await self.refill(now)
+        due, updates = [], []
+        while self.heap and self.heap[0][0] <= now:
+            at, user_id = heapq.heappop(self.heap)
+            row = self.queued.get(user_id)
+            if row is None or row["next_call_at"] != at:
+                continue  # removed or rescheduled
+            del self.queued[user_id]
+            nxt = next_call_at(row["times"], row["tz"], max(now, at))
+            updates.append((nxt, user_id))
+            if nxt <= self.loaded_until:
+                self._queue(dict(row, next_call_at=nxt))
+            if now - at > self.grace_s:
+                self.counts["skipped"] += 1
+            else:
+                due.append(row)
+        if updates:
+            await self._run(self.store.advance, updates)
+        for row in due:
+            self._waiting[row["user_id"]] = row
+            self._pending.put_nowait(row)
+        if due and (self._consumer is None or self._consumer.done()):
+            self._consumer = asyncio.create_task(self._consume())
+        return due
+
+    async def _consume(self):
+        '''Places the queued calls, at the bucket's rate.'''
+        while True:
+            row = await self._pending.get()
+            try:
+                if self._waiting.get(row["user_id"]) is not row:
+                    continue  # removed while it waited
+                await self.bucket.acquire()
+                if self._waiting.pop(row["user_id"], None) is not row:
+                    continue
+                task = asyncio.create_task(self._dispatch(row))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+            finally:
+                self._pending.task_done()
+
+    async def _dispatch(self, row: Dict):
+        try:
+            await self.dispatch(row)
+        except Exception as e:
+            self.counts["failed"] += 1
+            print(f"[scheduler] Call to {row['user_id']} failed: {e!r}", file=sys.stderr)
+            return
+        self.counts["dispatched"] += 1
+        await self._run(self.store.placed, row["user_id"], self.clock())
+
+    async def run(self):
+        '''Ticks whenever the next call is due, at least once every half horizon for refills.'''
+        while True:
+            await self.tick()
+            now = self.clock()
+            wake_at = min(self.heap[0][0] if self.heap else float("inf"), now + self.horizon_s / 2)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, wake_at - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self):
+        '''Waits until every queued call has been placed.'''
+        await self._pending.join()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {"queued": len(self.queued), "heap": len(self.heap), "loaded_until": self.loaded_until,
+                "pending": len(self._waiting), "tokens": round(self.bucket.tokens, 2), "inflight": len(self._inflight),
+                **self.counts}
+
+    async def close(self):
+        await self.drain()
+        if self._consumer:
+            self._consumer.cancel()
+        await self._run(self.store.close)
+        self._db.shutdown()
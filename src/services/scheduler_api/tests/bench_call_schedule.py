@@ -0,0 +1,109 @@
+'''
+Benchmark for the call scheduler at scale: --users users with 1-5 random daily
+call times each, then a simulated day on a fake clock ticking every --step-s.
+Reports bulk scheduling rate, refill query time, tick latency, the size of the
+in-memory heap and how many rows the refills read in total (about one per call
+placed when no query scans the table). The day runs with an unlimited rate; a
+morning burst of --burst-users calls then goes through the real token bucket
+at --rate calls/s, with a call due right after it, to show ticks stay fast and
+the late call is placed, not skipped.
+
+Run: python -m src.services.scheduler_api.tests.bench_call_schedule --users 100000
+'''
+import argparse, asyncio, os, random, tempfile, time
+
+import numpy as np
+
+from src.services.scheduler_api.schedule import CallScheduler, next_call_at
+
+
+async def bench(path: str, users: int, step_s: float, horizon_s: float):
+    now = [time.time()]
+    calls = [0]
+
+    async def dispatch(user):
+        calls[0] += 1
+
+    s = CallScheduler(path, dispatch, rate=1e9, burst=1e9, horizon_s=horizon_s, clock=lambda: now[0])  # no limit
+    rng = random.Random(0)
+    schedules = [{"user_id": f"user{i:06d}", "tz": rng.choice(["UTC", "Europe/Berlin", "America/New_York"]),
+                  "times": [f"{rng.randrange(24):02d}:{rng.randrange(60):02d}" for _ in range(rng.randint(1, 5))]}
+                 for i in range(users)]
+    t = time.perf_counter()
+    for start in range(0, users, 10_000):
+        await s.set_schedules(schedules[start:start + 10_000])
+    wall = time.perf_counter() - t
+    print(f"set_schedules     {users:,} users in {wall:.1f}s = {users / wall:,.0f}/s")
+
+    rows, refill_ms = [0], []
+    due, refill = s.store.due, s.refill
+
+    def counted_due(after, until):
+        out = due(after, until)
+        rows[0] += len(out)
+        return out
+
+    async def timed_refill(at):
+        t = time.perf_counter()
+        await refill(at)
+        refill_ms.append((time.perf_counter() - t) * 1000)
+
+    s.store.due, s.refill = counted_due, timed_refill
+    tick_ms, heap = [], []
+    end = now[0] + 86400
+    while now[0] < end:
+        t = time.perf_counter()
+        await s.tick()
+        tick_ms.append((time.perf_counter() - t) * 1000)
+        heap.append(len(s.heap))
+        now[0] += step_s
+    await s.drain()
+    tick_ms = np.array(tick_ms)
+    print(f"simulated day     {calls[0]:,} calls placed, {rows[0]:,} rows read by {len(refill_ms)} refills "
+          f"(p50 {np.percentile(refill_ms, 50):.1f} ms, max {max(refill_ms):.1f} ms)")
+    print(f"tick              p50={np.percentile(tick_ms, 50):.2f} ms  p99={np.percentile(tick_ms, 99):.2f} ms  "
+          f"max={tick_ms.max():.1f} ms  heap size max={max(heap):,} (of {users:,} users)")
+    await s.close()
+
+
+async def burst(path: str, users: int, rate: float):
+    now = [time.time()]
+    placed = []
+
+    async def dispatch(user):
+        placed.append(time.perf_counter())
+
+    s = CallScheduler(path, dispatch, rate=rate, burst=1, horizon_s=3600, grace_s=60, clock=lambda: now[0])
+    await s.set_schedules([{"user_id": f"burst{i:06d}", "tz": "UTC", "times": ["09:00"]} for i in range(users)])
+    await s.set_schedule("after", ["09:01"], "UTC")
+    now[0] = nine = next_call_at(["09:00"], "UTC", now[0])
+    t = time.perf_counter()
+    await s.tick()
+    tick_ms = (time.perf_counter() - t) * 1000
+    now[0] = nine + 60
+    t = time.perf_counter()
+    await s.tick()
+    late_tick_ms = (time.perf_counter() - t) * 1000
+    await s.drain()
+    spread = placed[-1] - placed[0]
+    print(f"burst             {users:,} calls at 09:00 + 1 at 09:01, rate {rate:g}/s: ticks {tick_ms:.1f} ms and "
+          f"{late_tick_ms:.1f} ms, placed over {spread:.1f}s ({(len(placed) - 1) / spread:,.0f}/s), "
+          f"dispatched {s.counts['dispatched']:,} skipped {s.counts['skipped']}")
+    await s.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=100_000)
+    ap.add_argument("--step-s", type=float, default=10)
+    ap.add_argument("--horizon-s", type=float, default=300)
+    ap.add_argument("--burst-users", type=int, default=2000)
+    ap.add_argument("--rate", type=float, default=500, help="calls a second in the burst")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(bench(os.path.join(tmp, "users.db"), args.users, args.step_s, args.horizon_s))
+        asyncio.run(burst(os.path.join(tmp, "burst.db"), args.burst_users, args.rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+import datetime
+import sqlite3
+import time
+from zoneinfo import ZoneInfo
+
+from fastapi.testclient import TestClient
+
+from src.services.database_api.store import UserStore
+from src.services.scheduler_api import main
+from src.services.scheduler_api.schedule import CallScheduler, TokenBucket, next_call_at, parse_times
+
+BERLIN = ZoneInfo("Europe/Berlin")
+
+
+def at(*args) -> float:
+    return datetime.datetime(*args, tzinfo=BERLIN).timestamp()
+
+
+class FakeTwilio:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, user):
+        self.calls.append(user["phone_number"])
+
+
+def test_next_call_at_rolls_over_days_and_dst():
+    times = parse_times(["19:00", "08:30"])
+    assert times == ["08:30", "19:00"]
+    assert next_call_at(times, "Europe/Berlin", at(2026, 5, 4, 7, 0)) == at(2026, 5, 4, 8, 30)
+    assert next_call_at(times, "Europe/Berlin", at(2026, 5, 4, 8, 30)) == at(2026, 5, 4, 19, 0)
+    assert next_call_at(times, "Europe/Berlin", at(2026, 5, 4, 20, 0)) == at(2026, 5, 5, 8, 30)
+    # 29 March 2026: clocks go forward at 2:00, 8:30 is still 8:30 local
+    assert next_call_at(times, "Europe/Berlin", at(2026, 3, 28, 20, 0)) == at(2026, 3, 29, 8, 30)
+
+
+def test_parse_times_limits():
+    for bad in ([], ["25:00"], ["8:30"], [f"0{i}:00" for i in range(6)]):
+        try:
+            parse_times(bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+
+def test_token_bucket():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == 0.5
+    now[0] += 0.5
+    assert bucket.take() == 0
+
+
+async def scheduler_with_users(tmp_path, n, dispatch, **kwargs):
+    users = UserStore(str(tmp_path / "users.db"))
+    created = [await users.create_user(f"user{i}", f"+1555000{i:04d}") for i in range(n)]
+    users.close()
+    return CallScheduler(str(tmp_path / "users.db"), dispatch, **kwargs), created
+
+
+def test_due_calls_are_dispatched_and_advanced(tmp_path):
+    async def run():
+        fake = FakeTwilio()
+        now = [at(2026, 5, 4, 8, 0)]
+        s, users = await scheduler_with_users(tmp_path, 3, fake, horizon_s=3600, clock=lambda: now[0])
+        await s.set_schedule(users[0]["user_id"], ["08:30"], "Europe/Berlin")
+        await s.set_schedule(users[1]["user_id"], ["08:35", "20:00"], "Europe/Berlin")
+        await s.set_schedule(users[2]["user_id"], ["12:00"], "Europe/Berlin")  # beyond the horizon
+        assert await s.tick() == []
+        assert len(s.queued) == 2
+        now[0] = at(2026, 5, 4, 8, 36)
+        due = await s.tick()
+        await s.drain()
+        assert [u["user_id"] for u in due] == [users[0]["user_id"], users[1]["user_id"]]
+        assert fake.calls == [users[0]["phone_number"], users[1]["phone_number"]]
+        row = await s.get(users[1]["user_id"])
+        assert row["next_call_at"] == at(2026, 5, 4, 20, 0) and row["last_call_at"] == now[0]
+        now[0] = at(2026, 5, 4, 12, 0)
+        assert [u["user_id"] for u in await s.tick()] == [users[2]["user_id"]]
+        await s.close()
+
+    asyncio.run(run())
+
+
+def test_reschedule_and_remove_drop_queued_entries(tmp_path):
+    async def run():
+        fake = FakeTwilio()
+        now = [at(2026, 5, 4, 8, 0)]
+        s, users = await scheduler_with_users(tmp_path, 2, fake, horizon_s=3600, clock=lambda: now[0])
+        a, b = users[0]["user_id"], users[1]["user_id"]
+        await s.set_schedules([{"user_id": a, "times": ["08:10"], "tz": "Europe/Berlin"},
+                               {"user_id": b, "times": ["08:20"], "tz": "Europe/Berlin"}])
+        await s.tick()
+        await s.set_schedule(a, ["18:00"], "Europe/Berlin")
+        await s.remove(b)
+        now[0] = at(2026, 5, 4, 8, 30)
+        assert await s.tick() == []
+        assert fake.calls == []
+        assert (await s.get(a))["next_call_at"] == at(2026, 5, 4, 18, 0)
+        await s.close()
+
+    asyncio.run(run())
+
+
+def test_calls_missed_while_down_are_skipped(tmp_path):
+    async def run():
+        fake = FakeTwilio()
+        now = [at(2026, 5, 4, 8, 0)]
+        s, users = await scheduler_with_users(tmp_path, 1, fake, grace_s=600, clock=lambda: now[0])
+        await s.set_schedule(users[0]["user_id"], ["08:30", "21:00"], "Europe/Berlin")
+        now[0] = at(2026, 5, 4, 11, 0)  # first tick after a restart
+        assert await s.tick() == []
+        assert s.counts["skipped"] == 1 and fake.calls == []
+        assert (await s.get(users[0]["user_id"]))["next_call_at"] == at(2026, 5, 4, 21, 0)
+        await s.close()
+
+    asyncio.run(run())
+
+
+def test_burst_is_rate_limited_without_blocking_ticks(tmp_path):
+    async def run():
+        placed = []
+
+        async def dispatch(user):
+            placed.append((time.monotonic(), user["user_id"]))
+            if user["user_id"] == users[0]["user_id"]:
+                raise RuntimeError("busy")
+
+        now = [at(2026, 5, 4, 8, 59)]
+        s, users = await scheduler_with_users(tmp_path, 21, dispatch, rate=50, burst=1, grace_s=1,
+                                              horizon_s=3600, clock=lambda: now[0])
+        await s.set_schedules([{"user_id": u["user_id"], "times": ["09:00"], "tz": "Europe/Berlin"} for u in users[:20]])
+        await s.set_schedule(users[20]["user_id"], ["09:01"], "Europe/Berlin")
+        now[0] = at(2026, 5, 4, 9, 0)
+        t = time.monotonic()
+        assert len(await s.tick()) == 20
+        assert time.monotonic() - t < 0.1  # the burst waits for tokens on its own task
+        now[0] = at(2026, 5, 4, 9, 1)
+        assert len(await s.tick()) == 1  # on time, although the burst is still going out
+        await s.drain()
+        assert s.counts == {**s.counts, "dispatched": 20, "failed": 1, "skipped": 0}
+        assert placed[-1][1] == users[20]["user_id"]
+        assert placed[-1][0] - placed[0][0] >= 19 / 50  # one token every 20 ms
+        assert (await s.get(users[0]["user_id"]))["last_call_at"] is None  # the call never went through
+        assert (await s.get(users[1]["user_id"]))["last_call_at"] == now[0]
+        await s.close()
+
+    asyncio.run(run())
+
+
+def test_refill_uses_the_index(tmp_path):
+    s, _ = asyncio.run(scheduler_with_users(tmp_path, 0, FakeTwilio()))
+    plan = s.store.db.execute("EXPLAIN QUERY PLAN SELECT * FROM schedules WHERE next_call_at > 0 AND "
+                              "next_call_at <= 1 ORDER BY next_call_at").fetchall()
+    assert "ix_schedules_next_call_at" in " ".join(row[-1] for row in plan)
+    asyncio.run(s.close())
+
+
+def test_endpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "DATABASE_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setattr(main, "DISPATCH", "log")
+    with TestClient(main.app) as client:
+        assert client.get("/scheduler_api/ready").status_code == 200
+        r = client.put("/scheduler_api/schedule/u1", json={"times": ["09:00"], "tz": "Europe/Berlin"})
+        assert r.status_code == 200 and r.json()["times"] == ["09:00"]
+        assert client.put("/scheduler_api/schedule/u1", json={"times": ["9am"]}).status_code == 400
+        assert client.put("/scheduler_api/schedule/u1", json={"times": ["09:00"], "tz": "Mars/Base"}).status_code == 400
+        assert client.post("/scheduler_api/schedules", json={"schedules": [
+            {"user_id": "u2", "times": ["10:00"]}, {"user_id": "u3", "times": ["11:00"]}]}).json() == {"scheduled": 2}
+        assert client.get("/scheduler_api/schedule/u2").json()["tz"] == "UTC"
+        client.delete("/scheduler_api/schedule/u2")
+        assert client.get("/scheduler_api/schedule/u2").json() is None
+    db = sqlite3.connect(tmp_path / "users.db")
+    assert db.execute("SELECT count(*) FROM schedules").fetchone()[0] == 2
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services import main
+from src.services.csm_api import main as csm_main
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    csm_main.BACKEND = "stub"
+    csm_main.model.reset()
+    services = {"csm_api": main.LazyService("csm_api", "src.services.csm_api.main"),
+                "nope_api": main.LazyService("nope_api", "src.services.nope_api.main")}
+    monkeypatch.setattr(main, "services", services)
+    with TestClient(main.app) as client:
+        yield client, services
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.02)
+    return cond()
+
+
+def test_routes_by_prefix_once_ready(gateway):
+    client, services = gateway
+    assert wait_for(services["csm_api"].ready)
+    r = client.post("/csm_api/tts", json={"text": "Hi.", "format": "pcm16"})
+    assert r.status_code == 200 and len(r.content) > 0
+
+
+def test_not_ready_services_answer_503(gateway):
+    client, services = gateway
+    assert wait_for(lambda: services["nope_api"].state == "failed")
+    r = client.get("/nope_api/anything")
+    assert r.status_code == 503 and "failed" in r.json()["detail"]
+    assert client.get("/ready").status_code == 503
+
+
+def test_startup_report_breaks_down_load_time(gateway):
+    client, services = gateway
+    assert wait_for(services["csm_api"].ready)
+    report = client.get("/startup").json()["services"]
+    assert report["csm_api"]["import_s"] is not None
+    assert report["csm_api"]["components"]["csm"]["state"] == "ready"
+    assert report["nope_api"]["error"].startswith("ModuleNotFoundError")
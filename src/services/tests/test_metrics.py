@@ -0,0 +1,87 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from src.services import main, metrics
+
+
+def test_histogram_quantiles_and_exposition():
+    h = metrics.Histogram(buckets=(0.1, 0.2, 0.5))
+    for seconds in [0.05] * 50 + [0.15] * 45 + [0.4] * 4 + [2.0]:
+        h.observe(seconds)
+    assert h.quantile(0.5) == 0.1
+    assert 0.1 < h.quantile(0.95) <= 0.2
+    assert h.quantile(1.0) == 0.5  # beyond the last bucket
+    lines = list(h.lines("x_seconds", 'stage="asr"'))
+    assert lines[0] == 'x_seconds_bucket{stage="asr",le="0.1"} 50'
+    assert lines[3] == 'x_seconds_bucket{stage="asr",le="+Inf"} 100'
+    assert lines[-1] == 'x_seconds_count{stage="asr"} 100'
+
+
+def test_trace_spans_and_marks():
+    registry = metrics.Registry()
+    trace = metrics.Trace(registry)
+    trace.sid = "MZ1"
+
+    def turn():
+        with metrics.span("asr"):
+            pass
+        with metrics.span("asr"):
+            pass
+        trace.start_turn()
+        with metrics.span("decision"):
+            metrics.mark("time_to_first_token")
+            metrics.mark("time_to_first_token")
+
+    thread = threading.Thread(target=metrics.bind(trace).run, args=(turn,))
+    thread.start()
+    thread.join()
+    assert metrics.current.get() is None
+    spans = [(s["turn"], s["stage"], s["n"]) for s in registry.trace("MZ1").report()["spans"]]
+    assert spans == [(0, "asr", 2), (1, "time_to_first_token", 1), (1, "decision", 1)]
+    summary = registry.summary()
+    assert summary["lucy_stage_seconds{stage=asr}"]["count"] == 2
+    assert summary["lucy_time_to_first_token_seconds"]["count"] == 1
+    text = registry.render()
+    assert "# TYPE lucy_stage_seconds histogram" in text and "lucy_turns_total 1" in text
+
+
+def test_timed_counts_only_the_waits_on_the_stream():
+    registry = metrics.Registry()
+    trace = metrics.Trace(registry)
+    trace.sid = "MZ-timed"
+    closed = []
+
+    def tokens():
+        try:
+            for token in "a b c d".split():
+                time.sleep(0.01)
+                yield token
+        finally:
+            closed.append(True)
+
+    def consume():
+        for token in metrics.timed("llm", tokens()):
+            time.sleep(0.05)  # synthesis holding the stream up
+            if token == "c":
+                break
+
+    metrics.bind(trace).run(consume)
+    assert closed == [True]
+    span = trace.report()["spans"][0]
+    assert span["stage"] == "llm" and 25 <= span["ms"] < 60
+
+
+def test_gateway_serves_metrics_and_traces(monkeypatch):
+    monkeypatch.setattr(main, "services", {})
+    trace = metrics.Trace()
+    trace.sid = "MZ-gateway"
+    trace.start_turn()
+    trace.record("tts", 0.0, 0.25)
+    with TestClient(main.app) as client:
+        r = client.get("/metrics")
+        assert r.headers["content-type"].startswith("text/plain")
+        assert 'lucy_stage_seconds_bucket{stage="tts",le="+Inf"}' in r.text
+        assert client.get("/traces/MZ-gateway").json()["spans"][0]["stage"] == "tts"
+        assert client.get("/traces/MZ-unknown").status_code == 404
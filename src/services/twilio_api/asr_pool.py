@@ -0,0 +1,292 @@
+'''
+Multi-process ASR pool.
+Recognisers for concurrent calls are spread over worker processes, one per
+core (pinned where the OS allows it). Each worker loads the Vosk model once and
+shares it across all of its recognisers. Call audio travels through one
+shared-memory ring per call slot; partial and final results stream back on a
+single result queue and are routed to the call that owns the slot.
+
+`PooledRecognizer` keeps the Vosk interface CallPipeline already drives, so a
+call can use pooled or inline recognition without other changes.
+
+Workers are forked, so create the pool early, before threads or CUDA start.
+'''
+import json, multiprocessing as mp, os, queue, sys, threading, time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List
+
+import numpy as np
+
+_POS = 16  # write and read positions (uint64, monotonic byte counts) ahead of each ring
+
+def vosk_loader(model_path: str, sample_rate: int) -> Callable:
+    '''Runs inside a worker: loads the model once, returns a recogniser factory sharing it.'''
+    import vosk
+    vosk.SetLogLevel(-1)
+    model = vosk.Model(model_path)
+    return lambda: vosk.KaldiRecognizer(model, sample_rate)
+
+class Ring:
+    '''Single-producer, single-consumer byte ring over a slice of shared memory.'''
+
+    def __init__(self, buf, offset: int, capacity: int):
+        self.pos = np.ndarray(2, dtype=np.uint64, buffer=buf, offset=offset)
+        self.data = np.ndarray(capacity, dtype=np.uint8, buffer=buf, offset=offset + _POS)
+        self.capacity = capacity
+
+    def reset(self):
+        self.pos[:] = 0
+
+    def write(self, chunk: bytes) -> bool:
+        '''Appends `chunk`, or returns False when the consumer is too far behind.'''
+        w, r = int(self.pos[0]), int(self.pos[1])
+        n = len(chunk)
+        if n > self.capacity - (w - r):
+            return False
+        src = np.frombuffer(chunk, dtype=np.uint8)
+        i = w % self.capacity
+        first = min(n, self.capacity - i)
+        self.data[i:i + first] = src[:first]
+        self.data[:n - first] = src[first:]
+        self.pos[0] = w + n  # publish only once the bytes are in place
+        return True
+
+    def read(self) -> bytes:
+        w, r = int(self.pos[0]), int(self.pos[1])
+        n = w - r
+        if not n:
+            return b""
+        i = r % self.capacity
+        first = min(n, self.capacity - i)
+        out = self.data[i:i + first].tobytes() + self.data[:n - first].tobytes()
+        self.pos[1] = r + n
+        return out
+
+def _worker(core, slots: range, rings: List[Ring], loader, loader_args, control, results, tick: float):
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError:
+            pass
+    new_recognizer = loader(*loader_args)
+    results.put((None, "ready", str(slots.start)))
+    active: Dict[int, object] = {}
+    partials: Dict[int, str] = {}
+
+    def pump(slot, rec):
+        pcm = rings[slot].read()
+        if not pcm:
+            return
+        if rec.AcceptWaveform(pcm):
+            results.put((slot, "final", json.loads(rec.Result())["text"]))
+            partials[slot] = ""
+        else:
+            partial = json.loads(rec.PartialResult()).get("partial", "")
+            if partial != partials.get(slot):
+                partials[slot] = partial
+                results.put((slot, "partial", partial))
+
+    while True:
+        try:
+            # Block while idle; with calls running, wake every tick to collect their audio in one go
+            msg = control.get(timeout=tick if active else None)
+        except queue.Empty:
+            msg = ()
+        while msg != ():
+            if msg is None:
+                return
+            op, slot = msg
+            if op == "open":
+                active[slot] = new_recognizer()
+                partials[slot] = ""
+            elif slot in active:  # flush / close: recognise what is still in the ring first
+                rec = active[slot]
+                pump(slot, rec)
+                results.put((slot, "flushed", json.loads(rec.FinalResult())["text"]))
+                if op == "close":
+                    del active[slot]
+                    results.put((slot, "closed", ""))
+            try:
+                msg = control.get_nowait()
+            except queue.Empty:
+                msg = ()
+        for slot, rec in active.items():
+            pump(slot, rec)
+
+class PooledRecognizer:
+    '''Vosk-style recogniser backed by a pool slot; AcceptWaveform only queues audio.'''
+
+    def __init__(self, pool: "ASRPool", slot: int):
+        self.pool = pool
+        self.slot = slot
+        self.overruns = 0  # frames dropped because the worker fell behind
+        self._finals = deque()
+        self._partial = ""
+        self._flushed = queue.Queue()  # (n, text): the worker answers the n-th flush n-th
+        self._flushes = 0
+        self._replies = 0
+        self._closed = False
+
+    def AcceptWaveform(self, data: bytes) -> bool:
+        if not self.pool.write(self.slot, data):
+            self.overruns += 1
+        return bool(self._finals)
+
+    def Result(self) -> str:
+        return json.dumps({"text": self._take_finals()})
+
+    def PartialResult(self) -> str:
+        return json.dumps({"partial": self._partial})
+
+    def FinalResult(self, timeout: float = 1.0) -> str:
+        '''Forces the utterance closed; waits for the worker to get through the queued audio.'''
+        self._flushes += 1
+        self.pool.control(self.slot, "flush")
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                n, text = self._flushed.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                print(f"\n[asr-pool] Slot {self.slot} flush timed out", file=sys.stderr)
+                text = ""
+                break
+            if n == self._flushes:
+                break
+            if text:  # the answer to an earlier flush that timed out: still the caller's words
+                self._finals.append(text)
+        return json.dumps({"text": " ".join(t for t in (self._take_finals(), text) if t)})
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.pool.control(self.slot, "close")
+
+    def _take_finals(self) -> str:
+        texts = []
+        while self._finals:
+            texts.append(self._finals.popleft())
+        return " ".join(t for t in texts if t)
+
+    def _on_result(self, kind: str, text: str):
+        if kind == "partial":
+            self._partial = text
+        elif kind == "final":
+            self._partial = ""
+            self._finals.append(text)
+        elif kind == "flushed":
+            self._partial = ""
+            self._replies += 1
+            if not self._closed:
+                self._flushed.put((self._replies, text))
+
+class ASRPool:
+    '''
+    `workers` processes (default: one per usable core) with `slots_per_worker`
+    calls each. `loader(*loader_args)` runs once per worker and returns a
+    zero-argument recogniser factory; the default loads a Vosk model.
+    '''
+
+    def __init__(self, model_path: str = "csm/vosk_model", workers: int | None = None,
+                 slots_per_worker: int = 32, sample_rate: int = 8000, ring_seconds: float = 2.0,
+                 loader: Callable = vosk_loader, loader_args: tuple | None = None, pin: bool = True,
+                 tick_ms: float = 10, ready_timeout: float = 120, wait: bool = True):
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.workers = workers or len(cores)
+        self.slots_per_worker = slots_per_worker
+        capacity = int(sample_rate * ring_seconds) * 2  # pcm16
+        stride = _POS + capacity
+        total = self.workers * slots_per_worker
+        self._shm = shared_memory.SharedMemory(create=True, size=stride * total)
+        self._rings = [Ring(self._shm.buf, i * stride, capacity) for i in range(total)]
+        self._streams: Dict[int, PooledRecognizer] = {}
+        self._free = [list(range(w * slots_per_worker, (w + 1) * slots_per_worker)) for w in range(self.workers)]
+        self._lock = threading.Lock()
+        self.opened = 0
+
+        ctx = mp.get_context("fork")
+        self._results = ctx.Queue()
+        self._controls = [ctx.Queue() for _ in range(self.workers)]
+        self._t0 = time.perf_counter()
+        self._started = 0
+        self._ready = threading.Event()
+        self._procs = []
+        for w in range(self.workers):
+            slots = range(w * slots_per_worker, (w + 1) * slots_per_worker)
+            p = ctx.Process(target=_worker, name=f"asr-{w}", daemon=True,
+                            args=(cores[w % len(cores)] if pin else None, slots, self._rings, loader,
+                                  loader_args if loader_args is not None else (model_path, sample_rate),
+                                  self._controls[w], self._results, tick_ms / 1000))
+            p.start()
+            self._procs.append(p)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="asr-results", daemon=True)
+        self._dispatcher.start()
+        if wait:
+            self.wait_ready(ready_timeout)
+
+    def wait_ready(self, timeout: float | None = None) -> "ASRPool":
+        '''Blocks until every worker has loaded its model.'''
+        if not self._ready.wait(timeout):
+            self.close()
+            raise RuntimeError("ASR workers did not start")
+        return self
+
+    def recognizer(self) -> PooledRecognizer:
+        '''Claims a slot on the least loaded worker.'''
+        with self._lock:
+            free = max(self._free, key=len)
+            if not free:
+                raise RuntimeError("ASR pool is full")
+            slot = free.pop()
+            self._rings[slot].reset()
+            rec = self._streams[slot] = PooledRecognizer(self, slot)
+            self.opened += 1
+        self.control(slot, "open")
+        return rec
+
+    def write(self, slot: int, data: bytes) -> bool:
+        return self._rings[slot].write(data)
+
+    def control(self, slot: int, op: str):
+        self._controls[slot // self.slots_per_worker].put((op, slot))
+
+    @property
+    def active(self) -> int:
+        return len(self._streams)
+
+    def close(self):
+        for c in self._controls:
+            c.put(None)
+        for p in self._procs:
+            p.join(5)
+            if p.is_alive():
+                p.terminate()
+        self._results.put((None, "stop", ""))
+        if hasattr(self, "_dispatcher"):
+            self._dispatcher.join(5)
+        self._rings = []
+        self._shm.close()
+        self._shm.unlink()
+
+    def _dispatch(self):
+        while True:
+            try:
+                slot, kind, text = self._results.get()
+            except (EOFError, OSError, ValueError):  # a worker was killed mid-message on shutdown
+                return
+            if kind == "stop":
+                return
+            if kind == "ready":
+                self._started += 1
+                if self._started == self.workers:
+                    print(f"[asr-pool] {self.workers} workers x {self.slots_per_worker} slots ready "
+                          f"in {time.perf_counter() - self._t0:.1f}s")
+                    self._ready.set()
+                continue
+            with self._lock:
+                rec = self._streams.get(slot)
+                if kind == "closed":
+                    self._streams.pop(slot, None)
+                    self._free[slot // self.slots_per_worker].append(slot)
+            if rec is not None:
+                rec._on_result(kind, text)
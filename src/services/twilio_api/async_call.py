@@ -0,0 +1,283 @@
+'''
+Asyncio version of the per-call pipeline, for the FastAPI gateway.
+One connection costs a few tasks instead of three threads: the websocket
+reader only queues audio, recognition runs on a shared executor in batches of
+frames, and the decision, LLM and TTS backends are async HTTP streams. Sending
+starts with the first TTS chunk, and the next sentence is synthesised while the
+current one is still being sent. Frames are serialised from a template and paced
+to keep a little audio queued at Twilio (see media.py). Caller speech while Lucy talks (barge-in)
+cancels the reply task, which closes the LLM and TTS streams, and clears the
+audio Twilio has queued.
+'''
+import asyncio, base64, json, sys, time
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterator, Awaitable, Callable
+
+import numpy as np
+
+from src.services import metrics
+from src.services.audio import ulaw
+from src.services.twilio_api.endpointing import Endpointer
+from src.services.twilio_api.media import FRAME_BYTES, MediaTemplate, Pacer
+
+_STOP = object()
+
+async def ahead(items: AsyncIterator, depth: int = 2) -> AsyncIterator:
+    '''
+    Consumes `items` in a task, from the first `__anext__` on, up to `depth`
+    items ahead of the reader. Closing this generator early closes `items`.
+    '''
+    q: asyncio.Queue = asyncio.Queue(maxsize=depth)
+
+    async def produce():
+        try:
+            async for item in items:
+                await q.put(item)
+        except Exception as e:
+            print(f"\n[ahead] Producer error: {e!r}", file=sys.stderr)
+        finally:
+            if hasattr(items, "aclose"):
+                await items.aclose()  # e.g. the HTTP stream of the LLM
+        await q.put(_STOP)  # not reached when cancelled: nobody is reading any more
+
+    task = asyncio.create_task(produce())
+    try:
+        while (item := await q.get()) is not _STOP:
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+class AsyncCall:
+    '''
+    `recognizer` is Vosk-style and is only called on `executor`;
+    `decide(snippet) -> bool`, `respond(snippet)` yields sentences and
+    `synthesize(text)` yields 8 kHz μ-law bytes. `send(text)` writes one
+    Twilio message, already JSON, to the websocket. `barge_in_ms` of caller
+    speech while Lucy talks interrupts her; 0 turns that off. `lead_ms` of reply
+    audio is kept queued at Twilio ahead of playback.
+    '''
+
+    def __init__(self, recognizer, decide: Callable[[str], Awaitable[bool]],
+                 respond: Callable[[str], AsyncIterator[str]], synthesize: Callable[[str], AsyncIterator[bytes]],
+                 send: Callable[[str], Awaitable[None]], executor: Executor | None = None,
+                 endpointer: Endpointer | None = None, audio_frames: int = 250, batch_frames: int = 5,
+                 context_words: int = 30, barge_in_ms: int = 200, lead_ms: int = 400):
+        self.recognizer = recognizer
+        self.decide = decide
+        self.respond = respond
+        self.synthesize = synthesize
+        self.send = send
+        self.executor = executor
+        self.endpointer = endpointer or Endpointer()
+        self.batch_frames = batch_frames  # frames per executor hop, at most
+        self.context_words = context_words
+        self.barge_in_ms = barge_in_ms
+        self.sid: str | None = None
+        self.call_sid: str | None = None
+        self.params: dict = {}  # the <Parameter>s of the TwiML <Stream>, e.g. user_id
+        self.seq = 1
+        self.words = deque(maxlen=100)
+        self.transcript: list = []  # {"role": "caller" | "lucy", "text"} in order, for the memory index
+        self.frames_in = 0
+        self.frames_dropped = 0
+        self.decisions = 0
+        self.replies = 0
+        self.ttff_ms: list = []
+        self.barge_ins = 0
+        self.cancelled_sentences = 0
+        self.cleared_ms = 0.0
+        self._reply: asyncio.Task | None = None
+        self._pacer = Pacer(lead_ms)
+        self._media: MediaTemplate | None = None
+        self._last_asked = None
+        self._audio: asyncio.Queue = asyncio.Queue(maxsize=audio_frames)
+        self._turn_end = asyncio.Event()
+        self.trace = metrics.Trace()
+        # The backends find this call's trace in their context
+        self._tasks = [asyncio.create_task(self._asr(), context=metrics.bind(self.trace)),
+                       asyncio.create_task(self._converse(), context=metrics.bind(self.trace))]
+
+    # ── receive ────────────────────────────────────────────────────────────
+    def handle(self, message: dict) -> bool:
+        '''Takes one Twilio message; returns False once the stream has stopped.'''
+        event = message.get("event")
+        if event == "start":
+            self.sid = self.trace.sid = message["streamSid"]
+            self._media = MediaTemplate(self.sid)
+            start = message.get("start", {})
+            self.call_sid = start.get("callSid")
+            self.params = start.get("customParameters") or {}
+            print(f"\n[stream] Started stream {self.sid}")
+        elif event == "media":
+            self.feed(base64.b64decode(message["media"]["payload"]))
+        elif event == "stop":
+            print(f"\n[stream] Stopped stream {self.sid}")
+            return False
+        return True
+
+    def feed(self, payload: bytes):
+        self.frames_in += 1
+        if self._audio.full():
+            # Recognition is a whole queue behind: drop the oldest audio, keep the newest
+            self._audio.get_nowait()
+            self.frames_dropped += 1
+        self._audio.put_nowait(payload)
+
+    async def close(self):
+        tasks = self._tasks + ([self._reply] if self._reply else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        ttff = f" ttff_p50={np.median(self.ttff_ms):.0f}ms" if self.ttff_ms else ""
+        print(f"\n[call] {self.sid} frames={self.frames_in} dropped={self.frames_dropped} "
+              f"turns={self.endpointer.turns} decisions={self.decisions} replies={self.replies}{ttff} "
+              f"barge_ins={self.barge_ins} cancelled_sentences={self.cancelled_sentences} "
+              f"cleared={self.cleared_ms / 1000:.1f}s")
+
+    # ── ASR ────────────────────────────────────────────────────────────────
+    def _recognize(self, pcm16: np.ndarray) -> list:
+        '''Runs on the executor: endpointing and recognition for a batch of frames.'''
+        ep, rec, heard = self.endpointer, self.recognizer, []
+        for i in range(0, len(pcm16), FRAME_BYTES):
+            ep.frame(pcm16[i:i + FRAME_BYTES])
+        if rec.AcceptWaveform(pcm16.tobytes()):
+            heard.append(json.loads(rec.Result())["text"].strip())
+        elif ep.needs_flush():
+            heard.append(json.loads(rec.FinalResult())["text"].strip())  # caller went quiet, close the utterance
+        for text in heard:
+            ep.final(text)
+        return heard
+
+    async def _asr(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            frames = [await self._audio.get()]
+            while len(frames) < self.batch_frames and not self._audio.empty():
+                frames.append(self._audio.get_nowait())
+            pcm16 = ulaw.decode(b"".join(frames))
+            with metrics.span("asr"):
+                heard = await loop.run_in_executor(self.executor, self._recognize, pcm16)
+            for text in heard:
+                if text:
+                    print(text + " ", end="", flush=True)
+                    self.words.extend(text.split())
+                    self.transcript.append({"role": "caller", "text": text})
+            if self.barge_in_ms and self.endpointer.speech_ms >= self.barge_in_ms and self._speaking():
+                await self._barge_in()
+            if self.endpointer.turn_ended():
+                self._turn_end.set()
+
+    # ── decision, reply, TTS ───────────────────────────────────────────────
+    async def _converse(self):
+        while True:
+            await self._turn_end.wait()
+            self._turn_end.clear()
+            snippet = " ".join(list(self.words)[-self.context_words:])
+            if not snippet or snippet == self._last_asked:
+                continue
+            self._last_asked = snippet
+            self.decisions += 1
+            t_turn = time.perf_counter()
+            self.trace.start_turn(t_turn)
+            try:
+                with metrics.span("decision"):
+                    speak = await self.decide(snippet)
+                if not speak:
+                    continue
+                print(f"\n[ollama-decision] Decided to speak based on: '{snippet}'")
+                self.words.clear()  # these words are being answered
+                # Turns that end while Lucy talks are judged afterwards, as in the threaded pipeline
+                self._reply = asyncio.create_task(self._speak(ahead(self.respond(snippet)), t_turn))
+                await asyncio.wait({self._reply})
+                if not self._reply.cancelled():  # cancelled: barge-in
+                    self._reply.result()
+                    self.replies += 1
+            except Exception as e:
+                print(f"\n[call] Reply failed: {e!r}", file=sys.stderr)
+
+    def _speaking(self) -> bool:
+        return (self._reply is not None and not self._reply.done()) or time.perf_counter() < self._pacer.play_until
+
+    async def _barge_in(self):
+        '''The caller talks over Lucy: drop the rest of the reply and what Twilio still has queued.'''
+        reply = self._reply
+        if reply is not None and not reply.done():
+            reply.cancel()  # closes the LLM stream and the TTS requests in flight
+            await asyncio.wait({reply})
+        cleared = self._pacer.reset() * 1000
+        self.barge_ins += 1
+        self.cleared_ms += cleared
+        metrics.REGISTRY.counter("lucy_barge_ins_total").inc()
+        metrics.REGISTRY.counter("lucy_cleared_audio_seconds_total").inc(cleared / 1000)
+        print(f"\n[call] Barge-in: caller is talking, dropping the reply ({cleared:.0f} ms unplayed)")
+        await self.send(self._media.clear())
+
+    async def _audio_of(self, text: str, q: asyncio.Queue):
+        try:
+            with metrics.span("tts"):
+                async for chunk in self.synthesize(text):
+                    await q.put(chunk)
+        finally:
+            await q.put(_STOP)
+
+    async def _speak(self, sentences: AsyncIterator[str], t_turn: float):
+        tail, started = b"", False
+        pending: deque = deque()  # (queue, task) per sentence, synthesis one sentence ahead
+        sentences = sentences.__aiter__()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < 2:
+                    try:
+                        text = await sentences.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    print(f"\n[tts] Speaking: '{text}'")
+                    self.transcript.append({"role": "lucy", "text": text})
+                    q: asyncio.Queue = asyncio.Queue()
+                    pending.append((q, asyncio.create_task(self._audio_of(text, q))))
+                if not pending:
+                    break
+                q, task = pending[0]
+                while (chunk := await q.get()) is not _STOP:
+                    data = tail + chunk
+                    full = len(data) - len(data) % FRAME_BYTES
+                    await self._send_frames(data[:full])
+                    tail = data[full:]
+                    if full and not started:
+                        started = True
+                        self.ttff_ms.append((time.perf_counter() - t_turn) * 1000)
+                        self.trace.mark("time_to_first_audio")
+                pending.popleft()
+                await task
+        except asyncio.CancelledError:
+            self.cancelled_sentences += len(pending)
+            metrics.REGISTRY.counter("lucy_cancelled_sentences_total").inc(len(pending))
+            raise
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if hasattr(sentences, "aclose"):
+                await sentences.aclose()  # stops the LLM if the reply was cut short
+        if tail:
+            await self._send_frames(tail + b"\xff" * (FRAME_BYTES - len(tail)))
+        if started:
+            await self.send(self._media.mark("csm-done", self.seq))
+            self.seq += 1
+
+    async def _send_frames(self, data: bytes):
+        messages = deque(self._media.media(data, self.seq))
+        while messages:
+            now = time.perf_counter()
+            due = self._pacer.due(now)
+            if not due:
+                await asyncio.sleep(self._pacer.wait(now))  # Twilio still has enough queued
+                continue
+            with metrics.span("send"):
+                for _ in range(min(due, len(messages))):
+                    await self.send(messages.popleft())
+                    self._pacer.sent(1, now)
+                    self.seq += 1
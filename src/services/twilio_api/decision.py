@@ -0,0 +1,66 @@
+'''
+The speak/no-speak decision, constrained and cut short.
+The decision model is asked for {"speak": <bool>} through Ollama's structured
+output: `format` is a JSON schema, so the sampler can only produce that object.
+Sampling is greedy and num_predict is capped a little above the object's length.
+The answer is streamed and read only until the boolean shows up; closing the
+stream then stops the generation. Anything that isn't an answer counts as "wait".
+
+Every decision is counted by outcome in lucy_decisions_total (speak, wait,
+unparsed, error); its latency is the "decision" stage of the call's trace.
+'''
+import re, sys
+
+from src.services import metrics
+
+SCHEMA = {"type": "object", "properties": {"speak": {"type": "boolean"}}, "required": ["speak"]}
+OPTIONS = {"temperature": 0, "num_predict": 16}  # {"speak": false} is 6-8 tokens
+OUTCOMES = ("speak", "wait", "unparsed", "error")
+COUNTER = "lucy_decisions_total"
+_ANSWER = re.compile(r'"speak"\s*:\s*(true|false)')
+
+def request_body(model: str, messages: list, keep_alive: str) -> dict:
+    '''/api/chat body of a decision call.'''
+    return {"model": model, "messages": messages, "stream": True, "format": SCHEMA, "options": OPTIONS,
+            "keep_alive": keep_alive}
+
+class Decision:
+    '''One decision call: `feed` it tokens until it returns True, then take `result()`.'''
+
+    def __init__(self):
+        self.text = ""
+        self.tokens = 0
+        self.speak: bool | None = None
+
+    def feed(self, token: str) -> bool:
+        '''Adds a streamed token; True once the answer is known and the rest can be skipped.'''
+        self.tokens += 1
+        self.text += token
+        match = _ANSWER.search(self.text)
+        if match:
+            self.speak = match.group(1) == "true"
+        return self.speak is not None
+
+    def result(self) -> bool:
+        '''Whether to speak; counts the outcome.'''
+        if self.speak is None:
+            print(f"\n[ollama] No decision in the model's answer: {self.text!r}", file=sys.stderr)
+            outcome = "unparsed"
+        else:
+            outcome = "speak" if self.speak else "wait"
+        metrics.REGISTRY.counter(COUNTER, outcome=outcome).inc()
+        return self.speak is True
+
+    def failed(self, error: Exception) -> bool:
+        '''The call itself failed: wait, and count it.'''
+        print(f"\n[ollama] Decision failed: {error!r}", file=sys.stderr)
+        metrics.REGISTRY.counter(COUNTER, outcome="error").inc()
+        return False
+
+def report(registry: metrics.Registry = metrics.REGISTRY) -> dict:
+    '''Decisions by outcome, the share that failed, and their latency in ms.'''
+    counts = {o: int(registry.counter(COUNTER, outcome=o).value) for o in OUTCOMES}
+    total = sum(counts.values())
+    failed = counts["unparsed"] + counts["error"]
+    latency = registry.summary().get(f"{metrics.STAGE}{{stage=decision}}")
+    return {**counts, "failure_rate": round(failed / total, 4) if total else None, "latency_ms": latency}
@@ -0,0 +1,67 @@
+'''
+Turn endpointing for the call pipeline.
+Combines the energy VAD, Vosk final-result boundaries and trailing silence to
+decide when the caller has finished a turn, so the decision model is only
+asked at real turn boundaries instead of on a timer.
+'''
+import numpy as np
+
+from src.services.audio.vad import EnergyVAD
+
+
+class Endpointer:
+    '''
+    Feed every decoded frame to `frame()` and every Vosk final result to `final()`.
+    `needs_flush()` says when Vosk should be forced to finalise (caller went quiet
+    but no final arrived yet); `likely_end()` fires once on the first short pause
+    after new words, `turn_ended()` once per turn. `speech_ms` is the length of
+    the current run of speech, for barge-in.
+    '''
+
+    def __init__(self, vad: EnergyVAD | None = None, frame_ms: int = 20,
+                 min_silence_ms: int = 400, flush_silence_ms: int = 900, likely_silence_ms: int = 200):
+        self.vad = vad or EnergyVAD()
+        self.frame_ms = frame_ms
+        self.min_silence_ms = min_silence_ms
+        self.flush_silence_ms = flush_silence_ms
+        self.likely_silence_ms = likely_silence_ms
+        self.silence_ms = 0
+        self.speech_ms = 0
+        self.turns = 0
+        self._new_words = False     # final text arrived since the last turn end
+        self._unfinalized = False   # speech heard since the last final result
+        self._likely_fired = False
+
+    def frame(self, pcm16: np.ndarray) -> bool:
+        speech = self.vad.is_speech(pcm16)
+        if speech:
+            self.silence_ms = 0
+            self.speech_ms += self.frame_ms
+            self._unfinalized = True
+        else:
+            self.silence_ms += self.frame_ms
+            self.speech_ms = 0
+        return speech
+
+    def final(self, text: str) -> None:
+        self._unfinalized = False
+        if text:
+            self._new_words = True
+            self._likely_fired = False
+
+    def needs_flush(self) -> bool:
+        return self._unfinalized and self.silence_ms >= self.flush_silence_ms
+
+    def likely_end(self) -> bool:
+        if (self._new_words and not self._unfinalized and not self._likely_fired
+                and self.silence_ms >= self.likely_silence_ms):
+            self._likely_fired = True
+            return True
+        return False
+
+    def turn_ended(self) -> bool:
+        if self._new_words and not self._unfinalized and self.silence_ms >= self.min_silence_ms:
+            self._new_words = False
+            self.turns += 1
+            return True
+        return False
@@ -0,0 +1,236 @@
+import asyncio, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator
+from xml.sax.saxutils import quoteattr
+
+import httpx
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from src.services import metrics
+from src.services.twilio_api import decision
+from src.services.twilio_api.async_call import AsyncCall
+from src.services.twilio_api.endpointing import Endpointer
+from src.services.twilio_api.prompts import CONVERSATION_SYSTEM, DECISION_SYSTEM, decision_prompt, reply_prompt
+from src.services.twilio_api.sentences import SentenceChunker
+from src.services.warmup import Warmup
+
+'''
+Twilio media-stream bridge, asyncio version of the /call and /stream routes in code.py
+POST /twilio_api/call answers Twilio with TwiML that opens a media stream to
+/twilio_api/stream. Each stream is an AsyncCall on this event loop: recognition runs
+on a shared thread pool (or the ASR process pool), decisions and replies stream from
+Ollama and speech from the CSM service, so one process carries hundreds of calls.
+'''
+
+app = FastAPI()
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://192.168.1.234:11434")
+OLLAMA_DECISION_MODEL = os.getenv("OLLAMA_DECISION_MODEL", "llama3.2:1b")
+OLLAMA_CONVERSATIONAL_MODEL = os.getenv("OLLAMA_CONVERSATIONAL_MODEL", "llama3:8b")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+CSM_URL = os.getenv("CSM_URL", "http://127.0.0.1:5001")      # the gateway, or the csm_api service itself
+DATABASE_URL = os.getenv("DATABASE_URL", "http://127.0.0.1:5001")
+MEMORIES = int(os.getenv("LUCY_MEMORIES", "3"))               # past utterances recalled per reply
+VOSK_MODEL_PATH = "csm/vosk_model"
+ASR_WORKERS = int(os.getenv("LUCY_ASR_WORKERS", "0"))          # >0: recognise in an ASR process pool
+ASR_THREADS = int(os.getenv("TWILIO_ASR_THREADS", str(os.cpu_count() or 4)))
+RECORD_DIR = os.getenv("TWILIO_RECORD_DIR")  # inbound messages of every stream to <dir>/<streamSid>.jsonl, for bench_replay
+MAX_CALL_MIN = 5
+END_SILENCE_MS = 400   # pause after a Vosk final that ends the caller's turn
+FORCE_FINAL_MS = 900   # pause after which Vosk is forced to finalise
+BARGE_IN_MS = int(os.getenv("LUCY_BARGE_IN_MS", "200"))  # caller speech that interrupts Lucy, 0 = never
+SEND_LEAD_MS = int(os.getenv("LUCY_SEND_LEAD_MS", "400"))  # reply audio kept queued at Twilio ahead of playback
+
+# Vosk and endpointing for every call share this pool instead of a thread per call
+executor = ThreadPoolExecutor(ASR_THREADS, thread_name_prefix="asr")
+client: httpx.AsyncClient | None = None  # shared by every call's Ollama and CSM requests
+calls: set = set()
+totals = {"calls": 0, "rejected": 0, "frames": 0, "dropped": 0, "replies": 0, "barge_ins": 0, "cancelled_sentences": 0}
+
+def load_asr():
+    if ASR_WORKERS > 0:
+        from src.services.twilio_api.asr_pool import ASRPool
+        return ASRPool(VOSK_MODEL_PATH, workers=ASR_WORKERS, wait=False).wait_ready()
+    from vosk import Model
+    return Model(VOSK_MODEL_PATH)
+
+warmup = Warmup()
+asr = warmup.add("asr", load_asr)
+
+def new_recognizer():
+    model = asr.get()
+    if ASR_WORKERS > 0:
+        return model.recognizer()  # RuntimeError when every slot is taken
+    from vosk import KaldiRecognizer
+    return KaldiRecognizer(model, 8000)
+
+def is_ready() -> bool:
+    return warmup.ready()
+
+def get_client() -> httpx.AsyncClient:
+    global client
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=httpx.Timeout(connect=5, read=120, write=10, pool=10),
+                                   limits=httpx.Limits(max_connections=256, max_keepalive_connections=64))
+    return client
+
+# ── backends ────────────────────────────────────────────────────────────────
+def ollama_messages(system: str, prompt: str) -> list:
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+async def decide(snippet: str) -> bool:
+    '''Asks the decision model whether Lucy should answer now.'''
+    body = decision.request_body(OLLAMA_DECISION_MODEL, ollama_messages(DECISION_SYSTEM, decision_prompt(snippet)),
+                                 OLLAMA_KEEP_ALIVE)
+    answer = decision.Decision()
+    try:
+        # Leaving the block closes the stream, which stops the generation once the answer is in
+        async with get_client().stream("POST", f"{OLLAMA_HOST}/api/chat", json=body) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if answer.feed(chunk.get("message", {}).get("content", "")) or chunk.get("done"):
+                    break
+    except (httpx.HTTPError, ValueError) as e:
+        return answer.failed(e)
+    return answer.result()
+
+async def recall(user_id: str | None, snippet: str) -> list:
+    '''What the caller said on earlier calls that relates to `snippet`.'''
+    if not user_id or MEMORIES <= 0:
+        return []
+    try:
+        r = await get_client().get(f"{DATABASE_URL}/database_api/memory/{user_id}/search",
+                                   params={"q": snippet, "k": MEMORIES}, timeout=0.5)
+        r.raise_for_status()
+        return [m["text"] for m in r.json()]
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"\n[memory] Recall failed: {e!r}", file=sys.stderr)
+        return []  # answer without memories rather than late
+
+async def remember(user_id: str | None, call_sid: str | None, transcript: list):
+    if not user_id or not transcript:
+        return
+    try:
+        r = await get_client().post(f"{DATABASE_URL}/database_api/memory/{user_id}",
+                                    json={"call_sid": call_sid, "utterances": transcript})
+        r.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"\n[memory] Saving the transcript failed: {e!r}", file=sys.stderr)
+
+async def ollama_chunks(body: dict) -> AsyncIterator[dict]:
+    async with get_client().stream("POST", f"{OLLAMA_HOST}/api/chat", json=body) as r:
+        async for line in r.aiter_lines():
+            if line:
+                yield json.loads(line)
+
+async def respond(snippet: str, user_id: str | None = None) -> AsyncIterator[str]:
+    '''Streams the conversational model's reply, cut into speakable sentences.'''
+    with metrics.span("recall"):
+        memories = await recall(user_id, snippet)
+    prompt = reply_prompt(snippet, memories)
+    body = {"model": OLLAMA_CONVERSATIONAL_MODEL, "messages": ollama_messages(CONVERSATION_SYSTEM, prompt),
+            "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE}
+    chunker = SentenceChunker()
+    # Only the waits on Ollama count as "llm", not the time TTS keeps this generator suspended
+    chunks = metrics.atimed("llm", ollama_chunks(body))
+    try:
+        async for chunk in chunks:
+            token = chunk.get("message", {}).get("content", "")
+            if token:
+                metrics.mark("time_to_first_token")
+            for sentence in chunker.feed(token):
+                yield sentence
+            if chunk.get("done"):
+                break
+    finally:
+        await chunks.aclose()  # closes the stream now, not when the generator is collected
+    if (rest := chunker.flush()):
+        yield rest
+
+async def synthesize(text: str) -> AsyncIterator[bytes]:
+    '''Streams 8 kHz μ-law for one sentence from the CSM service.'''
+    async with get_client().stream("POST", f"{CSM_URL}/csm_api/tts", json={"text": text, "format": "ulaw8k"}) as r:
+        r.raise_for_status()
+        async for chunk in r.aiter_bytes():
+            yield chunk
+
+# ── routes ──────────────────────────────────────────────────────────────────
+@app.on_event("startup")
+async def startup():
+    warmup.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if client:
+        await client.aclose()
+    if ASR_WORKERS > 0 and asr.ready:
+        asr.value.close()
+
+@app.get("/twilio_api/ready")
+async def ready(response: Response):
+    report = warmup.report()
+    response.status_code = 200 if report["ready"] else 503
+    return report
+
+@app.get("/twilio_api/stats")
+async def stats():
+    return {"active": len(calls), **totals, "cpu_s": round(time.process_time(), 3),
+            "decisions": decision.report(), "latency": metrics.REGISTRY.summary()}
+
+@app.post("/twilio_api/call")
+async def call(request: Request, user_id: str | None = None):
+    url = f"wss://{request.headers.get('host', request.url.netloc)}/twilio_api/stream"
+    # The scheduler dials with ?user_id=...; Twilio hands it back in the stream's start message
+    param = f'<Parameter name="user_id" value={quoteattr(user_id)} />' if user_id else ""
+    twiml = (f'<?xml version="1.0" encoding="UTF-8"?><Response><Start><Stream url={quoteattr(url)}>{param}</Stream>'
+             f'</Start><Pause length="{int(60 * MAX_CALL_MIN)}" /></Response>')
+    return Response(twiml, media_type="text/xml")
+
+@app.websocket("/twilio_api/stream")
+async def stream(ws: WebSocket):
+    await ws.accept()
+    loop = asyncio.get_running_loop()
+    try:
+        recognizer = await loop.run_in_executor(None, new_recognizer)
+    except RuntimeError as e:
+        print(f"\n[stream] Rejecting call: {e}", file=sys.stderr)
+        totals["rejected"] += 1
+        await ws.close(code=1013)
+        return
+
+    async def send(message: str):
+        await ws.send_text(message)
+
+    session = AsyncCall(recognizer, decide, lambda snippet: respond(snippet, session.params.get("user_id")),
+                        synthesize, send, executor=executor,
+                        endpointer=Endpointer(min_silence_ms=END_SILENCE_MS, flush_silence_ms=FORCE_FINAL_MS),
+                        barge_in_ms=BARGE_IN_MS, lead_ms=SEND_LEAD_MS)
+    calls.add(session)
+    totals["calls"] += 1
+    recording = None
+    try:
+        while True:
+            raw = await ws.receive_text()
+            alive = session.handle(json.loads(raw))
+            if RECORD_DIR and session.sid:  # from the start message on; "connected" carries nothing to replay
+                if recording is None:
+                    recording = open(os.path.join(RECORD_DIR, f"{session.sid}.jsonl"), "w")
+                recording.write(raw + "\n")
+            if not alive:
+                break
+    except WebSocketDisconnect:
+        print("\n[stream] WebSocket closed.")
+    finally:
+        if recording:
+            recording.close()
+        calls.discard(session)
+        await session.close()
+        totals["frames"] += session.frames_in
+        totals["dropped"] += session.frames_dropped
+        totals["replies"] += session.replies
+        totals["barge_ins"] += session.barge_ins
+        totals["cancelled_sentences"] += session.cancelled_sentences
+        await remember(session.params.get("user_id"), session.call_sid, session.transcript)
+        if hasattr(recognizer, "close"):
+            recognizer.close()  # frees the ASR pool slot
@@ -0,0 +1,206 @@
+'''
+Outbound media for a Twilio stream: serialised in bulk, sent at the pace of playback.
+A reply's μ-law buffer is base64-encoded in one NumPy pass, a row per 20 ms
+frame, and each message is the stream's precompiled JSON template with the
+sequence number, timestamp and payload filled in, byte-identical to json.dumps
+of the message dict. Frames are not dumped on Twilio all at once: a Pacer keeps
+about `lead_ms` of audio queued there, topped up every `burst_ms`, so a
+barge-in has little to clear and the sender never holds the socket for long.
+MediaWriter does the sending from a thread of its own, for the threaded bridge;
+AsyncCall paces its own sends on the event loop.
+'''
+import contextvars
+import json
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, List
+
+import numpy as np
+
+from src.services import metrics
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz μ-law
+FRAME_MS = 20
+_ALPHABET = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/", dtype=np.uint8)
+
+
+def b64_frames(data, frame_bytes: int = FRAME_BYTES) -> np.ndarray:
+    '''Standard base64 of each `frame_bytes` frame of `data`, one row of ASCII per frame.'''
+    frames = np.frombuffer(data, dtype=np.uint8).reshape(-1, frame_bytes)
+    pad = -frame_bytes % 3
+    if pad:
+        frames = np.pad(frames, ((0, 0), (0, pad)))
+    groups = frames.reshape(len(frames), -1, 3).astype(np.uint32)
+    n = (groups[..., 0] << 16) | (groups[..., 1] << 8) | groups[..., 2]
+    out = _ALPHABET[np.stack([n >> 18, (n >> 12) & 63, (n >> 6) & 63, n & 63], axis=-1)].reshape(len(frames), -1)
+    if pad:
+        out[:, -pad:] = ord("=")
+    return out
+
+
+class MediaTemplate:
+    '''Twilio messages of one stream, from a template instead of a dict per frame.'''
+
+    def __init__(self, stream_sid: str, frame_ms: int = FRAME_MS):
+        self.sid = stream_sid
+        self.frame_ms = frame_ms
+        sid = json.dumps(stream_sid).replace("%", "%%")
+        self._media = ('{"event": "media", "streamSid": ' + sid + ', "sequenceNumber": "%d", '
+                       '"media": {"track": "outbound", "chunk": "%d", "timestamp": "%d", "payload": "%s"}}')
+
+    def media(self, data, seq: int) -> List[str]:
+        '''Messages for the whole frames of `data`, numbered from `seq`.'''
+        if not len(data):
+            return []
+        rows = b64_frames(data)
+        width = rows.shape[1]
+        text = rows.tobytes().decode("ascii")
+        ms = self.frame_ms
+        return [self._media % (s, s, ms * (s - 1), text[i * width:(i + 1) * width])
+                for i, s in enumerate(range(seq, seq + len(rows)))]
+
+    def mark(self, name: str, seq: int) -> str:
+        return json.dumps({"event": "mark", "streamSid": self.sid, "sequenceNumber": str(seq), "mark": {"name": name}})
+
+    def clear(self) -> str:
+        return json.dumps({"event": "clear", "streamSid": self.sid})
+
+
+class Pacer:
+    '''
+    Playback clock of the audio handed to Twilio. `due(now)` is how many frames
+    may go now: none while more than `lead_ms - burst_ms` is still queued there,
+    then enough to bring it back up to `lead_ms`.
+    '''
+
+    def __init__(self, lead_ms: int = 400, burst_ms: int = 100, frame_ms: int = FRAME_MS):
+        self.lead = lead_ms / 1000
+        self.low = max(lead_ms - burst_ms, 0) / 1000
+        self.frame_s = frame_ms / 1000
+        self.play_until = 0.0  # when the audio queued at Twilio runs out
+
+    def queued(self, now: float) -> float:
+        return max(0.0, self.play_until - now)
+
+    def due(self, now: float) -> int:
+        queued = self.queued(now)
+        if queued > self.low + 1e-6:
+            return 0
+        return max(1, int((self.lead - queued) / self.frame_s + 1e-6))
+
+    def wait(self, now: float) -> float:
+        '''Seconds until frames are due again.'''
+        return max(0.0, self.queued(now) - self.low)
+
+    def sent(self, frames: int, now: float) -> None:
+        self.play_until = max(self.play_until, now) + frames * self.frame_s
+
+    def reset(self) -> float:
+        '''Twilio dropped its queue; returns the seconds of audio that were left in it.'''
+        left = self.queued(time.perf_counter())
+        self.play_until = 0.0
+        return left
+
+
+class MediaWriter:
+    '''
+    Sends one stream's outbound messages from its own thread, paced.
+    `media()` and `mark()` only queue messages; `clear()` drops whatever is still
+    queued here and tells Twilio to drop what it holds. `close()` sends what is
+    left, without pacing, for up to `timeout` seconds. `send(text)` writes one
+    websocket message and is only ever called by one thread at a time.
+    '''
+
+    def __init__(self, send: Callable[[str], None], lead_ms: int = 400, burst_ms: int = 100):
+        self.send = send
+        self.pacer = Pacer(lead_ms, burst_ms)
+        self.messages_sent = 0
+        self._template: MediaTemplate | None = None
+        self._queue: deque = deque()  # (message, is_media)
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._epoch = 0  # bumped by clear(): what was taken off the queue before it is not sent
+        self._closing = False
+        self._closed = False
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,), daemon=True)
+        self._thread.start()
+
+    def _for(self, stream_sid: str) -> MediaTemplate:
+        if self._template is None or self._template.sid != stream_sid:
+            self._template = MediaTemplate(stream_sid)
+        return self._template
+
+    def media(self, stream_sid: str, data, seq: int) -> int:
+        '''Queues the whole frames of `data`; returns the next sequence number.'''
+        messages = self._for(stream_sid).media(data, seq)
+        with self._cond:
+            self._queue.extend((m, True) for m in messages)
+            self._cond.notify()
+        return seq + len(messages)
+
+    def mark(self, stream_sid: str, name: str, seq: int) -> None:
+        '''Queued behind the media, so Twilio reports it once they have played.'''
+        with self._cond:
+            self._queue.append((self._for(stream_sid).mark(name, seq), False))
+            self._cond.notify()
+
+    def clear(self, stream_sid: str) -> int:
+        '''Returns how many frames were dropped before they were sent.'''
+        with self._cond:
+            dropped = sum(is_media for _, is_media in self._queue)
+            self._queue.clear()
+            self.pacer.reset()
+            self._epoch += 1
+            self._cond.notify()
+            closed = self._closed
+        if not closed:
+            with self._send_lock:  # behind the message on the wire, if any
+                self.send(self._for(stream_sid).clear())
+        return dropped
+
+    def close(self, timeout: float = 1.0) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        with self._cond:  # whatever is still queued after `timeout` is dropped
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing and not self._closed:
+                    self._cond.wait()
+                if self._closed or not self._queue:
+                    return
+                now = time.perf_counter()
+                due = len(self._queue) if self._closing else self.pacer.due(now)
+                if not due:
+                    self._cond.wait(self.pacer.wait(now))  # or until a clear
+                    continue
+                burst, frames = [], 0
+                while self._queue and frames < due:
+                    message, is_media = self._queue.popleft()
+                    burst.append(message)
+                    frames += is_media
+                self.pacer.sent(frames, now)
+                epoch = self._epoch
+            # Sent outside the condition, so a slow socket holds up neither media() nor clear();
+            # a clear that comes in meanwhile voids the rest of the burst
+            try:
+                with self._send_lock, metrics.span("send"):
+                    for message in burst:
+                        if self._epoch != epoch:
+                            break
+                        self.send(message)
+                        self.messages_sent += 1
+            except Exception as e:
+                print(f"\n[media] Send failed, dropping the stream's audio: {e!r}", file=sys.stderr)
+                with self._cond:
+                    self._closed = True
+                    self._queue.clear()
+                return
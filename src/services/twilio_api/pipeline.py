@@ -0,0 +1,344 @@
+'''
+Per-call pipeline for the Twilio media bridge.
+The websocket reader only queues audio; ASR, the speak/no-speak decision and
+TTS/send each run in their own thread, linked by bounded queues, so inbound
+frames keep being read and transcribed while Lucy thinks or talks.
+The decision model is only consulted when the endpointer sees a turn end;
+with speculation on, the reply is generated alongside it (see speculative.py).
+When the caller talks over Lucy (barge-in), the reply is cancelled: queued
+audio is cleared at Twilio and the LLM and TTS work left for it is dropped.
+'''
+import contextvars
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+from src.services import metrics
+from src.services.audio import ulaw
+from src.services.twilio_api.endpointing import Endpointer
+from src.services.twilio_api.speculative import EAGER, OFF, Rendered, Speculation, SpeculationStats
+
+CL, BS = "\x1b[0K", "\x08"  # ANSI escape codes for clearing line/backspace
+_STOP = object()
+
+
+def prefetch(items: Iterable, depth: int = 2) -> Iterator:
+    '''
+    Starts consuming `items` in a worker thread now; the returned iterator drains it.
+    Closing that iterator stops the worker at its next item and closes `items`.
+    '''
+    q, done, stop = queue.Queue(maxsize=depth), object(), threading.Event()
+
+    def worker():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                q.put(item)
+        except Exception as e:
+            print(f"\n[prefetch] Producer error: {e}", file=sys.stderr)
+        finally:
+            if stop.is_set():
+                close = getattr(items, "close", None)
+                if close:
+                    close()  # e.g. the LLM stream
+            else:
+                q.put(done)
+
+    def drain():
+        try:
+            while (item := q.get()) is not done:
+                yield item
+        finally:
+            stop.set()
+            while not q.empty():  # a worker blocked on put() gets to see `stop`
+                q.get_nowait()
+
+    threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True).start()
+    return drain()
+
+
+class Reply:
+    '''
+    The reply being spoken. The sender books the frames it hands Twilio with
+    `sent()`, so `playing()` knows when Twilio's buffer runs dry; `cancel()`
+    (barge-in) runs the hooks registered with `on_cancel()`, e.g. cancelling TTS
+    requests that are still queued.
+    '''
+
+    def __init__(self, frame_ms: int = 20):
+        self.frame_ms = frame_ms
+        self.cancelled = threading.Event()
+        self.play_until = 0.0
+        self.dropped = 0  # sentences not sent because of the cancel
+        self._hooks: list = []
+        self._lock = threading.Lock()
+
+    def sent(self, frames: int) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.play_until = max(self.play_until, now) + frames * self.frame_ms / 1000
+
+    def playing(self) -> bool:
+        return not self.cancelled.is_set() and time.perf_counter() < self.play_until
+
+    def on_cancel(self, hook: Callable[[], None]) -> None:
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._hooks.append(hook)
+                return
+        hook()
+
+    def cancel(self) -> float:
+        '''Returns the ms of audio that was sent but not played yet.'''
+        with self._lock:
+            if self.cancelled.is_set():
+                return 0.0
+            self.cancelled.set()
+            hooks, self._hooks = self._hooks, []
+            unplayed = max(0.0, self.play_until - time.perf_counter())
+        for hook in hooks:
+            hook()
+        return unplayed * 1000
+
+
+class CallPipeline:
+    '''
+    receive (caller thread) -> audio queue -> ASR -> decision/LLM -> reply queue -> TTS/send
+
+    `recognizer` is a Vosk-style recogniser, `decide(snippet) -> bool`,
+    `respond(snippet) -> Iterable[str]` yields sentences to speak and
+    `speak(sentences, t_turn)` synthesises and sends them, booking what it sends
+    on `self.reply`. With `speculation` above OFF, `respond` runs concurrently with
+    `decide`; `prerender(text)` is used at EAGER to synthesise the first sentence
+    ahead of time. `barge_in_ms` of caller speech while Lucy talks cancels the
+    reply and calls `on_barge_in()`, which clears Twilio's buffer.
+    '''
+
+    def __init__(self, recognizer, decide: Callable[[str], bool], respond: Callable[[str], Iterable[str]],
+                 speak: Callable[[Iterable[str], float], None], endpointer: Endpointer | None = None,
+                 speculation: int = OFF, prerender: Callable[[str], Rendered] | None = None,
+                 audio_frames: int = 250, reply_depth: int = 1, context_words: int = 30,
+                 barge_in_ms: int = 200, on_barge_in: Callable[[], None] | None = None):
+        self.recognizer = recognizer
+        self.decide = decide
+        self.respond = respond
+        self.speak = speak
+        self.endpointer = endpointer or Endpointer()
+        self.speculation = speculation
+        self.prerender = prerender if speculation >= EAGER else None
+        self.spec_stats = SpeculationStats()
+        self.barge_in_ms = barge_in_ms  # 0: never interrupted
+        self.on_barge_in = on_barge_in
+        self.reply: Reply | None = None  # the latest reply, until its audio has played
+        self.barge_ins = 0
+        self.cancelled_sentences = 0
+        self.cleared_ms = 0.0
+        self._spec = None  # in-flight Speculation, guarded by _lock
+        self.context_words = context_words
+        self.words = deque(maxlen=100)  # Store recent words
+        self.transcript: list = []  # {"role": "caller" | "lucy", "text"} in order, for the memory index
+        self.frames_in = 0
+        self.frames_dropped = 0
+        self.decisions = 0
+        self.decisions_skipped = 0  # turn ends with nothing new to judge
+        self.replies = 0
+        self._started = time.monotonic()
+        self._last_asked = None
+
+        # 5 s of audio: enough slack for ASR hiccups without unbounded growth
+        self._audio = queue.Queue(maxsize=audio_frames)
+        self._replies = queue.Queue(maxsize=reply_depth)
+        self._lock = threading.Lock()
+        self._turn_end = threading.Event()
+        self._speaking = threading.Event()
+        self._stopped = threading.Event()
+        self.trace = metrics.Trace()  # the stages run in its context, so speak() and the backends report to it
+        self._threads = [
+            threading.Thread(target=metrics.bind(self.trace).run, args=(stage,), name=name, daemon=True)
+            for name, stage in (("asr", self._asr_stage), ("decision", self._decision_stage), ("tts", self._tts_stage))
+        ]
+        for t in self._threads:
+            t.start()
+
+    # ── receive ────────────────────────────────────────────────────────────
+    def feed(self, payload: bytes) -> None:
+        '''Queues one μ-law media frame; never blocks the websocket reader.'''
+        self.frames_in += 1
+        try:
+            self._audio.put_nowait(payload)
+        except queue.Full:
+            # ASR is more than the queue behind: drop the oldest audio, keep the newest
+            try:
+                self._audio.get_nowait()
+            except queue.Empty:
+                pass
+            self.frames_dropped += 1
+            self._audio.put_nowait(payload)
+
+    def close(self, timeout: float = 2.0) -> None:
+        self._stopped.set()
+        self._turn_end.set()
+        for q in (self._audio, self._replies):
+            while True:  # pending audio/replies are dropped, the stages only need to see _STOP
+                try:
+                    q.put_nowait(_STOP)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+        for t in self._threads:
+            t.join(timeout)
+        self._drop_speculation()
+        minutes = max(time.monotonic() - self._started, 1.0) / 60
+        print(f"\n[pipeline] frames={self.frames_in} dropped={self.frames_dropped} "
+              f"turns={self.endpointer.turns} decisions={self.decisions} ({self.decisions / minutes:.1f}/min) "
+              f"skipped={self.decisions_skipped} replies={self.replies} barge_ins={self.barge_ins} "
+              f"cancelled_sentences={self.cancelled_sentences} cleared={self.cleared_ms / 1000:.1f}s")
+        if self.speculation:
+            print(f"[pipeline] {self.spec_stats}")
+
+    # ── stages ─────────────────────────────────────────────────────────────
+    def _asr_stage(self):
+        rec, ep = self.recognizer, self.endpointer
+        while (payload := self._audio.get()) is not _STOP:
+            pcm16 = ulaw.decode(payload)
+            if ep.frame(pcm16) and self.barge_in_ms and ep.speech_ms >= self.barge_in_ms:
+                self._barge_in()
+            with metrics.span("asr"):
+                final = rec.AcceptWaveform(pcm16.tobytes())
+            if final:
+                self._heard(json.loads(rec.Result())["text"].strip())
+            else:
+                part = json.loads(rec.PartialResult()).get("partial", "").strip()
+                # Only print partial if non-empty to avoid flickering
+                if part:
+                    print(CL + part + BS * len(part), end="", flush=True)
+                if ep.needs_flush():
+                    # Caller went quiet but Vosk hasn't closed the utterance yet
+                    self._heard(json.loads(rec.FinalResult())["text"].strip())
+            if self.speculation >= EAGER and ep.likely_end():
+                self._speculate(self._snippet())
+            if ep.turn_ended():
+                self._turn_end.set()
+
+    def _heard(self, txt: str):
+        self.endpointer.final(txt)
+        if txt:
+            print(CL + txt + " ", end="", flush=True)
+            with self._lock:
+                self.words.extend(txt.split())
+                self.transcript.append({"role": "caller", "text": txt})
+            self._drop_speculation()  # the caller kept going, that reply is stale
+
+    def _barge_in(self):
+        reply = self.reply
+        if reply is None or reply.cancelled.is_set() or not (self._speaking.is_set() or reply.playing()):
+            return
+        cleared = reply.cancel()
+        self.barge_ins += 1
+        self.cleared_ms += cleared
+        metrics.REGISTRY.counter("lucy_barge_ins_total").inc()
+        metrics.REGISTRY.counter("lucy_cleared_audio_seconds_total").inc(cleared / 1000)
+        print(f"\n[pipeline] Barge-in: caller is talking, dropping the reply ({cleared:.0f} ms unplayed)")
+        if self.on_barge_in:
+            self.on_barge_in()
+
+    def _snippet(self) -> str:
+        with self._lock:
+            return " ".join(list(self.words)[-self.context_words:])
+
+    def _speculate(self, snippet: str) -> None:
+        with self._lock:
+            if self._spec and self._spec.snippet == snippet:
+                return
+            old, self._spec = self._spec, None
+            if snippet:
+                self._spec = Speculation(snippet, self.respond, self.spec_stats, self.prerender)
+        if old:
+            old.cancel()
+
+    def _drop_speculation(self) -> None:
+        with self._lock:
+            spec, self._spec = self._spec, None
+        if spec:
+            spec.cancel()
+
+    def _take_speculation(self, snippet: str) -> Speculation | None:
+        with self._lock:
+            spec = self._spec
+            if spec and spec.snippet == snippet:
+                self._spec = None
+                return spec
+        return None
+
+    def _decision_stage(self):
+        while not self._stopped.is_set():
+            self._turn_end.wait()
+            # Don't talk over ourselves: a turn that ends while Lucy talks is judged afterwards
+            while self._speaking.is_set() or not self._replies.empty():
+                if self._stopped.wait(0.05):
+                    return
+            if self._stopped.is_set():
+                break
+            self._turn_end.clear()
+            snippet = self._snippet()
+            if not snippet or snippet == self._last_asked:
+                self.decisions_skipped += 1
+                continue
+            self._last_asked = snippet
+            self.decisions += 1
+            t_turn = time.perf_counter()
+            self.trace.start_turn(t_turn)
+            if self.speculation:
+                self._speculate(snippet)  # no-op if an eager one for this snippet is running
+            try:
+                with metrics.span("decision"):
+                    speak = self.decide(snippet)
+                if not speak:
+                    self._drop_speculation()
+                    continue
+                print(f"\n[ollama-decision] Decided to speak based on: '{snippet}'")
+                with self._lock:
+                    self.words.clear()  # Clear buffer: these words are being answered
+                spec = self._take_speculation(snippet)
+                # Start the LLM right away (unless it already is); TTS picks the sentences up as they arrive
+                sentences = spec.take() if spec else prefetch(self.respond(snippet))
+            except Exception as e:  # this turn gets no reply; the next one is judged as usual
+                print(f"\n[pipeline] Reply failed: {e!r}", file=sys.stderr)
+                continue
+            self._replies.put((sentences, t_turn))
+
+    def _said(self, sentences: Iterable) -> Iterator:
+        try:
+            for item in sentences:
+                with self._lock:
+                    self.transcript.append({"role": "lucy", "text": item.text if isinstance(item, Rendered) else item})
+                yield item
+        finally:
+            close = getattr(sentences, "close", None)
+            if close:
+                close()  # a cut-short reply stops generating
+
+    def _tts_stage(self):
+        while (reply := self._replies.get()) is not _STOP and not self._stopped.is_set():
+            sentences, t_turn = reply
+            self.reply = current = Reply()
+            self._speaking.set()
+            try:
+                self.speak(self._said(sentences), t_turn)
+                if not current.cancelled.is_set():
+                    self.replies += 1
+            except Exception as e:
+                print(f"\n[pipeline] TTS error: {e}", file=sys.stderr)
+            finally:
+                self._speaking.clear()
+                if current.dropped:
+                    self.cancelled_sentences += current.dropped
+                    metrics.REGISTRY.counter("lucy_cancelled_sentences_total").inc(current.dropped)
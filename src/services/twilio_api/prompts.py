@@ -0,0 +1,28 @@
+'''
+Prompts shared by the Flask bridge (code.py) and the async gateway.
+They go first in every request, byte-identical, so Ollama can reuse their KV cache.
+'''
+from typing import Iterable
+
+DECISION_SYSTEM = (
+    "You are an AI assistant deciding *only* whether to speak right now or wait for the user to continue. "
+    "Consider the last 30 words spoken by the caller. Respond ONLY with JSON: "
+    '{"speak": true} or {"speak": false}. '
+    "Do not add any other text or explanation."
+)
+CONVERSATION_SYSTEM = (
+    "You are Lucy, an emotional AI assistant. Briefly respond to the user's last statement. "
+    "Be concise and natural. Respond ONLY with the words you would say out loud, "
+    "no JSON, markdown or stage directions."
+)
+
+def decision_prompt(snippet: str) -> str:
+    return f'Caller words: "{snippet}"'
+
+def reply_prompt(snippet: str, memories: Iterable[str] = ()) -> str:
+    # Memories go in the user message: the system prompt stays byte-identical and cached
+    memories = list(memories)
+    if not memories:
+        return f'User said: "{snippet}"'
+    remembered = "\n".join(f"- {m}" for m in memories)
+    return f'From earlier calls you remember the caller saying:\n{remembered}\n\nUser said: "{snippet}"'
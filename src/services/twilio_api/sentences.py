@@ -0,0 +1,77 @@
+'''
+Incremental sentence splitter for streamed LLM output.
+Tokens go in, speakable chunks come out as soon as a sentence (or, for the
+very first chunk, a clause) is complete, so TTS can start before the reply ends.
+'''
+import re
+from typing import Iterable, Iterator, List, Optional
+
+SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s')
+CLAUSE_END = re.compile(r'[,;:—–]\s')
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "e.g.", "i.e.", "etc."}
+
+
+class SentenceChunker:
+    '''
+    Buffers streamed text and cuts it into chunks worth synthesising.
+    The first chunk may be cut at a clause boundary to get audio out early;
+    later chunks are cut at sentence ends, short sentences are merged.
+    '''
+
+    def __init__(self, first_min_chars: int = 12, min_chars: int = 40, max_chars: int = 220):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.emitted = 0
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk, self._buf = self._buf[:cut].strip(), self._buf[cut:]
+            if chunk:
+                chunks.append(chunk)
+                self.emitted += 1
+        return chunks
+
+    def flush(self) -> Optional[str]:
+        chunk, self._buf = self._buf.strip(), ""
+        if not chunk:
+            return None
+        self.emitted += 1
+        return chunk
+
+    def _find_cut(self) -> Optional[int]:
+        buf = self._buf
+        min_chars = self.first_min_chars if self.emitted == 0 else self.min_chars
+        for m in SENTENCE_END.finditer(buf):
+            if m.end() < min_chars:
+                continue
+            word = buf[:m.start() + 1].rsplit(None, 1)[-1].lower()
+            if word in ABBREVIATIONS:
+                continue
+            return m.end()
+        # First chunk: a clause is good enough. Later: only when the buffer gets long.
+        if self.emitted == 0 or len(buf) >= self.max_chars:
+            clauses = [m.end() for m in CLAUSE_END.finditer(buf) if m.end() >= min_chars]
+            if clauses:
+                return clauses[-1]
+        if len(buf) >= self.max_chars:
+            space = buf.rfind(" ", 0, self.max_chars)
+            if space > 0:
+                return space + 1
+        return None
+
+
+def iter_sentences(tokens: Iterable[str], chunker: Optional[SentenceChunker] = None) -> Iterator[str]:
+    '''Re-chunks a token stream into speakable sentences.'''
+    chunker = chunker or SentenceChunker()
+    for token in tokens:
+        yield from chunker.feed(token)
+    tail = chunker.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,103 @@
+'''
+Speculative reply generation.
+The conversational model starts on a likely turn end, in parallel with the
+speak/no-speak decision, and is thrown away if the decision says no.
+
+Speculation levels (LUCY_SPECULATION):
+    0  off: decide first, then generate
+    1  generate alongside the decision call at each turn end
+    2  start already at a likely turn end (shorter pause) and pre-render the
+       first sentence's audio
+'''
+import contextvars
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+OFF, WITH_DECISION, EAGER = 0, 1, 2
+
+
+class Rendered(NamedTuple):
+    '''A sentence whose audio was synthesised ahead of time.'''
+    text: str
+    audio: object
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.used = 0
+        self.cancelled = 0
+        self.wasted_sentences = 0  # generated, then thrown away
+        self.wasted_s = 0.0        # wall time of cancelled speculations
+        self.useful_sentences = 0
+
+    def __str__(self):
+        return (f"speculation started={self.started} used={self.used} cancelled={self.cancelled} "
+                f"useful_sentences={self.useful_sentences} wasted_sentences={self.wasted_sentences} "
+                f"wasted={self.wasted_s:.1f}s")
+
+
+class Speculation:
+    '''
+    Runs `respond(snippet)` in a background thread and buffers its sentences.
+    `take()` hands the buffered and still-arriving sentences over; `cancel()`
+    stops generation (closing the LLM stream) and books the work as wasted.
+    '''
+
+    def __init__(self, snippet: str, respond: Callable[[str], Iterable[str]],
+                 stats: SpeculationStats, prerender: Callable[[str], Rendered] | None = None):
+        self.snippet = snippet
+        self.stats = stats
+        self._respond = respond
+        self._prerender = prerender
+        self._items = queue.Queue()  # replies are a few sentences, no need to bound
+        self._done = object()
+        self._cancelled = threading.Event()
+        self._produced = 0
+        self._taken = False
+        self._t0 = time.monotonic()
+        stats.started += 1
+        threading.Thread(target=contextvars.copy_context().run, args=(self._run,), daemon=True).start()
+
+    def _run(self):
+        source = None
+        try:
+            source = iter(self._respond(self.snippet))  # may fail up front, e.g. its memory lookup
+            for item in source:
+                if self._cancelled.is_set():
+                    break
+                if self._produced == 0 and self._prerender:
+                    item = self._prerender(item)
+                self._produced += 1
+                self._items.put(item)
+        except Exception as e:
+            print(f"\n[speculation] Producer error: {e}", file=sys.stderr)
+        finally:
+            close = getattr(source, "close", None)  # None too if respond() raised
+            if close:
+                close()  # stops the LLM stream if we bailed out early
+            self._items.put(self._done)
+
+    def take(self) -> Iterator:
+        self._taken = True
+        self.stats.used += 1
+
+        def drain():
+            try:
+                while (item := self._items.get()) is not self._done:
+                    self.stats.useful_sentences += 1
+                    yield item
+            finally:
+                self._cancelled.set()  # closed early (barge-in): stop generating, without booking it as waste
+        return drain()
+
+    def cancel(self) -> None:
+        if self._taken or self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        self.stats.cancelled += 1
+        self.stats.wasted_sentences += self._produced
+        self.stats.wasted_s += time.monotonic() - self._t0
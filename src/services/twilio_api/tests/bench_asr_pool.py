@@ -0,0 +1,122 @@
+'''
+Load test for the ASR pool: how many real-time calls each core keeps up with.
+Every simulated call feeds 20 ms frames at real-time pace. A call keeps up when
+its results come back within LAG_BUDGET and no audio is dropped.
+
+Synthetic recogniser (burns --cost-ms of CPU per frame, final every 0.5 s):
+    python -m src.services.twilio_api.tests.bench_asr_pool --workers 2
+Real Vosk, looping an 8 kHz mono 16-bit WAV:
+    python -m src.services.twilio_api.tests.bench_asr_pool --model csm/vosk_model --wav call.wav
+'''
+import argparse, json, struct, threading, time, wave
+
+import numpy as np
+
+from src.services.twilio_api.asr_pool import ASRPool
+
+FRAME_BYTES = 320  # 20 ms of pcm16 at 8 kHz
+FRAMES_PER_FINAL = 25
+LAG_BUDGET = 0.25
+
+
+class BurnRecognizer:
+    '''Costs `cost` seconds of CPU per frame; each final carries the send time of its last frame.'''
+
+    def __init__(self, cost):
+        self.cost, self.frames, self.last_sent = cost, 0, 0.0
+
+    def AcceptWaveform(self, data):
+        final = False
+        for i in range(0, len(data) - FRAME_BYTES + 1, FRAME_BYTES):
+            end = time.thread_time() + self.cost
+            while time.thread_time() < end:
+                pass
+            self.frames += 1
+            self.last_sent = struct.unpack_from("d", data, i)[0]
+            final = final or self.frames % FRAMES_PER_FINAL == 0
+        return final
+
+    def Result(self):
+        return json.dumps({"text": repr(self.last_sent)})
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self):
+        return json.dumps({"text": ""})
+
+
+def burn_loader(cost):
+    return lambda: BurnRecognizer(cost)
+
+
+def run_call(pool, audio, seconds, synthetic, out):
+    rec = pool.recognizer()
+    lags, t0, n = [], time.perf_counter(), int(seconds * 50)
+    for k in range(n):
+        time.sleep(max(0.0, t0 + k * 0.02 - time.perf_counter()))
+        i = (k * FRAME_BYTES) % (len(audio) - FRAME_BYTES)
+        frame = bytearray(audio[i:i + FRAME_BYTES])
+        if synthetic:
+            struct.pack_into("d", frame, 0, time.perf_counter())
+        if rec.AcceptWaveform(bytes(frame)) and synthetic:
+            for text in json.loads(rec.Result())["text"].split():
+                lags.append(time.perf_counter() - float(text))
+    t_end = time.perf_counter()
+    rec.FinalResult(timeout=10)
+    drain = time.perf_counter() - t_end  # backlog still queued when the call hung up
+    rec.close()
+    out.append((lags, drain, rec.overruns))
+
+
+def load(pool, calls, audio, seconds, synthetic):
+    out = []
+    threads = [threading.Thread(target=run_call, args=(pool, audio, seconds, synthetic, out)) for _ in range(calls)]
+    for t in threads:
+        t.start()
+        time.sleep(0.02 / calls)  # spread frame arrival over the 20 ms period
+    for t in threads:
+        t.join()
+    lags = np.array([x for lags, _, _ in out for x in lags] or [0.0])
+    drains = np.array([d for _, d, _ in out])
+    overruns = sum(o for _, _, o in out)
+    p50, p95 = np.percentile(lags, [50, 95]) if synthetic else np.percentile(drains, [50, 95])
+    ok = p95 < LAG_BUDGET and drains.max() < LAG_BUDGET and overruns == 0
+    print(f"{calls:5d} calls  {calls / pool.workers:6.1f}/core  lag p50={p50 * 1000:6.0f} ms "
+          f"p95={p95 * 1000:6.0f} ms  drain max={drains.max() * 1000:6.0f} ms  overruns={overruns:5d}  "
+          f"{'ok' if ok else 'OVER'}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--cost-ms", type=float, default=2.0, help="synthetic CPU per 20 ms frame")
+    ap.add_argument("--model", help="Vosk model folder (default: synthetic recogniser)")
+    ap.add_argument("--wav", help="8 kHz mono pcm16 audio for --model")
+    args = ap.parse_args()
+
+    synthetic = not args.model
+    if synthetic:
+        pool = ASRPool(workers=args.workers, slots_per_worker=128, loader=burn_loader,
+                       loader_args=(args.cost_ms / 1000,))
+        audio = np.zeros(FRAME_BYTES * 50, dtype=np.uint8).tobytes()
+    else:
+        pool = ASRPool(args.model, workers=args.workers, slots_per_worker=128)
+        with wave.open(args.wav) as w:
+            assert w.getframerate() == 8000 and w.getnchannels() == 1 and w.getsampwidth() == 2
+            audio = w.readframes(w.getnframes())
+    try:
+        calls, best = pool.workers, 0
+        while calls <= pool.workers * pool.slots_per_worker and load(pool, calls, audio, args.seconds, synthetic):
+            best = calls
+            calls *= 2
+        print(f"\ncapacity: ~{best / pool.workers:.0f} real-time calls per core "
+              f"({pool.workers} workers{', %.1f ms/frame' % args.cost_ms if synthetic else ''})")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
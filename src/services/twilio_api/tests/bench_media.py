@@ -0,0 +1,111 @@
+'''
+Throughput of outbound media framing: the old dict + json.dumps + base64 per
+20 ms frame against the MediaTemplate (one base64 pass, a template per message),
+in messages/s and CPU ms per second of audio. Then the MediaWriter end to end:
+unpaced into a null socket, and paced in real time for --paced-s seconds, where
+what matters is the CPU it leaves for reading inbound audio. Paced, the writer
+wakes once per burst (10/s by default); that is set against a thread that only
+sleeps as often, the floor for any paced sender on the host.
+Run: python -m src.services.twilio_api.tests.bench_media
+'''
+import argparse
+import base64
+import json
+import threading
+import time
+
+import numpy as np
+
+from src.services.audio import ulaw
+from src.services.twilio_api.media import FRAME_BYTES, MediaTemplate, MediaWriter
+
+SID = "MZ0123456789abcdef0123456789abcdef"
+
+
+def legacy_messages(send, data: bytes, seq: int) -> int:
+    # send_frames() as it was in code.py
+    for frame in ulaw.frames(np.frombuffer(data, dtype=np.uint8), FRAME_BYTES):
+        payload = base64.b64encode(frame).decode()
+        send(json.dumps({
+            "event": "media", "streamSid": SID,
+            "sequenceNumber": str(seq),
+            "media": {"track": "outbound", "chunk": str(seq),
+                      "timestamp": str(20 * (seq - 1)),
+                      "payload": payload},
+        }))
+        seq += 1
+    return seq
+
+
+def template_messages(send, data: bytes, seq: int) -> int:
+    template = MediaTemplate(SID)
+    for message in template.media(data, seq):
+        send(message)
+    return seq + len(data) // FRAME_BYTES
+
+
+def bench(name, fn, seconds: float, repeat: int):
+    fn()
+    t0, c0 = time.perf_counter(), time.process_time()
+    for _ in range(repeat):
+        fn()
+    wall, cpu = (time.perf_counter() - t0) / repeat, (time.process_time() - c0) / repeat
+    messages = seconds * 50
+    print(f"{name:<36} {messages / wall:10,.0f} msg/s   {cpu * 1000 / seconds:7.3f} ms CPU / s of audio")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=10, help="length of the utterance")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--paced-s", type=float, default=3)
+    args = ap.parse_args()
+    data = np.random.default_rng(0).integers(0, 256, int(args.seconds * 50) * FRAME_BYTES, dtype=np.uint8).tobytes()
+    sink = []
+
+    def send(text):
+        sink.append(text)
+        if len(sink) > 10_000:
+            sink.clear()
+
+    assert legacy_messages(send, data[:480], 1) == template_messages(send, data[:480], 1)
+    assert sink[-6:-3] == sink[-3:]  # byte-identical messages
+
+    print(f"serialise + send to a null socket, {args.seconds:.0f}s utterance")
+    bench("dict + json.dumps per frame", lambda: legacy_messages(send, data, 1), args.seconds, args.repeat)
+    bench("MediaTemplate, whole utterance", lambda: template_messages(send, data, 1), args.seconds, args.repeat)
+
+    def through_writer():
+        writer = MediaWriter(send, lead_ms=10 ** 9)  # never waits
+        writer.media(SID, data, 1)
+        while writer.messages_sent < len(data) // FRAME_BYTES:
+            time.sleep(0.0005)
+        writer.close()
+    bench("MediaWriter, unpaced", through_writer, args.seconds, max(args.repeat // 5, 1))
+
+    paced = data[:int(args.paced_s * 50) * FRAME_BYTES]
+    writer = MediaWriter(send)
+    bursts = []
+    sent = writer.pacer.sent
+    writer.pacer.sent = lambda frames, now: (bursts.append(frames), sent(frames, now))
+    c0 = time.process_time()
+    writer.media(SID, paced, 1)
+    time.sleep(args.paced_s)  # the writer's thread is the only one working; polling it would cost as much
+    cpu = time.process_time() - c0
+    assert writer.messages_sent == len(paced) // FRAME_BYTES
+    writer.close()
+    print(f"MediaWriter, paced (lead 400 ms)       {args.paced_s:.1f}s of audio in {args.paced_s:.1f}s   "
+          f"{cpu * 1000 / args.paced_s:7.3f} ms CPU / s of audio")
+    print(f"  {len(bursts)} bursts, {cpu * 1e6 / len(bursts):.0f} us CPU each")
+
+    def sleeper():
+        for _ in bursts:
+            time.sleep(0.1)
+    c0 = time.process_time()
+    thread = threading.Thread(target=sleeper)
+    thread.start()
+    thread.join()
+    print(f"  a thread that only wakes as often: {(time.process_time() - c0) * 1e6 / len(bursts):.0f} us CPU per wake-up")
+
+if __name__ == "__main__":
+    main()
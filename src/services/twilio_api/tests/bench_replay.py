@@ -0,0 +1,317 @@
+'''
+Offline replay benchmark for the Twilio bridge: end-to-end turn latency and
+how many concurrent calls one bridge process carries.
+Recorded media streams (the files TWILIO_RECORD_DIR writes, one Twilio message
+per line) are replayed in real time into /twilio_api/stream by N simulated
+callers; without --recordings a call of --turns turns is generated. Ollama is a
+local stub server (--ttft-ms to the first token of a reply, --decision-ms to that
+of a decision, --token-ms per token after it) and CSM is csm_api running its
+stub generator (--csm-rtf, --csm-batch), both in one helper process. The bridge runs in a process of its own with a fake
+recogniser costing --asr-ms of CPU per frame, so its CPU per call is measured
+alone.
+
+Turn latency is from the last speech frame of a caller's turn to the first reply
+frame back. Results go to --out as JSON; --baseline compares with an earlier
+file and exits 1 when p95 latency or CPU per call got worse by more than
+--max-regression.
+
+Run: python -m src.services.twilio_api.tests.bench_replay --calls 10 50 --out replay.json
+     python -m src.services.twilio_api.tests.bench_replay --recordings data/recordings/*.jsonl --baseline replay.json
+'''
+import argparse, asyncio, base64, datetime, json, multiprocessing, os, platform, re, socket, subprocess, sys, time
+
+import httpx
+import numpy as np
+import websockets
+
+from src.services.audio import ulaw
+
+REPLY = "Oh, that sounds like a big day. Did you get the chemistry revision done? Tell me everything."
+LOUD = 1000  # peak PCM level that counts as speech, as in the fake recogniser
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_backends(port: int, ttft_ms: float, token_ms: float, decision_ms: float, csm_rtf: float, csm_batch: int):
+    '''Ollama /api/chat stub and csm_api with the stub generator, on one port.'''
+    import uvicorn
+    from fastapi import Request
+    from fastapi.responses import StreamingResponse
+    from src.services.csm_api import main as csm
+    from src.services.csm_api.stub import StubGenerator
+
+    csm.load_generator = lambda: StubGenerator(rtf=csm_rtf)
+    csm.MAX_BATCH = csm_batch
+    app = csm.app
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        decision = "format" in body  # the constrained speak/no-speak call
+        first_ms, text = (decision_ms, ['{"', "speak", '":', " true", "}"]) if decision else \
+            (ttft_ms, re.findall(r"\S+\s*", REPLY))
+
+        async def tokens():
+            await asyncio.sleep(first_ms / 1000)
+            for i, token in enumerate(text):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield json.dumps({"message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+            yield json.dumps({"message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+        return StreamingResponse(tokens(), media_type="application/x-ndjson")
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def run_bridge(port: int, backends: str, asr_ms: float):
+    os.environ.update(OLLAMA_HOST=backends, CSM_URL=backends, LUCY_MEMORIES="0")
+    sys.stdout = open(os.devnull, "w")  # the per-call prints still cost their formatting, as in production
+    import uvicorn
+    from src.services.twilio_api import main
+    from src.services.twilio_api.tests.bench_twilio_service import BurnRecognizer
+
+    class Recognizer(BurnRecognizer):
+        turns = 0
+
+        def Result(self):
+            self.turns += 1  # a new sentence every turn, or the bridge skips it as already judged
+            return json.dumps({"text": f"turn {self.turns} tell me about your day"})
+
+    main.new_recognizer = lambda: Recognizer(asr_ms)
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", ws_max_queue=1024)
+
+
+def start(target, args: tuple, ready_url: str):
+    proc = multiprocessing.get_context("spawn").Process(target=target, args=args, daemon=True)
+    proc.start()
+    end = time.monotonic() + 60
+    while time.monotonic() < end:
+        try:
+            if httpx.get(ready_url, timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{ready_url} did not come up")
+
+
+def generated_call(turns: int, speech_s: float, pause_s: float) -> list:
+    '''Start, `turns` x (speech, pause), stop, as Twilio sends it.'''
+    speech = ulaw.encode((np.random.default_rng(0).standard_normal(160) * 8000).astype(np.int16)).tobytes()
+    silence = bytes([0xFF]) * 160
+    frames = ([speech] * int(speech_s * 50) + [silence] * int(pause_s * 50)) * turns
+    messages = [{"event": "start", "streamSid": "MZrecorded", "start": {"callSid": "CArecorded"}}]
+    for n, frame in enumerate(frames):
+        messages.append({"event": "media", "streamSid": "MZrecorded", "media": {
+            "track": "inbound", "chunk": str(n + 1), "timestamp": str(20 * n),
+            "payload": base64.b64encode(frame).decode()}})
+    return messages + [{"event": "stop", "streamSid": "MZrecorded"}]
+
+
+def load_recording(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Replay:
+    '''One recording, serialised once, with the caller's turns found from the audio.'''
+
+    def __init__(self, messages: list, min_pause_ms: int = 300):
+        self.start = next(m for m in messages if m["event"] == "start")
+        media = [m for m in messages if m["event"] == "media"]
+        t0 = int(media[0]["media"]["timestamp"]) if media else 0
+        self.media = [((int(m["media"]["timestamp"]) - t0) / 1000, json.dumps(m)) for m in media]
+        self.turns = []  # (speech ended, next speech starts) in seconds from the first frame
+        loud_until, in_turn = None, False
+        for (at, _), m in zip(self.media, media):
+            pcm = ulaw.decode(base64.b64decode(m["media"]["payload"]))
+            if len(pcm) and np.abs(pcm.astype(np.int32)).max() > LOUD:
+                if in_turn is None:  # speech after a finished turn: the reply window closes
+                    self.turns[-1] = (self.turns[-1][0], at)
+                loud_until, in_turn = at + 0.02, True
+            elif in_turn and at - loud_until >= min_pause_ms / 1000:
+                self.turns.append((loud_until, float("inf")))
+                in_turn = None
+        self.seconds = self.media[-1][0] + 0.02 if self.media else 0.0
+
+
+async def caller(url: str, i: int, replay: Replay, tail_s: float) -> dict:
+    async with websockets.connect(f"{url}/twilio_api/stream", max_size=None) as ws:
+        sid = f"MZreplay{i}"
+        await ws.send(json.dumps({**replay.start, "streamSid": sid,
+                                  "start": {**replay.start.get("start", {}), "streamSid": sid, "callSid": f"CAreplay{i}"}}))
+        replies: list = []
+
+        async def listen():
+            async for raw in ws:
+                if raw.startswith('{"event": "media"') or json.loads(raw)["event"] == "media":
+                    replies.append(time.perf_counter())
+
+        listener = asyncio.create_task(listen())
+        t0 = time.perf_counter()
+        for at, raw in replay.media:
+            await asyncio.sleep(max(0.0, t0 + at - time.perf_counter()))  # real time, like Twilio
+            await ws.send(raw)
+        last_end = t0 + replay.turns[-1][0] if replay.turns else t0
+        deadline = time.perf_counter() + tail_s
+        while time.perf_counter() < deadline and not any(r > last_end for r in replies):
+            await asyncio.sleep(0.05)  # give the last turn its answer before hanging up
+        await ws.send(json.dumps({"event": "stop", "streamSid": sid}))
+        listener.cancel()
+    latencies = []
+    for ended, next_speech in replay.turns:
+        first = next((r for r in replies if t0 + ended < r < t0 + next_speech), None)
+        latencies.append(None if first is None else (first - t0 - ended) * 1000)
+    return {"latencies": latencies, "reply_frames": len(replies)}
+
+
+async def client_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - t - 0.01) * 1000)
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    return {**{f"p{q}": round(float(np.percentile(values, q)), 1) for q in (50, 95, 99)},
+            "max": round(float(max(values)), 1)}
+
+
+async def load(url: str, calls: int, replays: list, args) -> dict:
+    stop, lags = asyncio.Event(), []
+    lagger = asyncio.create_task(client_lag(stop, lags))
+    t = time.perf_counter()
+
+    async def one(i: int):
+        await asyncio.sleep(i * args.stagger_ms / 1000)  # callers don't all speak in lockstep
+        return await caller(url, i, replays[i % len(replays)], args.tail_s)
+
+    results = await asyncio.gather(*(one(i) for i in range(calls)))
+    wall = time.perf_counter() - t
+    stop.set()
+    await lagger
+    latencies = [ms for r in results for ms in r["latencies"]]
+    return {"wall_s": wall, "turns": len(latencies), "answered": sum(ms is not None for ms in latencies),
+            "latencies": [ms for ms in latencies if ms is not None],
+            "reply_frames": sum(r["reply_frames"] for r in results),
+            "client_lag_p95_ms": round(float(np.percentile(lags, 95)), 1) if lags else None}
+
+
+def run(calls: int, backends: str, replays: list, args) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    bridge = start(run_bridge, (port, backends, args.asr_ms), f"{url}/twilio_api/stats")
+    try:
+        before = httpx.get(f"{url}/twilio_api/stats").json()
+        result = asyncio.run(load(f"ws://127.0.0.1:{port}", calls, replays, args))
+        time.sleep(0.5)  # the last calls' totals are booked when their sockets close
+        after = httpx.get(f"{url}/twilio_api/stats").json()
+    finally:
+        bridge.kill()
+        bridge.join()
+    cpu, wall = after["cpu_s"] - before["cpu_s"], result["wall_s"]
+    server = after["latency"]
+    return {
+        "calls": calls, "turns": result["turns"], "answered": result["answered"],
+        "turn_latency_ms": percentiles(result["latencies"]),
+        "inbound_fps": round((after["frames"] - before["frames"]) / wall, 1),
+        "outbound_fps": round(result["reply_frames"] / wall, 1),
+        "dropped_frames": after["dropped"] - before["dropped"],
+        "cpu_ms_per_call": round(cpu * 1000 / calls, 1),
+        "cpu_util": round(cpu / wall, 3),
+        "client_lag_p95_ms": result["client_lag_p95_ms"],
+        "decision_failure_rate": after["decisions"]["failure_rate"],
+        "server_ms": {name: server[name] for name in sorted(server)
+                      if name.startswith(("lucy_stage_seconds", "lucy_time_to"))},
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    '''Regressions of p95 turn latency and CPU per call against `baseline`, run by run.'''
+    old = {r["calls"]: r for r in baseline["runs"]}
+    worse = []
+    for r in results["runs"]:
+        b = old.get(r["calls"])
+        if b is None:
+            continue
+        for label, new_v, old_v in (("p95 turn latency", r["turn_latency_ms"]["p95"], b["turn_latency_ms"]["p95"]),
+                                    ("cpu per call", r["cpu_ms_per_call"], b["cpu_ms_per_call"])):
+            if not new_v or not old_v:
+                continue
+            change = new_v / old_v - 1
+            print(f"[compare] {r['calls']:4d} calls  {label:<17} {old_v:8.1f} -> {new_v:8.1f}  {change:+.0%}")
+            if change > max_regression:
+                worse.append(f"{r['calls']} calls: {label} {change:+.0%}")
+    return worse
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, nargs="+", default=[10, 50])
+    ap.add_argument("--recordings", nargs="*", default=[], help="TWILIO_RECORD_DIR files; default: a generated call")
+    ap.add_argument("--turns", type=int, default=3, help="turns of the generated call")
+    ap.add_argument("--speech-s", type=float, default=1.0)
+    ap.add_argument("--pause-s", type=float, default=2.5)
+    ap.add_argument("--asr-ms", type=float, default=0.2, help="recogniser CPU per 20 ms frame")
+    ap.add_argument("--ttft-ms", type=float, default=150, help="stub Ollama: time to the first token")
+    ap.add_argument("--token-ms", type=float, default=20, help="stub Ollama: time per token after that")
+    ap.add_argument("--decision-ms", type=float, default=80, help="stub Ollama: first token of a speak/no-speak answer")
+    ap.add_argument("--csm-rtf", type=float, default=0.2, help="stub CSM: seconds of compute per second of audio")
+    ap.add_argument("--csm-batch", type=int, default=4, help="stub CSM: sentences synthesised together")
+    ap.add_argument("--stagger-ms", type=float, default=20, help="start offset between callers")
+    ap.add_argument("--tail-s", type=float, default=3.0, help="wait for the last answer before hanging up")
+    ap.add_argument("--out", help="write the results here as JSON")
+    ap.add_argument("--baseline", help="earlier --out file to compare with")
+    ap.add_argument("--max-regression", type=float, default=0.2)
+    args = ap.parse_args()
+
+    messages = [load_recording(p) for p in args.recordings] or [generated_call(args.turns, args.speech_s, args.pause_s)]
+    replays = [Replay(m) for m in messages]
+    print(f"[replay] {len(replays)} recording(s), {sum(len(r.turns) for r in replays)} turns, "
+          f"{sum(r.seconds for r in replays):.1f}s of audio")
+    port = free_port()
+    backends_url = f"http://127.0.0.1:{port}"
+    backends = start(run_backends, (port, args.ttft_ms, args.token_ms, args.decision_ms, args.csm_rtf, args.csm_batch), f"{backends_url}/csm_api/ready")
+    results = {"bench": "replay", "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+               "git": git_revision(), "host": {"cpus": os.cpu_count(), "python": platform.python_version()},
+               "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}, "runs": []}
+    try:
+        for calls in args.calls:
+            r = run(calls, backends_url, replays, args)
+            results["runs"].append(r)
+            lat = r["turn_latency_ms"]
+            print(f"{calls:4d} calls  answered {r['answered']:4d}/{r['turns']:<4d} turn latency p50={lat['p50']} "
+                  f"p95={lat['p95']} p99={lat['p99']} ms  in {r['inbound_fps']:.0f} fps out {r['outbound_fps']:.0f} fps  "
+                  f"dropped {r['dropped_frames']}  cpu {r['cpu_ms_per_call']:.0f} ms/call ({r['cpu_util']:.0%})  "
+                  f"client lag p95={r['client_lag_p95_ms']} ms")
+    finally:
+        backends.kill()
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[replay] results written to {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            worse = compare(results, json.load(f), args.max_regression)
+        if worse:
+            print(f"[compare] regressions: {'; '.join(worse)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+'''
+Load test for the asyncio Twilio bridge: N simulated Twilio clients each stream
+20 ms μ-law frames in real time (speech, then a pause) over a websocket and
+wait for Lucy's reply. The service runs in-process with a fake recogniser
+(`--asr-ms` of CPU per frame) and fake Ollama/CSM backends, so this measures the
+bridge itself: time from end of speech to first reply frame, dropped inbound
+frames and event-loop lag.
+
+Run: python -m src.services.twilio_api.tests.bench_twilio_service --calls 10 100 300
+'''
+import argparse, asyncio, base64, json, socket, threading, time
+
+import numpy as np
+import websockets
+
+from src.services.audio import ulaw
+
+SPEECH = ulaw.encode((np.random.default_rng(0).standard_normal(160) * 8000).astype(np.int16)).tobytes()
+SILENCE = bytes([0xFF]) * 160
+
+
+class BurnRecognizer:
+    '''Spends `ms` of CPU per 20 ms frame; one final result per burst of speech.'''
+
+    def __init__(self, ms: float):
+        self.ms, self.loud = ms, False
+
+    def AcceptWaveform(self, pcm):
+        frames = max(1, len(pcm) // 320)
+        end = time.perf_counter() + self.ms * frames / 1000
+        while time.perf_counter() < end:
+            pass
+        loud = bool(np.abs(np.frombuffer(pcm, dtype=np.int16)).max() > 1000)
+        final, self.loud = self.loud and not loud, loud
+        return final
+
+    def Result(self):
+        return json.dumps({"text": "tell me about your day"})
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self):
+        return json.dumps({"text": ""})
+
+
+def serve(asr_ms: float, llm_ms: float) -> str:
+    import uvicorn
+    from src.services.twilio_api import main
+
+    async def decide(snippet):
+        await asyncio.sleep(llm_ms / 1000)
+        return True
+
+    async def respond(snippet, user_id=None):
+        for sentence in ("Oh, that sounds lovely.", "Tell me everything."):
+            await asyncio.sleep(llm_ms / 1000)
+            yield sentence
+
+    async def synthesize(text):
+        for _ in range(len(text) // 10):
+            await asyncio.sleep(0.02)  # 200 ms of audio every 20 ms
+            yield bytes([0x7F]) * 1600
+
+    main.new_recognizer = lambda: BurnRecognizer(asr_ms)
+    main.decide, main.respond, main.synthesize = decide, respond, synthesize
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning", ws_max_queue=1024))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"ws://127.0.0.1:{port}"
+
+
+async def caller(url: str, i: int, speech_s: float, wait_s: float):
+    '''One Twilio media stream; returns ms from end of speech to first reply frame.'''
+    async with websockets.connect(f"{url}/twilio_api/stream", max_size=None) as ws:
+        await ws.send(json.dumps({"event": "start", "streamSid": f"MZ{i}"}))
+        replied = asyncio.get_running_loop().create_future()
+
+        async def listen():
+            async for raw in ws:
+                if json.loads(raw)["event"] == "media" and not replied.done():
+                    replied.set_result(time.perf_counter())
+
+        listener = asyncio.create_task(listen())
+        t = time.perf_counter()
+        frames = [SPEECH] * int(speech_s * 50) + [SILENCE] * int(wait_s * 50)
+        spoken_at = None
+        for n, frame in enumerate(frames):
+            if n == int(speech_s * 50):
+                spoken_at = time.perf_counter()
+            await ws.send(json.dumps({"event": "media", "media": {"payload": base64.b64encode(frame).decode()}}))
+            t += 0.02
+            await asyncio.sleep(max(0.0, t - time.perf_counter()))  # real time, like Twilio
+        await ws.send(json.dumps({"event": "stop"}))
+        listener.cancel()
+        return (replied.result() - spoken_at) * 1000 if replied.done() else None
+
+
+async def loop_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - t - 0.01) * 1000)
+
+
+async def load(url: str, calls: int, speech_s: float, wait_s: float):
+    stop, lags = asyncio.Event(), []
+    lagger = asyncio.create_task(loop_lag(stop, lags))
+    results = await asyncio.gather(*(caller(url, i, speech_s, wait_s) for i in range(calls)))
+    stop.set()
+    await lagger
+    got = np.array([r for r in results if r is not None])
+    from src.services.twilio_api import main
+    stats = main.totals
+    p50 = f"{np.percentile(got, 50):6.0f}" if len(got) else "     -"
+    p95 = f"{np.percentile(got, 95):6.0f}" if len(got) else "     -"
+    print(f"{calls:4d} calls  replied {len(got):4d}  first frame after speech p50={p50} ms p95={p95} ms  "
+          f"dropped {stats['dropped']}/{stats['frames']} frames  client loop lag p95={np.percentile(lags, 95):5.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, nargs="+", default=[10, 50, 100])
+    ap.add_argument("--asr-ms", type=float, default=0.2, help="recogniser CPU per 20 ms frame")
+    ap.add_argument("--llm-ms", type=float, default=150, help="latency of each fake LLM step")
+    ap.add_argument("--speech-s", type=float, default=1.0)
+    ap.add_argument("--wait-s", type=float, default=2.0)
+    args = ap.parse_args()
+    url = serve(args.asr_ms, args.llm_ms)
+    for n in args.calls:
+        from src.services.twilio_api import main as service
+        service.totals.update(dict.fromkeys(service.totals, 0))
+        asyncio.run(load(url, n, args.speech_s, args.wait_s))
+
+
+if __name__ == "__main__":
+    main()
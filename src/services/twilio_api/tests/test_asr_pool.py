@@ -0,0 +1,114 @@
+import json
+import multiprocessing.shared_memory as shared_memory
+import time
+
+import pytest
+
+from src.services.twilio_api.asr_pool import ASRPool, Ring
+
+
+class TextRecognizer:
+    '''Treats the audio bytes as text; "." ends an utterance.'''
+
+    def __init__(self):
+        self.buffer = b""
+        self.final = ""
+
+    def AcceptWaveform(self, data):
+        self.buffer += data
+        if b"." not in self.buffer:
+            return False
+        done, self.buffer = self.buffer.rsplit(b".", 1)
+        self.final = done.decode().replace(".", " ").strip()
+        return True
+
+    def Result(self):
+        return json.dumps({"text": self.final})
+
+    def PartialResult(self):
+        return json.dumps({"partial": self.buffer.decode().strip()})
+
+    def FinalResult(self):
+        text, self.buffer = self.buffer.decode().strip(), b""
+        return json.dumps({"text": text})
+
+
+def text_loader():
+    return TextRecognizer
+
+
+@pytest.fixture
+def pool():
+    p = ASRPool(workers=2, slots_per_worker=4, loader=text_loader, loader_args=(), ring_seconds=0.01, tick_ms=2)
+    yield p
+    p.close()
+
+
+def wait_for(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.005)
+    return cond()
+
+
+def test_ring_wraps_around():
+    shm = shared_memory.SharedMemory(create=True, size=16 + 8)
+    try:
+        ring = Ring(shm.buf, 0, 8)
+        assert ring.write(b"abcde") and ring.read() == b"abcde"
+        assert ring.write(b"fghij") and ring.read() == b"fghij"  # crosses the end of the buffer
+        assert ring.write(b"12345678") and not ring.write(b"9")  # full: the producer is told
+        assert ring.read() == b"12345678"
+        del ring
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_results_reach_the_right_call(pool):
+    recs = [pool.recognizer() for _ in range(6)]
+    assert {r.slot // 4 for r in recs} == {0, 1}  # spread over both workers
+    for i, rec in enumerate(recs):
+        rec.AcceptWaveform(f"caller {i} says hi.".encode())
+    assert wait_for(lambda: all(r.AcceptWaveform(b"") for r in recs))
+    assert [json.loads(r.Result())["text"] for r in recs] == [f"caller {i} says hi" for i in range(6)]
+
+
+def test_partials_stream_back(pool):
+    rec = pool.recognizer()
+    rec.AcceptWaveform(b"half a sen")
+    assert wait_for(lambda: json.loads(rec.PartialResult())["partial"] == "half a sen")
+
+
+def test_final_result_flushes_queued_audio(pool):
+    rec = pool.recognizer()
+    rec.AcceptWaveform(b"done. and then")
+    assert json.loads(rec.FinalResult())["text"] == "done and then"
+
+
+def test_slots_are_reused_after_close(pool):
+    recs = [pool.recognizer() for _ in range(8)]
+    with pytest.raises(RuntimeError):
+        pool.recognizer()
+    recs[0].close()
+    assert wait_for(lambda: pool.active == 7)
+    rec = pool.recognizer()
+    rec.AcceptWaveform(b"fresh.")
+    assert wait_for(lambda: rec.AcceptWaveform(b""))
+    assert json.loads(rec.Result())["text"] == "fresh"
+
+
+def test_overruns_are_counted(pool):
+    rec = pool.recognizer()
+    rec.AcceptWaveform(b"x" * 1000)  # ring holds 160 bytes
+    assert rec.overruns == 1
+
+
+def test_late_flush_reply_comes_back_in_order(pool):
+    rec = pool.recognizer()
+    rec.AcceptWaveform(b"too slow")
+    assert json.loads(rec.FinalResult(timeout=0))["text"] == ""
+    time.sleep(0.1)  # the first answer arrives after its caller gave up
+    rec.AcceptWaveform(b"next one")
+    assert json.loads(rec.FinalResult())["text"] == "too slow next one"
+    assert json.loads(rec.FinalResult())["text"] == ""
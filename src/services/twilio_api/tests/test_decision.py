@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+import httpx
+
+from src.services import metrics
+from src.services.twilio_api import decision, main
+
+
+def test_answer_known_before_the_object_closes():
+    answer = decision.Decision()
+    assert [answer.feed(t) for t in ['{"', 'speak', '":', ' tr', 'ue']] == [False, False, False, False, True]
+    assert answer.result() is True
+    assert answer.tokens == 5
+
+
+def test_no_answer_counts_as_unparsed(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    answer = decision.Decision()
+    answer.feed("I think you should speak")
+    assert answer.result() is False
+    assert decision.Decision().failed(TimeoutError()) is False
+    decision.Decision().feed('{"speak": false}')
+    report = decision.report(registry)
+    assert (report["unparsed"], report["error"], report["wait"]) == (1, 1, 0)
+    assert report["failure_rate"] == 1.0
+
+
+def test_decide_sends_the_schema_and_stops_reading(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    sent, read = {}, []
+
+    async def chunks():
+        for token in ['{"', "speak", '":', " false", "}"]:
+            read.append(token)
+            yield (json.dumps({"message": {"content": token}, "done": False}) + "\n").encode()
+
+    def handler(request):
+        sent.update(json.loads(request.content))
+        return httpx.Response(200, content=chunks())
+
+    monkeypatch.setattr(main, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    assert asyncio.run(main.decide("so yeah")) is False
+    assert sent["format"] == decision.SCHEMA and sent["stream"] is True
+    assert sent["options"]["num_predict"] == decision.OPTIONS["num_predict"]
+    assert read[-1] == " false"  # the closing brace was never read
+    assert decision.report(registry)["wait"] == 1
@@ -0,0 +1,66 @@
+import numpy as np
+
+from src.services.audio.vad import EnergyVAD
+from src.services.twilio_api.endpointing import Endpointer
+
+rng = np.random.default_rng(0)
+SILENCE = np.zeros(160, dtype=np.int16)
+HISS = (rng.standard_normal(160) * 30).astype(np.int16)
+SPEECH = (rng.standard_normal(160) * 6000).astype(np.int16)
+
+
+def test_vad_separates_speech_from_line_noise():
+    vad = EnergyVAD()
+    assert not any(vad.is_speech(HISS) for _ in range(50))
+    assert vad.is_speech(SPEECH)
+    assert not vad.is_speech(SILENCE)
+
+
+def test_turn_ends_after_final_and_silence():
+    ep = Endpointer(min_silence_ms=400)
+    for _ in range(50):
+        ep.frame(SPEECH)
+    ep.final("i finished my essay")
+    assert not ep.turn_ended()
+    fired = []
+    for _ in range(30):
+        ep.frame(SILENCE)
+        fired.append(ep.turn_ended())
+    assert fired.count(True) == 1
+    assert fired.index(True) == 400 // 20 - 1
+    assert ep.speech_ms == 0
+
+
+def test_speech_ms_counts_the_current_run():
+    ep = Endpointer()
+    for _ in range(10):
+        ep.frame(SPEECH)
+    assert ep.speech_ms == 200
+    ep.frame(SILENCE)
+    ep.frame(SPEECH)
+    assert ep.speech_ms == 20
+
+
+def test_no_turn_without_new_words():
+    ep = Endpointer()
+    for _ in range(100):
+        ep.frame(SILENCE)
+        assert not ep.turn_ended()
+    ep.final("")
+    assert not ep.turn_ended()
+
+
+def test_flush_requested_when_final_is_late():
+    ep = Endpointer(min_silence_ms=400, flush_silence_ms=900)
+    for _ in range(20):
+        ep.frame(SPEECH)
+    flushes = 0
+    for _ in range(44):
+        ep.frame(SILENCE)
+        flushes += ep.needs_flush()
+    assert flushes == 0
+    ep.frame(SILENCE)
+    assert ep.needs_flush()
+    ep.final("are you there")
+    assert not ep.needs_flush()
+    assert ep.turn_ended()
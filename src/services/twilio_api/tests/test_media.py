@@ -0,0 +1,88 @@
+import base64
+import json
+import threading
+import time
+
+import numpy as np
+
+from src.services.twilio_api.media import MediaTemplate, MediaWriter, Pacer, b64_frames
+
+AUDIO = np.random.default_rng(0).integers(0, 256, 160 * 50, dtype=np.uint8).tobytes()
+
+
+def test_frames_encoded_as_base64_does():
+    rows = b64_frames(AUDIO)
+    assert rows.shape == (50, 216)
+    assert [r.tobytes() for r in rows] == [base64.b64encode(AUDIO[i:i + 160]) for i in range(0, len(AUDIO), 160)]
+    odd = AUDIO[:162 * 3]  # frames that are a whole number of base64 groups
+    assert b64_frames(odd, 162)[2].tobytes() == base64.b64encode(odd[324:])
+
+
+def test_template_matches_json_dumps():
+    messages = MediaTemplate('MZ"%d').media(AUDIO[:480], 7)
+    assert messages[1] == json.dumps({
+        "event": "media", "streamSid": 'MZ"%d', "sequenceNumber": "8",
+        "media": {"track": "outbound", "chunk": "8", "timestamp": "140",
+                  "payload": base64.b64encode(AUDIO[160:320]).decode()},
+    })
+    assert len(messages) == 3
+
+
+def test_pacer_tops_up_in_bursts():
+    pacer = Pacer(lead_ms=400, burst_ms=100)
+    assert pacer.due(0.0) == 20
+    pacer.sent(20, 0.0)
+    assert pacer.due(0.05) == 0 and abs(pacer.wait(0.05) - 0.05) < 1e-9
+    assert pacer.due(0.1) == 5
+    pacer.reset()
+    assert pacer.due(0.1) == 20
+
+
+def test_writer_paces_and_clear_drops_the_rest():
+    sent, lock = [], threading.Lock()
+
+    def send(text):
+        with lock:
+            sent.append((time.perf_counter(), json.loads(text)))
+
+    writer = MediaWriter(send, lead_ms=100, burst_ms=40)
+    t0 = time.perf_counter()
+    seq = writer.media("MZ1", AUDIO, 1)  # one second of audio
+    writer.mark("MZ1", "csm-done", seq)
+    time.sleep(0.3)
+    dropped = writer.clear("MZ1")
+    writer.close()
+    events = [m["event"] for _, m in sent]
+    assert seq == 51 and events[-1] == "clear" and "mark" not in events
+    media = [t - t0 for t, m in sent if m["event"] == "media"]
+    assert media[4] < 0.05  # the lead goes out at once
+    assert 15 <= len(media) <= 25 and dropped == 50 - len(media)  # then about real time: 0.1 s + 0.3 s
+
+
+def test_close_sends_what_is_left():
+    sent = []
+    writer = MediaWriter(lambda text: sent.append(json.loads(text)["event"]), lead_ms=100, burst_ms=40)
+    seq = writer.media("MZ1", AUDIO, 1)
+    writer.mark("MZ1", "csm-done", seq)
+    t0 = time.perf_counter()
+    writer.close(timeout=2)
+    assert time.perf_counter() - t0 < 0.5  # not paced any more
+    assert sent.count("media") == 50 and sent[-1] == "mark"
+
+
+def test_slow_socket_blocks_neither_producers_nor_clear():
+    sent = []
+
+    def send(text):
+        time.sleep(0.05)
+        sent.append(json.loads(text)["event"])
+
+    writer = MediaWriter(send, lead_ms=100, burst_ms=40)
+    writer.media("MZ1", AUDIO[:160 * 5], 1)  # one burst, 0.25 s on this socket
+    time.sleep(0.02)
+    t0 = time.perf_counter()
+    writer.media("MZ1", AUDIO[:160], 6)
+    assert time.perf_counter() - t0 < 0.01
+    writer.clear("MZ1")
+    writer.close()
+    assert sent[-1] == "clear" and sent.count("media") <= 2  # the rest of the burst was voided
@@ -0,0 +1,228 @@
+import json
+import threading
+import time
+
+import numpy as np
+
+from src.services.audio import ulaw
+from src.services.twilio_api.pipeline import CallPipeline, prefetch
+
+SILENCE = bytes([0xFF]) * 160
+SPEECH = ulaw.encode((np.random.default_rng(0).standard_normal(160) * 8000).astype(np.int16)).tobytes()
+
+
+class FakeRecognizer:
+    '''Emits a final result every `every` frames.'''
+
+    def __init__(self, every=5, delay=0.0, speech_only=False):
+        self.every, self.delay, self.speech_only, self.seen = every, delay, speech_only, 0
+        self.loud = False
+
+    def AcceptWaveform(self, pcm):
+        time.sleep(self.delay)
+        self.seen += 1
+        self.loud = any(pcm)
+        return self.seen % self.every == 0
+
+    def Result(self):
+        if self.speech_only and not self.loud:
+            return json.dumps({"text": ""})
+        return json.dumps({"text": f"word{self.seen}"})
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self):
+        return json.dumps({"text": ""})
+
+
+def wait_for(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_prefetch_starts_producer_before_first_read():
+    started = threading.Event()
+
+    def produce():
+        started.set()
+        yield "a"
+        yield "b"
+
+    it = prefetch(produce())
+    assert started.wait(1.0)
+    assert list(it) == ["a", "b"]
+
+
+def test_ingestion_and_asr_continue_while_speaking():
+    release = threading.Event()
+    spoken = []
+
+    def speak(sentences, t_turn):
+        spoken.extend(sentences)
+        release.wait(5)
+
+    rec = FakeRecognizer()
+    call = CallPipeline(rec, decide=lambda s: True, respond=lambda s: iter([f"re: {s}"]), speak=speak)
+    try:
+        for _ in range(25):
+            call.feed(SILENCE)
+        assert wait_for(lambda: spoken)
+        # Lucy is "talking" now; inbound audio must still be read and transcribed
+        t0 = time.perf_counter()
+        for _ in range(100):
+            call.feed(SILENCE)
+        assert time.perf_counter() - t0 < 0.1
+        assert wait_for(lambda: rec.seen == 125)
+        assert list(call.words)[-1] == "word125"
+        assert call.replies == 0
+    finally:
+        release.set()
+        call.close()
+    assert call.replies >= 1
+
+
+def test_audio_queue_drops_oldest_when_asr_falls_behind():
+    call = CallPipeline(FakeRecognizer(delay=0.05), decide=lambda s: False, respond=lambda s: iter(()),
+                        speak=lambda s, t: None, audio_frames=10)
+    try:
+        for _ in range(50):
+            call.feed(SILENCE)
+        assert call.frames_in == 50
+        assert call.frames_dropped >= 30
+    finally:
+        call.close()
+
+
+def test_decision_model_only_asked_at_turn_ends():
+    asked = []
+    call = CallPipeline(FakeRecognizer(every=10, speech_only=True), decide=lambda s: asked.append(s) or False,
+                        respond=lambda s: iter(()), speak=lambda s, t: None)
+    try:
+        # Two seconds of continuous speech: Vosk emits finals but the caller never pauses
+        for _ in range(100):
+            call.feed(SPEECH)
+        time.sleep(0.2)
+        assert asked == []
+        # Then a pause: exactly one decision
+        for _ in range(30):
+            call.feed(SILENCE)
+        assert wait_for(lambda: len(asked) == 1)
+        # More silence with no new words must not re-ask
+        for _ in range(100):
+            call.feed(SILENCE)
+        time.sleep(0.2)
+        assert len(asked) == 1
+    finally:
+        call.close()
+
+
+def test_speculative_reply_runs_alongside_decision():
+    events = []
+
+    def decide(snippet):
+        events.append("decide-start")
+        time.sleep(0.2)
+        events.append("decide-end")
+        return len(events) < 5  # first turn: speak, second turn: stay quiet
+
+    def respond(snippet):
+        events.append("respond-start")
+        yield "sure."
+
+    spoken = []
+    call = CallPipeline(FakeRecognizer(every=10, speech_only=True), decide, respond,
+                        speak=lambda s, t: spoken.extend(s), speculation=1)
+    try:
+        for _ in range(20):
+            call.feed(SPEECH)
+        for _ in range(30):
+            call.feed(SILENCE)
+        assert wait_for(lambda: spoken == ["sure."])
+        assert events.index("respond-start") < events.index("decide-end")
+        for _ in range(20):
+            call.feed(SPEECH)
+        for _ in range(30):
+            call.feed(SILENCE)
+        assert wait_for(lambda: call.spec_stats.cancelled == 1)
+        assert spoken == ["sure."]
+        assert call.spec_stats.used == 1
+    finally:
+        call.close()
+
+
+def test_barge_in_cancels_the_reply_and_its_generation():
+    closed, cleared = threading.Event(), []
+
+    def respond(snippet):
+        try:
+            while True:  # the LLM would go on for a while
+                time.sleep(0.01)
+                yield "and another thing."
+        finally:
+            closed.set()
+
+    def speak(sentences, t_turn):
+        for _ in sentences:
+            call.reply.sent(100)  # two seconds of audio handed to Twilio
+            if call.reply.cancelled.wait(0.5):
+                call.reply.dropped += 1
+                break
+
+    call = CallPipeline(FakeRecognizer(every=10, speech_only=True), decide=lambda s: True, respond=respond,
+                        speak=speak, on_barge_in=lambda: cleared.append(True))
+    try:
+        for _ in range(20):
+            call.feed(SPEECH)
+        for _ in range(30):
+            call.feed(SILENCE)
+        assert wait_for(lambda: call.reply is not None and call.reply.playing())
+        for _ in range(15):  # 300 ms of the caller talking over Lucy
+            call.feed(SPEECH)
+        assert wait_for(lambda: call.barge_ins == 1)
+        assert cleared == [True] and call.cleared_ms > 1000
+        assert closed.wait(2)
+        assert wait_for(lambda: call.cancelled_sentences == 1) and call.replies == 0
+    finally:
+        call.close()
+
+
+def test_closing_prefetch_stops_the_producer():
+    closed = threading.Event()
+
+    def produce():
+        try:
+            while True:
+                yield "x"
+        finally:
+            closed.set()
+
+    it = prefetch(produce())
+    assert next(it) == "x"
+    it.close()
+    assert closed.wait(1.0)
+
+
+def test_reply_that_fails_to_start_does_not_end_the_call():
+    calls, spoken = [], []
+
+    def respond(snippet):
+        calls.append(snippet)
+        if len(calls) == 1:
+            raise RuntimeError("memory lookup failed")
+        return iter([f"re: {snippet}"])
+
+    call = CallPipeline(FakeRecognizer(every=10, speech_only=True), decide=lambda s: True, respond=respond,
+                        speak=lambda sentences, t: spoken.extend(sentences))
+    try:
+        for turn in (1, 2):
+            for _ in range(10):
+                call.feed(SPEECH)
+            for _ in range(30):
+                call.feed(SILENCE)
+            assert wait_for(lambda: len(calls) == turn)
+        assert wait_for(lambda: spoken == [f"re: {calls[1]}"])
+    finally:
+        call.close()
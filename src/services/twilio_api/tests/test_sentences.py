@@ -0,0 +1,46 @@
+from src.services.twilio_api.sentences import SentenceChunker, iter_sentences
+
+
+def stream(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_first_chunk_cut_at_clause():
+    chunker = SentenceChunker()
+    assert chunker.feed("Well, look who finally called, ") == ["Well, look who finally called,"]
+
+
+def test_sentences_survive_token_boundaries():
+    text = "Good morning! Did you finish the essay you promised me yesterday? Tell me everything."
+    assert list(iter_sentences(stream(text))) == [
+        "Good morning!",
+        "Did you finish the essay you promised me yesterday?",
+        "Tell me everything.",
+    ]
+
+
+def test_short_sentences_are_merged_after_first():
+    text = "Hey there, friend. Okay. Sure. Let's get going then. "
+    chunks = list(iter_sentences(stream(text)))
+    assert chunks[0] == "Hey there, friend."
+    assert chunks[1] == "Okay. Sure. Let's get going then."
+
+
+def test_abbreviations_and_decimals_do_not_split():
+    text = "I talked to Dr. Smith about the 3.5 hours you slept. That is not enough sleep, honestly."
+    chunks = list(iter_sentences(stream(text)))
+    assert chunks[0] == "I talked to Dr. Smith about the 3.5 hours you slept."
+
+
+def test_long_run_on_is_forced_out():
+    chunker = SentenceChunker(first_min_chars=12, min_chars=40, max_chars=60)
+    chunker.feed("First one is here. ")
+    out = chunker.feed("and then we keep going without any punctuation at all for quite a while ")
+    assert out and all(len(c) <= 60 for c in out)
+
+
+def test_flush_returns_tail_once():
+    chunker = SentenceChunker()
+    assert chunker.feed("no ending") == []
+    assert chunker.flush() == "no ending"
+    assert chunker.flush() is None
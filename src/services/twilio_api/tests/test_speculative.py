@@ -0,0 +1,51 @@
+import threading
+import time
+
+from src.services.twilio_api.speculative import Rendered, Speculation, SpeculationStats
+
+
+def slow_reply(closed, n=5, delay=0.02):
+    try:
+        for i in range(n):
+            time.sleep(delay)
+            yield f"sentence {i}."
+    finally:
+        closed.set()
+
+
+def test_used_speculation_hands_over_everything():
+    stats, closed = SpeculationStats(), threading.Event()
+    spec = Speculation("hi", lambda s: slow_reply(closed), stats)
+    assert list(spec.take()) == [f"sentence {i}." for i in range(5)]
+    spec.cancel()  # too late, it was used
+    assert (stats.started, stats.used, stats.cancelled, stats.useful_sentences) == (1, 1, 0, 5)
+
+
+def test_cancel_stops_generation_and_counts_waste():
+    stats, closed = SpeculationStats(), threading.Event()
+    spec = Speculation("hi", lambda s: slow_reply(closed, n=100), stats)
+    time.sleep(0.1)
+    spec.cancel()
+    assert closed.wait(1.0)
+    assert stats.cancelled == 1 and stats.used == 0
+    assert 1 <= stats.wasted_sentences < 100
+    assert stats.wasted_s > 0
+
+
+def test_first_sentence_is_prerendered():
+    stats = SpeculationStats()
+    spec = Speculation("hi", lambda s: iter(["one.", "two."]), stats,
+                       prerender=lambda text: Rendered(text, b"audio"))
+    assert list(spec.take()) == [Rendered("one.", b"audio"), "two."]
+
+
+def test_respond_that_raises_ends_the_reply():
+    def respond(snippet):
+        raise RuntimeError("memory lookup failed")
+
+    spec = Speculation("hi", respond, SpeculationStats())
+    taken = []
+    reader = threading.Thread(target=lambda: taken.extend(spec.take()), daemon=True)
+    reader.start()
+    reader.join(1.0)
+    assert not reader.is_alive() and taken == []
@@ -0,0 +1,261 @@
+import asyncio
+import base64
+import json
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from src.services import metrics
+from src.services.audio import ulaw
+from src.services.twilio_api import main
+from src.services.twilio_api.async_call import AsyncCall, ahead
+
+SILENCE = bytes([0xFF]) * 160
+SPEECH = ulaw.encode((np.random.default_rng(0).standard_normal(160) * 8000).astype(np.int16)).tobytes()
+
+
+class FakeRecognizer:
+    '''Final result for every batch that contains speech.'''
+
+    def __init__(self):
+        self.closed = False
+        self.loud = False
+
+    def AcceptWaveform(self, pcm):
+        self.loud = bool(np.abs(np.frombuffer(pcm, dtype=np.int16)).max() > 1000)
+        return self.loud
+
+    def Result(self):
+        return json.dumps({"text": "hello lucy" if self.loud else ""})
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self):
+        return json.dumps({"text": ""})
+
+    def close(self):
+        self.closed = True
+
+
+async def always(snippet):
+    return True
+
+
+async def two_sentences(snippet, user_id=None):
+    yield "Hi there."
+    yield "How are you?"
+
+
+async def audio(text):
+    for _ in range(3):
+        yield b"\x01" * 100  # 300 bytes per sentence, not frame aligned
+
+
+def media(payload: bytes) -> str:
+    return json.dumps({"event": "media", "media": {"payload": base64.b64encode(payload).decode()}})
+
+
+def turn():
+    return [SPEECH] * 10 + [SILENCE] * 30
+
+
+def test_call_returns_stream_twiml():
+    r = TestClient(main.app).post("/twilio_api/call", headers={"host": "lucy.example"})
+    assert r.status_code == 200
+    assert 'url="wss://lucy.example/twilio_api/stream"' in r.text
+    assert '<Pause length="300" />' in r.text
+    r = TestClient(main.app).post("/twilio_api/call?user_id=01ABC", headers={"host": "lucy.example"})
+    assert '<Parameter name="user_id" value="01ABC" />' in r.text
+
+
+def test_reply_frames_are_aligned_and_marked():
+    async def run():
+        sent = []
+
+        async def send(msg):
+            sent.append(json.loads(msg))
+
+        call = AsyncCall(FakeRecognizer(), always, two_sentences, audio, send, batch_frames=5)
+        call.handle({"event": "start", "streamSid": "MZ1"})
+        for frame in turn():
+            call.feed(frame)
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if sent and sent[-1]["event"] == "mark":
+                break
+        await call.close()
+        return call, sent
+
+    call, sent = asyncio.run(run())
+    frames = [base64.b64decode(m["media"]["payload"]) for m in sent if m["event"] == "media"]
+    assert len(frames) == 4  # 600 bytes -> 3 full frames and a padded tail
+    assert all(len(f) == 160 for f in frames)
+    assert frames[-1].endswith(b"\xff" * 40)
+    assert sent[-1]["mark"]["name"] == "csm-done"
+    assert [int(m["sequenceNumber"]) for m in sent] == list(range(1, 6))
+    assert call.replies == 1 and len(call.ttff_ms) == 1
+
+
+def test_leaving_ahead_early_closes_its_source():
+    async def run():
+        closed = asyncio.Event()
+
+        async def instant():
+            try:
+                while True:
+                    yield "More."
+            finally:
+                closed.set()
+
+        items = ahead(instant())
+        assert await items.__anext__() == "More."
+        await asyncio.sleep(0)  # the producer fills the queue and waits on it
+        await items.aclose()
+        assert closed.is_set()
+        assert len(asyncio.all_tasks()) == 1  # no producer left behind
+
+    asyncio.run(run())
+
+
+def test_barge_in_clears_twilio_and_cancels_the_reply():
+    async def run():
+        sent, closed = [], asyncio.Event()
+
+        async def send(msg):
+            sent.append(json.loads(msg))
+
+        async def endless(snippet):
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "And another thing."
+            finally:
+                closed.set()
+
+        async def slow_audio(text):
+            yield b"\x01" * 160 * 100  # two seconds of audio at once, then a slow model
+            await asyncio.sleep(10)
+
+        call = AsyncCall(FakeRecognizer(), always, endless, slow_audio, send, batch_frames=5)
+        call.handle({"event": "start", "streamSid": "MZ3"})
+        for frame in turn():
+            call.feed(frame)
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if sent:
+                break
+        for _ in range(15):  # 300 ms of the caller talking over Lucy
+            call.feed(SPEECH)
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if call.barge_ins:
+                break
+        await asyncio.wait_for(closed.wait(), 1)
+        await call.close()
+        return call, sent
+
+    call, sent = asyncio.run(run())
+    assert call.barge_ins == 1 and call.replies == 0
+    assert sent[-1] == {"event": "clear", "streamSid": "MZ3"}
+    assert not any(m["event"] == "mark" for m in sent)
+    assert call.cancelled_sentences >= 1
+    # Paced: of the two seconds only the lead went out, and that is what the clear dropped
+    assert sum(m["event"] == "media" for m in sent) < 40
+    assert 0 < call.cleared_ms <= 400
+
+
+def test_barge_in_closes_an_llm_stream_that_is_ahead():
+    async def run():
+        closed = asyncio.Event()
+
+        async def send(msg):
+            pass
+
+        async def instant(snippet):
+            try:
+                while True:
+                    yield "And another thing."  # the LLM is far ahead of TTS: the queue is full
+            finally:
+                closed.set()
+
+        async def slow_audio(text):
+            yield b"\x01" * 160 * 100
+            await asyncio.sleep(10)
+
+        call = AsyncCall(FakeRecognizer(), always, instant, slow_audio, send, batch_frames=5)
+        call.handle({"event": "start", "streamSid": "MZ4"})
+        for frame in turn():
+            call.feed(frame)
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if call.seq > 1:
+                break
+        for _ in range(15):
+            call.feed(SPEECH)
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if call.barge_ins:
+                break
+        assert call.barge_ins == 1 and closed.is_set()  # closed by the barge-in itself
+        await call.close()
+
+    asyncio.run(run())
+
+
+def test_full_queue_drops_oldest_audio():
+    async def run():
+        never = asyncio.Event()
+
+        async def blocked(snippet):
+            await never.wait()
+
+        call = AsyncCall(FakeRecognizer(), blocked, two_sentences, audio, None, audio_frames=4)
+        call._tasks[0].cancel()  # recognition stalls
+        for i in range(10):
+            call.feed(bytes([i]) * 160)
+        queued = [call._audio.get_nowait()[0] for _ in range(4)]
+        await call.close()
+        return call, queued
+
+    call, queued = asyncio.run(run())
+    assert call.frames_dropped == 6
+    assert queued == [6, 7, 8, 9]
+
+
+def test_websocket_stream(monkeypatch, tmp_path):
+    rec = FakeRecognizer()
+    monkeypatch.setattr(main, "RECORD_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "new_recognizer", lambda: rec)
+    monkeypatch.setattr(main, "decide", always)
+    monkeypatch.setattr(main, "respond", two_sentences)
+    monkeypatch.setattr(main, "synthesize", audio)
+    saved = []
+
+    async def remember(user_id, call_sid, transcript):
+        saved.append((user_id, call_sid, transcript))
+
+    monkeypatch.setattr(main, "remember", remember)
+    with TestClient(main.app) as client:
+        with client.websocket_connect("/twilio_api/stream") as ws:
+            ws.send_text(json.dumps({"event": "start", "streamSid": "MZ2", "start": {
+                "callSid": "CA2", "customParameters": {"user_id": "01ABC"}}}))
+            for frame in turn():
+                ws.send_text(media(frame))
+            events = []
+            while not events or events[-1]["event"] != "mark":
+                events.append(json.loads(ws.receive_text()))
+            ws.send_text(json.dumps({"event": "stop"}))
+        stats = client.get("/twilio_api/stats").json()
+    assert {m["streamSid"] for m in events} == {"MZ2"}
+    assert rec.closed
+    assert stats["active"] == 0 and stats["calls"] >= 1 and stats["frames"] >= 40
+    (user_id, call_sid, transcript), = saved
+    assert (user_id, call_sid) == ("01ABC", "CA2")
+    assert {u["text"] for u in transcript if u["role"] == "caller"} == {"hello lucy"}
+    assert [u["text"] for u in transcript if u["role"] == "lucy"] == ["Hi there.", "How are you?"]
+    recorded = [json.loads(line) for line in open(tmp_path / "MZ2.jsonl")]
+    assert recorded[0]["event"] == "start" and recorded[-1]["event"] == "stop" and len(recorded) == 42
+    stages = {s["stage"] for s in metrics.REGISTRY.trace("MZ2").report()["spans"]}
+    assert {"asr", "decision", "tts", "send", "time_to_first_audio"} <= stages
+    assert stats["latency"]["lucy_time_to_first_audio_seconds"]["count"] >= 1
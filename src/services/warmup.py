@@ -0,0 +1,107 @@
+'''
+Deferred loading and warm-up of heavy components (models, clients).
+Each component is loaded in its own background thread and then gets one
+warm-up pass, so first-use costs (CUDA kernels, JIT, faulting the weights
+in) are paid before traffic arrives instead of by the first caller.
+Services answer their readiness probe from the registry.
+'''
+import threading, time, traceback
+from typing import Any, Callable, Dict
+
+class Component:
+    def __init__(self, name: str, load: Callable[[], Any], warm: Callable[[Any], None] | None = None,
+                 t0: float | None = None):
+        self.name = name
+        self._load = load
+        self._warm = warm
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.value = None
+        self.state = "pending"  # pending -> loading -> warming -> ready | failed
+        self.error: str | None = None
+        self.load_s = self.warm_s = self.ready_after_s = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> "Component":
+        with self._lock:
+            if self.state == "pending":
+                self.state = "loading"
+                threading.Thread(target=self._run, name=f"warmup-{self.name}", daemon=True).start()
+        return self
+
+    def get(self, timeout: float | None = None):
+        '''The loaded value; loads it now if nobody started it, waits if it is still loading.'''
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} is still {self.state}")
+        if self.state == "failed":
+            raise RuntimeError(f"{self.name} failed to load: {self.error}")
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def reset(self):
+        '''Forgets the loaded value; the next get() loads it again.'''
+        with self._lock:
+            self.value, self.state, self.error = None, "pending", None
+            self._done = threading.Event()
+
+    def report(self) -> dict:
+        return {"state": self.state, "load_s": self.load_s, "warm_s": self.warm_s,
+                "ready_after_s": self.ready_after_s, "error": self.error}
+
+    def _run(self):
+        try:
+            t = time.perf_counter()
+            value = self._load()
+            self.load_s = round(time.perf_counter() - t, 3)
+            if self._warm:
+                self.state = "warming"
+                t = time.perf_counter()
+                self._warm(value)
+                self.warm_s = round(time.perf_counter() - t, 3)
+            self.value, self.state = value, "ready"
+        except Exception as e:
+            self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+            print(f"\n[warmup] {self.name} failed:\n{traceback.format_exc()}")
+        self.ready_after_s = round(time.perf_counter() - self.t0, 3)
+        self._done.set()
+
+class Warmup:
+    '''Registry of a process's components; `t0` is when the process (or service) started.'''
+
+    def __init__(self, t0: float | None = None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.started_after_s = None  # time spent before warm-up began (imports, config)
+        self.components: Dict[str, Component] = {}
+
+    def add(self, name: str, load: Callable[[], Any], warm: Callable[[Any], None] | None = None) -> Component:
+        component = self.components[name] = Component(name, load, warm, self.t0)
+        return component
+
+    def start(self):
+        if self.started_after_s is None:
+            self.started_after_s = round(time.perf_counter() - self.t0, 3)
+        for component in self.components.values():
+            component.start()
+
+    def ready(self) -> bool:
+        return all(c.ready for c in self.components.values())
+
+    def wait(self, timeout: float | None = None) -> bool:
+        end = None if timeout is None else time.monotonic() + timeout
+        for c in self.components.values():
+            c._done.wait(None if end is None else max(0.0, end - time.monotonic()))
+        return self.ready()
+
+    def report(self) -> dict:
+        return {"ready": self.ready(), "started_after_s": self.started_after_s,
+                "components": {name: c.report() for name, c in self.components.items()}}
+
+    def print_report(self):
+        print(f"[warmup] startup breakdown (boot {self.started_after_s}s):")
+        for name, c in self.components.items():
+            print(f"[warmup]   {name:<10} {c.state:<8} load={c.load_s}s warm={c.warm_s}s ready_at={c.ready_after_s}s"
+                  + (f"  {c.error}" if c.error else ""))